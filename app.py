@@ -4,6 +4,7 @@ import dash_bootstrap_components as dbc
 # Setup dash app
 app = dash.Dash(__name__,
                 suppress_callback_exceptions=True,
+                compress=True,
                 external_stylesheets=[dbc.themes.BOOTSTRAP],
                 meta_tags=[{'name': 'viewport',
                             'content': 'width=device-width, initial-scale=1.0'}]
@@ -0,0 +1,103 @@
+## COVERAGE FIGURE BENCHMARK CODE ----------------------------------------------
+
+# This file compares two ways to build the line graphs of vaccination coverage with forecast (see figures.py):
+# the original code, that builds four Plotly Express figures and combines their lines,
+# and the single-pass graph objects builder with the confidence interval as filled band.
+# For each country it reports the time to build the figure and the size of its JSON.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.figures
+# The prepared datasets are taken from the snapshot if there is one, otherwise from the local backup files.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import time
+import statistics
+import plotly.express as px
+from apps.evaluation.lod import loadBundle
+
+## ORIGINAL PLOTLY EXPRESS CODE ------------------------------------------------
+
+# Original steps of createCovFigNL, createCovFigUK and createCovFigUS
+def originalCoverageFigure(vaccCov, vaccCovPred, title, color):
+    figVac = px.line(   vaccCov,
+                        x="date",
+                        y="coverage_full_dose",
+                        title=title,
+                        labels = {"coverage_full_dose" : "Vaccination Level (%)",
+                                  "date" : "Date"},
+                        range_y = [0,100],
+                        template = "seaborn")
+    figVacPred = px.line(       vaccCovPred,
+                                x="date",
+                                y="predicted",
+                                labels = {"predicted" : "Predicted Vaccination Level (%)"})
+    figVacConfLow = px.line(    vaccCovPred,
+                                x="date",
+                                y="lower_confint",
+                                labels = {"lower_confint" : "Lower limit of confidence interval"})
+    figVacConfUp = px.line(     vaccCovPred,
+                                x="date",
+                                y="upper_confint",
+                                labels = {"upper_confint" : "Upper limit of confidence interval"})
+    figVac.update_traces(connectgaps=True)
+    figVac.update_traces(line_color=color)
+    figVacPred.update_traces(line_color="seagreen")
+    figVacConfLow.update_traces(line_color="#b8d7c6")
+    figVacConfUp.update_traces(line_color="#b8d7c6")
+    figVac.add_hline(y=90, line_width=2, line_dash="dash", opacity=0.2, annotation_text="<i>theoretical herd immunity</i>", annotation_position="top right")
+    figVac.add_trace(figVacPred.data[0])
+    figVac.add_trace(figVacConfLow.data[0])
+    figVac.add_trace(figVacConfUp.data[0])
+    return figVac
+
+## MEASURE FIGURES -------------------------------------------------------------
+
+# Time a figure
+def measure(build, repeats):
+    """ Builds a figure a number of times.
+
+        Parameters:
+        build (function): function that builds the figure
+        repeats (int): number of runs, the median run is reported
+
+        Returns:
+        milliseconds (float): median time to build the figure
+        size (int): number of bytes of the JSON of the figure
+    """
+    times = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        figure = build()
+        times.append(time.perf_counter() - start)
+    return 1000 * statistics.median(times), len(figure.to_json().encode("utf-8"))
+
+# Measure the figure of every country with both builders
+def compare(repeats=10):
+    """ Measures the original Plotly Express code and the single-pass builder for every country.
+
+        Parameter:
+        repeats (int): number of runs per builder
+
+        Returns:
+        results (list): build time and JSON size per country and builder
+    """
+    bundle = loadBundle()
+    from apps.visualisation import figures
+
+    countries = {"NL": ("The Netherlands", "#b67a0c"), "UK": ("the United Kingdom", "crimson"), "US": ("the United States", "steelblue")}
+    results = []
+    for country, (name, color) in countries.items():
+        arguments = (bundle["vaccCov" + country], bundle["vaccCovPred" + country], "<b>Vaccination level in " + name + ":</b>", color)
+        originalMs, originalSize = measure(lambda: originalCoverageFigure(*arguments), repeats)
+        builderMs, builderSize = measure(lambda: figures.createCoverageFigure(*arguments), repeats)
+        results.append({"country": country,
+                        "original_ms": round(originalMs, 1), "builder_ms": round(builderMs, 1),
+                        "original_kb": round(originalSize / 1024, 1), "builder_kb": round(builderSize / 1024, 1)})
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("country  original (ms)  builder (ms)  original (kB)  builder (kB)")
+    for result in compare():
+        print("{country:<7} {original_ms:>14} {builder_ms:>13} {original_kb:>14} {builder_kb:>13}".format(**result))
@@ -0,0 +1,104 @@
+## TIME TO FIRST RESPONSE BENCHMARK CODE ---------------------------------------
+
+# This file compares the launch of the dashboard with all datasets prepared at launch (eager)
+# and with the datasets of each country prepared when they are first used (lazy, see LAZY_START in preparation.py).
+# It launches the dashboard from the local backup files in a separate process and reports, from the start of the process,
+# when the server answers its first request, and when it answers the first view of a country page.
+#
+# Usage (from the main folder of the dashboard, with port 5000 free):
+# python -m apps.evaluation.firstresponse
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import subprocess
+import urllib.request
+
+## BENCHMARK SETTINGS ----------------------------------------------------------
+
+# Address of the dashboard, see index.py
+ADDRESS = "http://127.0.0.1:5000"
+
+# Longest time in seconds to wait for a response
+TIMEOUT = 600
+
+## MEASURE LAUNCH --------------------------------------------------------------
+
+# Wait for the first response of the server
+def waitForServer(process, start):
+    """ Requests the dashboard until the server answers.
+
+        Parameters:
+        process (subprocess): process of the dashboard
+        start (float): time at which the process was started
+
+        Returns:
+        seconds (float): time from the start of the process to the first response
+    """
+    while time.perf_counter() - start < TIMEOUT:
+        if process.poll() is not None:
+            raise RuntimeError("The dashboard stopped before it answered a request.")
+        try:
+            urllib.request.urlopen(ADDRESS + "/", timeout=1).read()
+            return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError("The dashboard did not answer within " + str(TIMEOUT) + " seconds.")
+
+# Request a page as the browser does
+def requestPage(pathname):
+    """ Requests the content of a page through the callback that renders pages, see index.py.
+
+        Parameter:
+        pathname (string): location of the page, such as "/NL"
+    """
+    body = {"output": "page-content.children", "outputs": {"id": "page-content", "property": "children"},
+            "inputs": [{"id": "url", "property": "pathname", "value": pathname}], "changedPropIds": ["url.pathname"]}
+    request = urllib.request.Request(ADDRESS + "/_dash-update-component", data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(request, timeout=TIMEOUT).read()
+
+# Launch the dashboard and measure its first responses
+def measure(start, pathname="/NL"):
+    """ Launches the dashboard from the local backup files and measures its first responses.
+
+        Parameters:
+        start (string): "eager" to prepare all datasets at launch, "lazy" to prepare them on first use
+        pathname (string): page of which the first view is measured
+
+        Returns:
+        result (dict): seconds from the start of the process to the first response and to the first page
+    """
+    environment = dict(os.environ, VAXOSCOPE_BOOT="backup", VAXOSCOPE_START=start)
+    began = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "index.py"], env=environment,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        firstResponse = waitForServer(process, began)
+        requestPage(pathname)
+        firstPage = time.perf_counter() - began
+    finally:
+        process.terminate()
+        process.wait()
+    return {"start": start, "first_response_seconds": round(firstResponse, 2), "first_page_seconds": round(firstPage, 2)}
+
+# Compare eager and lazy launch
+def compare(pathname="/NL"):
+    """ Measures the launch with all datasets prepared at launch and with the datasets prepared on first use.
+
+        Parameter:
+        pathname (string): page of which the first view is measured
+
+        Returns:
+        results (list): first response and first page per launch
+    """
+    return [measure(start, pathname) for start in ["eager", "lazy"]]
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("launch  first response (s)  first view of /NL (s)")
+    for result in compare():
+        print("{start:<7} {first_response_seconds:>18} {first_page_seconds:>22}".format(**result))
@@ -0,0 +1,121 @@
+## INGEST BENCHMARK CODE -------------------------------------------------------
+
+# This file compares two ways to ingest the OWID vaccination coverage file:
+# the original approach (read the whole file, then select columns and countries)
+# and the streaming approach of the retrieval code (read needed columns only, filter chunk by chunk).
+# Each approach runs in a fresh process, so its peak memory use (RSS) can be measured.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.ingest [path to owid-covid-data.csv]
+# Without a path, the OWID file is taken from (or downloaded into) the source cache.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import sys
+import json
+import time
+import resource
+import subprocess
+
+## INGEST APPROACHES -----------------------------------------------------------
+
+# Original approach: read whole file, then select columns and countries
+def ingestFull(path):
+    """ Reads the OWID file the way prepareVaccCovAll originally did.
+
+        Parameter:
+        path (string): path of the OWID file
+
+        Returns:
+        vaccCov (dataframe): selected columns and countries
+    """
+    import pandas as pd
+    vaccCov = pd.read_csv(path)
+    vaccCov = vaccCov[['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred']]
+    vaccCov = vaccCov.loc[vaccCov['iso_code'].isin(['USA', 'GBR', 'NLD'])]
+    return vaccCov
+
+# Streaming approach: read needed columns with declared data types, filter countries per chunk
+def ingestStreaming(path):
+    """ Reads the OWID file with the streaming ingest of the retrieval code.
+
+        Parameter:
+        path (string): path of the OWID file
+
+        Returns:
+        vaccCov (dataframe): selected columns and countries
+    """
+    from apps.preparation import retrieval
+    source = retrieval.SOURCES["vaccCov"]
+    return retrieval.readData(path, source["options"], source["rows"])
+
+APPROACHES = {"full": ingestFull, "streaming": ingestStreaming}
+
+## MEASURE APPROACHES ----------------------------------------------------------
+
+# Peak memory use of the current process in megabytes
+def peakMemory():
+    """ Returns the peak resident set size (RSS) of the current process in megabytes. """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+# Measure one approach inside the current process
+def measure(approach, path):
+    """ Measures parse time and peak memory use of one ingest approach.
+        Should run in a fresh process, because the peak memory use of a process cannot be reset.
+
+        Parameters:
+        approach (string): "full" or "streaming"
+        path (string): path of the OWID file
+
+        Returns:
+        result (dict): parse time, peak memory before and after parsing, and number of kept rows
+    """
+    import pandas as pd
+    from apps.preparation import retrieval
+    baseline = peakMemory()
+    start = time.perf_counter()
+    vaccCov = APPROACHES[approach](path)
+    seconds = time.perf_counter() - start
+    return {"approach": approach,
+            "seconds": round(seconds, 3),
+            "baseline_rss_mb": round(baseline, 1),
+            "peak_rss_mb": round(peakMemory(), 1),
+            "rows": len(vaccCov)}
+
+# Measure all approaches, each in its own process
+def compare(path, repeats=3):
+    """ Measures every ingest approach a number of times, each run in a fresh process.
+
+        Parameters:
+        path (string): path of the OWID file
+        repeats (int): number of runs per approach
+
+        Returns:
+        results (list): measurements of every run
+    """
+    results = []
+    for approach in APPROACHES:
+        for run in range(repeats):
+            output = subprocess.run([sys.executable, "-m", "apps.evaluation.ingest", "--measure", approach, path],
+                                    capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+    else:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            from apps.preparation import retrieval, sourcecache
+            path, modified = sourcecache.fetchSource(retrieval.SOURCES["vaccCov"]["url"])
+
+        print("approach    seconds  baseline RSS (MB)  peak RSS (MB)  rows")
+        for result in compare(path):
+            print("{approach:<10} {seconds:>8} {baseline_rss_mb:>18} {peak_rss_mb:>14} {rows:>5}".format(**result))
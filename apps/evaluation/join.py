@@ -0,0 +1,78 @@
+## GEOMETRY JOIN BENCHMARK CODE ------------------------------------------------
+
+# This file compares two ways to join the county data in data/backup on the county geography:
+# indexing both tables and joining them (the original code),
+# and the lookup in the key index of the geography followed by a take (see geometry.joinData).
+# It reports the time of both joins, checks that they give the same map,
+# and lists the counties that could not be matched (see geometry.joinReport).
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.join
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import time
+import pandas as pd
+from apps.preparation import retrieval, schema, geometry
+
+## MEASURE JOINS ---------------------------------------------------------------
+
+# Time a join
+def measure(join, repeats):
+    """ Runs a join a number of times.
+
+        Parameters:
+        join (function): function that joins the data on the geography
+        repeats (int): number of runs, the fastest run is reported
+
+        Returns:
+        joined (geodataframe): result of the join
+        milliseconds (float): time of the fastest run
+    """
+    times = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        joined = join()
+        times.append(time.perf_counter() - start)
+    return joined, 1000 * min(times)
+
+# Measure both joins on the county data
+def compare(repeats=20):
+    """ Measures the original join and the join through the key index on the county data.
+
+        Parameter:
+        repeats (int): number of runs per join
+
+        Returns:
+        result (dict): time of both joins, whether they give the same map, and the join report
+    """
+    source = retrieval.SOURCES["vaccLocUSCounty"]
+    data = pd.read_csv(source["backup"], **source["options"])
+    data = schema.applySchema(data, schema.SCHEMAS["vaccLocUSCounty"])
+
+    # First runs load the geography and build its key index, so they are not measured
+    counties = geometry.loadGeometry("countiesUS")
+    geometry.keyIndex("countiesUS")
+
+    original, originalMs = measure(lambda: counties.join(data.set_index('location_code')), repeats)
+    indexed, indexedMs = measure(lambda: geometry.joinData("countiesUS", data, 'location_code'), repeats)
+
+    # The original join repeats a shape for every duplicate key, the key index uses the first row
+    original = original[~original.index.duplicated()]
+    columns = [column for column in data.columns if column != 'location_code']
+    same = (original.index.equals(indexed.index)
+            and original[columns].reset_index(drop=True).astype(object)
+                .equals(indexed[columns].reset_index(drop=True).astype(object)))
+
+    return {"rows": len(data), "shapes": len(counties),
+            "original_ms": round(originalMs, 2), "indexed_ms": round(indexedMs, 2), "same": same,
+            "report": geometry.joinReport("countiesUS", data, 'location_code')}
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    result = compare()
+    print("rows  shapes  original (ms)  indexed (ms)  same result")
+    print("{rows:>4} {shapes:>7} {original_ms:>14} {indexed_ms:>13} {same!s:>12}".format(**result))
+    print()
+    print("Counties that could not be matched:")
+    print(result["report"].groupby("problem")["key"].apply(lambda keys: ", ".join(map(str, keys[:10]))).to_string())
@@ -0,0 +1,124 @@
+## COMPARISON LOAD TEST CODE ---------------------------------------------------
+
+# This file compares how many concurrent users of the comparison page the server handles,
+# with the figures filtered by server callbacks and filtered in the browser (see comparison.py).
+# Every simulated user opens the comparison page and then changes the selected countries and the attitude a number of times.
+# With server callbacks every change is a request that looks up (or creates) a figure and serialises it,
+# in the browser the page is sent once with the figures of all countries and a change is no request at all.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.loadtest
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import json
+import time
+import random
+import threading
+import plotly
+from apps.evaluation.lod import loadBundle
+
+## SIMULATE USERS --------------------------------------------------------------
+
+# Answer a request as Dash does: serialise the result
+def respond(result):
+    """ Serialises the result of a callback to the JSON that is sent to the browser.
+
+        Parameter:
+        result (any): layout or figure returned by a callback
+
+        Returns:
+        size (int): number of bytes sent to the browser
+    """
+    return len(json.dumps(result, cls=plotly.utils.PlotlyJSONEncoder))
+
+# One user with server callbacks
+def serverUser(bundle, changes, seed):
+    """ Opens the comparison page and changes the selection, every change answered by a server callback.
+
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts, see preparation.getBundle
+        changes (int): number of changes of the selected countries or attitude
+        seed (int): seed of the random changes
+
+        Returns:
+        requests (int): number of requests sent to the server
+    """
+    from apps.visualisation import comparison, figurecache
+    choices = random.Random(seed)
+    selected, attitude = tuple(comparison.COUNTRIES), comparison.ATTITUDES[0]
+    for change in range(changes + 1):
+        respond(figurecache.cachedFigure("covFigComp", bundle, comparison.createCovFigComp, selected))
+        respond(figurecache.cachedFigure("attitudeFigComp", bundle, comparison.createAttitudeFigComp, selected, attitude))
+        selected = tuple(sorted(choices.sample(comparison.COUNTRIES, choices.randint(1, len(comparison.COUNTRIES)))))
+        attitude = choices.choice(comparison.ATTITUDES)
+    return 2 * (changes + 1)
+
+# One user with filtering in the browser
+def browserUser(bundle, changes, seed):
+    """ Opens the comparison page, changes of the selection are handled in the browser.
+
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts, see preparation.getBundle
+        changes (int): number of changes of the selected countries or attitude, not sent to the server
+        seed (int): seed of the random changes
+
+        Returns:
+        requests (int): number of requests sent to the server
+    """
+    from apps.visualisation import comparison
+    respond(comparison.createLayoutComparison())
+    return 1
+
+# Run users concurrently
+def runUsers(user, bundle, users, changes):
+    """ Runs a number of users at the same time, each in its own thread.
+
+        Parameters:
+        user (function): function that simulates one user
+        bundle (DatasetBundle): prepared datasets and forecasts, see preparation.getBundle
+        users (int): number of concurrent users
+        changes (int): number of changes per user
+
+        Returns:
+        requests (int): total number of requests sent to the server
+        seconds (float): time until all users are done
+    """
+    requests = []
+    threads = [threading.Thread(target=lambda seed=seed: requests.append(user(bundle, changes, seed))) for seed in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(requests), time.perf_counter() - start
+
+# Compare both approaches for several numbers of users
+def compare(userCounts=(1, 10, 50), changes=20):
+    """ Measures the throughput of the comparison page with server callbacks and with filtering in the browser.
+        The figure cache is emptied before every run, so both approaches start with creating their figures.
+
+        Parameters:
+        userCounts (tuple): numbers of concurrent users to measure
+        changes (int): number of changes of the selection per user
+
+        Returns:
+        results (list): requests, time and users handled per second for every approach and number of users
+    """
+    bundle = loadBundle()
+    from apps.visualisation import figurecache
+
+    results = []
+    for users in userCounts:
+        for name, user in {"server callbacks": serverUser, "browser filtering": browserUser}.items():
+            figurecache.clearFigures()
+            requests, seconds = runUsers(user, bundle, users, changes)
+            results.append({"approach": name, "users": users, "requests": requests, "seconds": round(seconds, 2),
+                            "requests_per_second": round(requests / seconds), "users_per_second": round(users / seconds, 1)})
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("approach           users  requests  time (s)  requests/s  users/s")
+    for result in compare():
+        print("{approach:<18} {users:>5} {requests:>9} {seconds:>9} {requests_per_second:>11} {users_per_second:>8}".format(**result))
@@ -0,0 +1,96 @@
+## LEVEL OF DETAIL BENCHMARK CODE ----------------------------------------------
+
+# This file compares the choropleths with and without levels of detail (see geometry.py).
+# For each map it reports the size of the figure JSON that is sent to the browser,
+# the time to create and serialise the figure (the latency of the callback that returns it),
+# and the size of the geography asset that the browser downloads once (see geoassets.py).
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.lod
+# The prepared datasets are taken from the snapshot if there is one, otherwise from the local backup files.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import time
+import statistics
+
+## LOAD DATASETS ---------------------------------------------------------------
+
+# Load the prepared datasets without retrieving online sources
+def loadBundle():
+    """ Prepares the datasets from the snapshot or, if there is none, from the local backup files.
+
+        Returns:
+        bundle (DatasetBundle): prepared datasets, see preparation.getBundle
+    """
+    from apps.preparation import snapshot
+    if snapshot.snapshotExists():
+        os.environ["VAXOSCOPE_BOOT"] = "snapshot"
+    else:
+        os.environ["VAXOSCOPE_BOOT"] = "backup"
+    from apps.preparation import preparation
+    return preparation.getBundle()
+
+## MEASURE MAPS ----------------------------------------------------------------
+
+# Measure the figure of one map
+def measure(build, repeats):
+    """ Creates and serialises a figure a number of times.
+
+        Parameters:
+        build (function): function that creates the figure
+        repeats (int): number of runs, the median run is reported
+
+        Returns:
+        size (int): size of the figure JSON in bytes
+        milliseconds (float): median time to create and serialise the figure
+    """
+    times = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        payload = build().to_json()
+        times.append(time.perf_counter() - start)
+    return len(payload.encode("utf-8")), 1000 * statistics.median(times)
+
+# Measure every map with and without levels of detail
+def compare(repeats=5):
+    """ Measures every choropleth with the finest level of detail and with the level of detail chosen for the map.
+
+        Parameter:
+        repeats (int): number of runs per map
+
+        Returns:
+        results (list): figure size and latency per map, with and without levels of detail
+    """
+    bundle = loadBundle()
+    from apps.preparation import geometry
+    from apps.visualisation import NL, UK, USA, geoassets
+
+    maps = {"NL municipalities": ("municipalitiesNL", None, lambda: NL.createLocationMapNL(bundle)),
+            "UK local authorities": ("ltlaUK", None, lambda: UK.createLocationMapUK(bundle)),
+            "US counties": ("countiesUS", 1.5, lambda: USA.createLocationMapUS(bundle, "counties")),
+            "US states": ("statesUS", 1, lambda: USA.createLocationMapUS(bundle, "states"))}
+
+    results = []
+    for name, (geometryName, scale, build) in maps.items():
+        result = {"map": name}
+        for levelOfDetail in [False, True]:
+            geometry.LEVEL_OF_DETAIL = levelOfDetail
+            # First run also fills the geometry cache, so it is not measured
+            build()
+            size, milliseconds = measure(build, repeats)
+            label = "lod" if levelOfDetail else "full"
+            result[label + "_tolerance"] = geometry.chooseTolerance(geometryName, scale)
+            result[label + "_asset_kb"] = round(os.path.getsize(geoassets.assetPath(geometryName, result[label + "_tolerance"])) / 1024)
+            result[label + "_kb"] = round(size / 1024)
+            result[label + "_ms"] = round(milliseconds)
+        results.append(result)
+    geometry.LEVEL_OF_DETAIL = True
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("map                   full tolerance  full (kB)  full (ms)  full asset (kB)  lod tolerance  lod (kB)  lod (ms)  lod asset (kB)")
+    for result in compare():
+        print("{map:<21} {full_tolerance:>14} {full_kb:>10} {full_ms:>10} {full_asset_kb:>16} {lod_tolerance:>14} {lod_kb:>9} {lod_ms:>9} {lod_asset_kb:>15}".format(**result))
@@ -0,0 +1,268 @@
+## SCHEMA MAPPING BENCHMARK CODE -----------------------------------------------
+
+# This file compares two ways to map the (raw) sources in data/backup onto the prepared tables:
+# the original step-by-step code (a separate rename, replace and astype per column)
+# and the single-pass schema mapping of the preparation code (see schema.py).
+# For each source it reports the time and the number of intermediate dataframes (copies) each approach creates,
+# and checks that both approaches give the same prepared table.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.mapping
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import time
+import numpy as np
+import pandas as pd
+from apps.preparation import retrieval, schema
+
+## ORIGINAL STEP-BY-STEP CODE --------------------------------------------------
+
+# Original steps of prepareVaccCovAll
+def originalVaccCov(vaccCov):
+    vaccCov = vaccCov[['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred']]
+    vaccCov = vaccCov.loc[vaccCov['iso_code'].isin(['USA', 'GBR', 'NLD'])]
+    vaccCov = vaccCov.drop_duplicates()
+    vaccCov = vaccCov.rename(columns={'iso_code': 'country'})
+    vaccCov = vaccCov.rename(columns={'people_vaccinated': 'count_one_dose'})
+    vaccCov = vaccCov.rename(columns={'people_vaccinated_per_hundred': 'coverage_one_dose'})
+    vaccCov = vaccCov.rename(columns={'people_fully_vaccinated': 'count_full_dose'})
+    vaccCov = vaccCov.rename(columns={'people_fully_vaccinated_per_hundred': 'coverage_full_dose'})
+    vaccCov['date']= pd.to_datetime(vaccCov['date'])
+    vaccCov['country'] = vaccCov['country'].replace("USA", "US")
+    vaccCov['country'] = vaccCov['country'].replace("GBR", "UK")
+    vaccCov['country'] = vaccCov['country'].replace("NLD", "NL")
+    vaccCov = vaccCov.dropna(subset=["date", "coverage_full_dose"])
+    return vaccCov
+
+# Original steps of prepareVaccAttitudesAll
+def originalVaccAttitudes(vaccAttitudes):
+    vaccAttitudes = vaccAttitudes[['Day', 'Code', 'people_vaccinated_per_hundred', 'willingness_covid_vaccinate_this_week_pct_pop', 'uncertain_covid_vaccinate_this_week_pct_pop', 'unwillingness_covid_vaccinate_this_week_pct_pop']]
+    vaccAttitudes = vaccAttitudes.loc[vaccAttitudes['Code'].isin(['USA', 'GBR', 'NLD'])]
+    vaccAttitudes = vaccAttitudes.drop_duplicates()
+    vaccAttitudes = vaccAttitudes.rename(columns={'Day': 'date'})
+    vaccAttitudes = vaccAttitudes.rename(columns={'Code': 'country'})
+    vaccAttitudes = vaccAttitudes.rename(columns={'people_vaccinated_per_hundred': 'vaccinated_one_dose_percentage'})
+    vaccAttitudes = vaccAttitudes.rename(columns={'willingness_covid_vaccinate_this_week_pct_pop': 'willing_percentage'})
+    vaccAttitudes = vaccAttitudes.rename(columns={'uncertain_covid_vaccinate_this_week_pct_pop': 'uncertain_percentage'})
+    vaccAttitudes = vaccAttitudes.rename(columns={'unwillingness_covid_vaccinate_this_week_pct_pop': 'unwilling_percentage'})
+    vaccAttitudes['date']= pd.to_datetime(vaccAttitudes['date'])
+    vaccAttitudes['country'] = vaccAttitudes['country'].replace("USA", "US")
+    vaccAttitudes['country'] = vaccAttitudes['country'].replace("GBR", "UK")
+    vaccAttitudes['country'] = vaccAttitudes['country'].replace("NLD", "NL")
+    return vaccAttitudes
+
+# Original steps of prepareVaccAgeNL, up to grouping the age groups over all regions
+def originalVaccAgeNL(vaccAgeNL):
+    vaccAgeNL['Vaccination_coverage_partly'] = vaccAgeNL['Vaccination_coverage_partly'].replace(">=95", np.nan)
+    vaccAgeNL['Vaccination_coverage_partly'] = vaccAgeNL['Vaccination_coverage_partly'].replace("9999", np.nan)
+    vaccAgeNL['Vaccination_coverage_completed'] = vaccAgeNL['Vaccination_coverage_completed'].replace(">=95", np.nan)
+    vaccAgeNL['Vaccination_coverage_completed'] = vaccAgeNL['Vaccination_coverage_completed'].replace("9999", np.nan)
+    vaccAgeNL = vaccAgeNL.loc[vaccAgeNL['Region_level'].isin(['Veiligheidsregio'])]
+    vaccAgeNL['Vaccination_coverage_partly'] = vaccAgeNL['Vaccination_coverage_partly'].astype('float')
+    vaccAgeNL['Vaccination_coverage_completed'] = vaccAgeNL['Vaccination_coverage_completed'].astype('float')
+    vaccAgeNL = vaccAgeNL[['Date_of_statistics', 'Age_group', 'Vaccination_coverage_partly', 'Vaccination_coverage_completed']]
+    vaccAgeNL = vaccAgeNL.rename(columns={'Date_of_statistics': 'date'})
+    vaccAgeNL = vaccAgeNL.rename(columns={'Age_group': 'age_group'})
+    vaccAgeNL = vaccAgeNL.rename(columns={'Vaccination_coverage_partly': 'coverage_one_dose'})
+    vaccAgeNL = vaccAgeNL.rename(columns={'Vaccination_coverage_completed': 'coverage_full_dose'})
+    vaccAgeNL['date']= pd.to_datetime(vaccAgeNL['date'])
+    return vaccAgeNL
+
+# Original steps of prepareVaccAgeUK
+def originalVaccAgeUK(vaccAgeUK):
+    vaccAgeUK = vaccAgeUK[['date', 'age', 'cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate', 'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage']]
+    vaccAgeUK = vaccAgeUK.drop_duplicates()
+    vaccAgeUK = vaccAgeUK.rename(columns={'age': 'age_group'})
+    vaccAgeUK = vaccAgeUK.rename(columns={'cumPeopleVaccinatedFirstDoseByVaccinationDate': 'count_one_dose'})
+    vaccAgeUK = vaccAgeUK.rename(columns={'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage': 'coverage_one_dose'})
+    vaccAgeUK = vaccAgeUK.rename(columns={'cumPeopleVaccinatedCompleteByVaccinationDate': 'count_full_dose'})
+    vaccAgeUK = vaccAgeUK.rename(columns={'cumVaccinationCompleteCoverageByVaccinationDatePercentage': 'coverage_full_dose'})
+    vaccAgeUK['date']= pd.to_datetime(vaccAgeUK['date'])
+    vaccAgeUK['country'] = 'UK'
+    vaccAgeUK['age_group'] = vaccAgeUK['age_group'].replace(schema.SCHEMAS["vaccAgeUK"]["recode"]["age_group"])
+    vaccAgeUK = vaccAgeUK[vaccAgeUK["date"]==vaccAgeUK["date"].max()]
+    vaccAgeUK = vaccAgeUK[['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']]
+    return vaccAgeUK
+
+# Original steps of prepareVaccAgeUS, up to sorting by age group
+def originalVaccAgeUS(vaccAgeUS):
+    age_groups = ['Ages_<12yrs','Ages_12-15_yrs','Ages_16-17_yrs','Ages_18-24_yrs','Ages_18-29_yrs',
+    'Ages_25-39_yrs','Ages_30-39_yrs','Ages_40-49_yrs','Ages_50-64_yrs','Ages_65-74_yrs','Ages_75+_yrs',
+    'Ages_<18yrs','Age_unknown','Age_known']
+    vaccAgeUS = vaccAgeUS.loc[vaccAgeUS['demographic_category'].isin(age_groups)]
+    vaccAgeUS = vaccAgeUS[['date', 'demographic_category', 'administered_dose1', 'administered_dose1_pct', 'series_complete_yes', 'series_complete_pop_pct']]
+    vaccAgeUS = vaccAgeUS.rename(columns={'demographic_category': 'age_group'})
+    vaccAgeUS = vaccAgeUS.rename(columns={'recip_state': 'state'})
+    vaccAgeUS = vaccAgeUS.rename(columns={'administered_dose1': 'count_one_dose'})
+    vaccAgeUS = vaccAgeUS.rename(columns={'administered_dose1_pct': 'coverage_one_dose'})
+    vaccAgeUS = vaccAgeUS.rename(columns={'series_complete_yes': 'count_full_dose'})
+    vaccAgeUS = vaccAgeUS.rename(columns={'series_complete_pop_pct': 'coverage_full_dose'})
+    vaccAgeUS = vaccAgeUS.astype({'date': 'datetime64[ns]'})
+    vaccAgeUS = vaccAgeUS.drop_duplicates()
+    vaccAgeUS['country'] = 'US'
+    vaccAgeUS['age_group'] = vaccAgeUS['age_group'].replace(schema.SCHEMAS["vaccAgeUS"]["recode"]["age_group"])
+    vaccAgeUS = vaccAgeUS[vaccAgeUS["date"]==vaccAgeUS["date"].max()]
+    vaccAgeUS = vaccAgeUS[~vaccAgeUS["age_group"].isin(["Age known", "Age unknown", "18-"])]
+    vaccAgeUS = vaccAgeUS[['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']]
+    return vaccAgeUS
+
+# Original steps of prepareVaccLocNL, up to matching with the country geography
+def originalVaccLocNL(vaccLocNL):
+    vaccLocNL['Vaccination_coverage_partly'] = vaccLocNL['Vaccination_coverage_partly'].replace(">=95", np.nan)
+    vaccLocNL['Vaccination_coverage_partly'] = vaccLocNL['Vaccination_coverage_partly'].replace("9999", np.nan)
+    vaccLocNL['Vaccination_coverage_completed'] = vaccLocNL['Vaccination_coverage_completed'].replace(">=95", np.nan)
+    vaccLocNL['Vaccination_coverage_completed'] = vaccLocNL['Vaccination_coverage_completed'].replace("9999", np.nan)
+    vaccLocNL['Region_level'] = vaccLocNL['Region_level'].replace("Gemeente", "Municipality")
+    vaccLocNL['Region_level'] = vaccLocNL['Region_level'].replace("Veiligheidsregio", "Safety region")
+    vaccLocNL['Vaccination_coverage_partly'] = vaccLocNL['Vaccination_coverage_partly'].astype('float')
+    vaccLocNL['Vaccination_coverage_completed'] = vaccLocNL['Vaccination_coverage_completed'].astype('float')
+    vaccLocNL = vaccLocNL[['Region_level', 'Region_code', 'Region_name', 'Birth_year','Date_of_statistics',  'Vaccination_coverage_completed', 'Vaccination_coverage_partly']]
+    vaccLocNL = vaccLocNL.drop_duplicates()
+    vaccLocNL = vaccLocNL.rename(columns={'Date_of_statistics': 'date'})
+    vaccLocNL = vaccLocNL.rename(columns={'Region_level': 'location_level'})
+    vaccLocNL = vaccLocNL.rename(columns={'Region_name': 'location_name'})
+    vaccLocNL = vaccLocNL.rename(columns={'Region_code': 'location_code'})
+    vaccLocNL = vaccLocNL.rename(columns={'Birth_year': 'age_group'})
+    vaccLocNL = vaccLocNL.rename(columns={'Vaccination_coverage_partly': 'coverage_one_dose'})
+    vaccLocNL = vaccLocNL.rename(columns={'Vaccination_coverage_completed': 'coverage_full_dose'})
+    vaccLocNL = vaccLocNL.astype({'date': 'datetime64[ns]'})
+    vaccLocNL.insert(4, 'count_full_dose', np.nan)
+    vaccLocNL.insert(5, 'count_one_dose', np.nan)
+    vaccLocNL['country'] = 'NL'
+    vaccLocNL = vaccLocNL[vaccLocNL["location_level"]=="Municipality"]
+    vaccLocNL = vaccLocNL[vaccLocNL["date"] == vaccLocNL["date"].max()]
+    vaccLocNL = vaccLocNL[vaccLocNL["age_group"] == "<2004"]
+    vaccLocNL = vaccLocNL.drop(labels = "age_group", axis=1)
+    return vaccLocNL
+
+# Original steps of prepareVaccLocUK, up to matching with the country geography
+def originalVaccLocUK(vaccLocUK):
+    del vaccLocUK['areaType']
+    vaccLocUK = vaccLocUK.drop_duplicates()
+    vaccLocUK = vaccLocUK.rename(columns={'areaName': 'location_name'})
+    vaccLocUK = vaccLocUK.rename(columns={'areaCode': 'location_code'})
+    vaccLocUK = vaccLocUK.rename(columns={'cumVaccinationCompleteCoverageByVaccinationDatePercentage': 'coverage_full_dose'})
+    vaccLocUK['date']= pd.to_datetime(vaccLocUK['date'])
+    vaccLocUK.insert(0, 'location_level', 'Lower tier local authority')
+    vaccLocUK['country'] = 'UK'
+    vaccLocUK = vaccLocUK.sort_values(['location_name', 'date']).drop_duplicates(subset = 'location_name', keep = 'last')
+    return vaccLocUK
+
+# Original steps of prepareVaccLocUS on county level, up to matching with the country geography
+def originalVaccLocUSCounty(vaccLocUSCounty):
+    vaccLocUSCounty = vaccLocUSCounty[['date','fips','recip_county','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct']]
+    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'recip_county': 'location_name'})
+    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'fips': 'location_code'})
+    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'administered_dose1_recip': 'count_one_dose'})
+    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'administered_dose1_pop_pct': 'coverage_one_dose'})
+    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'series_complete_yes': 'count_full_dose'})
+    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'series_complete_pop_pct': 'coverage_full_dose'})
+    vaccLocUSCounty = vaccLocUSCounty.astype({'date': 'datetime64[ns]'})
+    vaccLocUSCounty = vaccLocUSCounty.drop_duplicates()
+    vaccLocUSCounty.insert(0, 'location_level', 'County')
+    vaccLocUSCounty['country'] = 'US'
+    vaccLocUSCounty = vaccLocUSCounty[vaccLocUSCounty["date"]==vaccLocUSCounty["date"].max()]
+    vaccLocUSCounty["location_code"] = vaccLocUSCounty["location_code"].astype("string")
+    return vaccLocUSCounty
+
+# Original steps of prepareVaccLocUS on state level, up to matching with the country geography
+def originalVaccLocUSState(vaccLocUSState):
+    vaccLocUSState = vaccLocUSState[['date','location','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct']]
+    vaccLocUSState = vaccLocUSState.rename(columns={'location': 'location_name'})
+    vaccLocUSState = vaccLocUSState.rename(columns={'fips': 'location_code'})
+    vaccLocUSState = vaccLocUSState.rename(columns={'administered_dose1_recip': 'count_one_dose'})
+    vaccLocUSState = vaccLocUSState.rename(columns={'administered_dose1_pop_pct': 'coverage_one_dose'})
+    vaccLocUSState = vaccLocUSState.rename(columns={'series_complete_yes': 'count_full_dose'})
+    vaccLocUSState = vaccLocUSState.rename(columns={'series_complete_pop_pct': 'coverage_full_dose'})
+    vaccLocUSState = vaccLocUSState.astype({'date': 'datetime64[ns]'})
+    vaccLocUSState = vaccLocUSState.drop_duplicates()
+    vaccLocUSState.insert(0, 'location_level', 'County')
+    vaccLocUSState['country'] = 'US'
+    vaccLocUSState['location_name'] = vaccLocUSState['location_name'].map(schema.STATE_NAMES)
+    vaccLocUSState.dropna(subset=['location_name'], inplace = True)
+    vaccLocUSState = vaccLocUSState[vaccLocUSState["date"]==vaccLocUSState["date"].max()]
+    return vaccLocUSState
+
+ORIGINAL = {"vaccCov": originalVaccCov, "vaccAttitudes": originalVaccAttitudes,
+            "vaccAgeNL": originalVaccAgeNL, "vaccAgeUK": originalVaccAgeUK, "vaccAgeUS": originalVaccAgeUS,
+            "vaccLocNL": originalVaccLocNL, "vaccLocUK": originalVaccLocUK,
+            "vaccLocUSCounty": originalVaccLocUSCounty, "vaccLocUSState": originalVaccLocUSState}
+
+## MEASURE APPROACHES ----------------------------------------------------------
+
+# Count the dataframes that are created while running a function
+def countCopies(function, data):
+    """ Runs a function on a copy of a dataset and counts the dataframes that pandas creates meanwhile.
+        Every rename, selection, filter and astype creates a new dataframe (a copy of the data).
+
+        Parameters:
+        function (function): function that prepares the dataset
+        data (dataframe): (raw) dataset
+
+        Returns:
+        prepared (dataframe): prepared dataset
+        copies (int): number of dataframes created
+        seconds (float): time the function took
+    """
+    data = data.copy()
+    created = [0]
+    originalInit = pd.DataFrame.__init__
+
+    def countingInit(self, *args, **kwargs):
+        created[0] += 1
+        originalInit(self, *args, **kwargs)
+
+    pd.DataFrame.__init__ = countingInit
+    try:
+        start = time.perf_counter()
+        prepared = function(data)
+        seconds = time.perf_counter() - start
+    finally:
+        pd.DataFrame.__init__ = originalInit
+    return prepared, created[0], seconds
+
+# Measure both approaches for every source in data/backup
+def compare(repeats=5):
+    """ Measures the original code and the schema mapping for every source that has a local backup file.
+
+        Parameter:
+        repeats (int): number of runs per approach, the fastest run is reported
+
+        Returns:
+        results (list): copies, time and equality of the prepared tables per source
+    """
+    results = []
+    for name, function in ORIGINAL.items():
+        if name == "vaccAttitudes":
+            path, options = "data/backup/vaccAttitudes.csv", {}
+        else:
+            path, options = retrieval.SOURCES[name]["backup"], retrieval.SOURCES[name]["options"]
+        if not os.path.exists(path):
+            print("Note: skipped " + name + ", there is no local backup file " + path + ".")
+            continue
+        data = pd.read_csv(path, **options)
+
+        originalRuns = [countCopies(function, data) for run in range(repeats)]
+        schemaRuns = [countCopies(lambda raw: schema.applySchema(raw, schema.SCHEMAS[name]), data) for run in range(repeats)]
+        original, schemaPrepared = originalRuns[0][0], schemaRuns[0][0]
+
+        # Both approaches should give the same rows and columns, the order of the rows may differ
+        columns = list(original.columns)
+        same = (sorted(columns) == sorted(schemaPrepared.columns)
+                and original[columns].sort_values(columns).reset_index(drop=True)
+                    .equals(schemaPrepared[columns].sort_values(columns).reset_index(drop=True)))
+
+        results.append({"source": name, "rows": len(data),
+                        "original_copies": originalRuns[0][1], "schema_copies": schemaRuns[0][1],
+                        "original_ms": round(1000 * min(run[2] for run in originalRuns), 1),
+                        "schema_ms": round(1000 * min(run[2] for run in schemaRuns), 1),
+                        "same": same})
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("source            rows  original copies  schema copies  original (ms)  schema (ms)  same result")
+    for result in compare():
+        print("{source:<15} {rows:>6} {original_copies:>16} {schema_copies:>14} {original_ms:>14} {schema_ms:>12} {same!s:>12}".format(**result))
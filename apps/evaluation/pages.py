@@ -0,0 +1,66 @@
+## PAGE BENCHMARK CODE ---------------------------------------------------------
+
+# This file measures the time to build the pages of the dashboard with and without the figure cache (see figurecache.py).
+# The first view of a page after a refresh creates its figures, every next view takes them from the cache.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.pages
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import time
+import statistics
+from apps.evaluation.lod import loadBundle
+
+## MEASURE PAGES ---------------------------------------------------------------
+
+# Time a page
+def measure(build, repeats):
+    """ Builds a page a number of times.
+
+        Parameters:
+        build (function): function that builds the layout of the page
+        repeats (int): number of runs, the median run is reported
+
+        Returns:
+        milliseconds (float): median time to build the page
+    """
+    times = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        build()
+        times.append(time.perf_counter() - start)
+    return 1000 * statistics.median(times)
+
+# Measure every page with and without the figure cache
+def compare(repeats=5):
+    """ Measures every page without the figure cache, on the first view with the cache, and on later views.
+
+        Parameter:
+        repeats (int): number of runs per page
+
+        Returns:
+        results (list): time to build every page
+    """
+    loadBundle()
+    from apps.visualisation import NL, UK, USA, comparison, figurecache
+
+    pages = {"NL": NL.createLayoutNL, "UK": UK.createLayoutUK, "USA": USA.createLayoutUS,
+             "Comparison": comparison.createLayoutComparison}
+
+    results = []
+    for name, build in pages.items():
+        figurecache.CACHE_FIGURES = False
+        uncachedMs = measure(build, repeats)
+        figurecache.CACHE_FIGURES = True
+        figurecache.clearFigures()
+        firstMs = measure(build, 1)
+        cachedMs = measure(build, repeats)
+        results.append({"page": name, "uncached_ms": round(uncachedMs), "first_ms": round(firstMs), "cached_ms": round(cachedMs, 2)})
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("page        without cache (ms)  first view (ms)  later views (ms)")
+    for result in compare():
+        print("{page:<11} {uncached_ms:>18} {first_ms:>16} {cached_ms:>17}".format(**result))
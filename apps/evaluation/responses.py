@@ -0,0 +1,77 @@
+## SERIALISED RESPONSES BENCHMARK CODE -----------------------------------------
+
+# This file compares the responses of the callback of the US choropleth when Dash serialises the figure
+# and when the callback returns the figure serialised once per bundle (see responses.py).
+# For each level it reports the time per request and the bytes that are sent, uncompressed and compressed.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.responses
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import time
+import statistics
+from apps.evaluation.lod import loadBundle
+
+## MEASURE RESPONSES -----------------------------------------------------------
+
+# Request the choropleth a number of times
+def measure(client, level, encoding, repeats):
+    """ Requests the US choropleth of a level through the callback, as the browser does.
+
+        Parameters:
+        client (flask test client): client of the dashboard server
+        level (string): level of the choropleth, "states" or "counties"
+        encoding (string): encodings the client accepts, such as "gzip"
+        repeats (int): number of requests, the median request is reported
+
+        Returns:
+        milliseconds (float): median time per request
+        size (int): number of bytes of the response as sent
+    """
+    from apps.visualisation import geoassets
+    store = geoassets.figureStore('counties_USA')
+    body = {"output": store + ".data", "outputs": {"id": store, "property": "data"},
+            "inputs": [{"id": "US-location-dropwdown", "property": "value", "value": level}],
+            "changedPropIds": ["US-location-dropwdown.value"]}
+    times = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        response = client.post("/_dash-update-component", json=body, headers={"Accept-Encoding": encoding})
+        size = len(response.get_data())
+        times.append(time.perf_counter() - start)
+    return 1000 * statistics.median(times), size
+
+# Measure both levels with and without serialised figures
+def compare(repeats=10):
+    """ Measures the callback of the US choropleth returning the figure and returning the serialised figure.
+        The figure cache is filled first, so only serialising and compressing is measured.
+
+        Parameter:
+        repeats (int): number of requests per level and approach
+
+        Returns:
+        results (list): time and bytes per level, approach and accepted encoding
+    """
+    loadBundle()
+    from app import server
+    from apps.visualisation import USA, responses
+
+    client = server.test_client()
+    results = []
+    for level in ["states", "counties"]:
+        for serialised in [False, True]:
+            responses.SERIALISE_OUTPUTS = serialised
+            for encoding in ["identity", "gzip"]:
+                # First request creates the figure (and serialises it), so it is not measured
+                measure(client, level, encoding, 1)
+                milliseconds, size = measure(client, level, encoding, repeats)
+                results.append({"level": level, "approach": "serialised" if serialised else "figure", "encoding": encoding,
+                                "ms": round(milliseconds, 1), "kb": round(size / 1024)})
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("level     approach    encoding  time (ms)  sent (kB)")
+    for result in compare():
+        print("{level:<9} {approach:<11} {encoding:<9} {ms:>9} {kb:>10}".format(**result))
@@ -0,0 +1,165 @@
+## SODA STAND-IN CODE ----------------------------------------------------------
+
+# This file contains a local stand-in for a Socrata Open Data API (SODA) endpoint, such as data.cdc.gov,
+# that serves a csv file. It supports the parts of SoQL that the retrieval code uses:
+# $select (columns, max(column) AS name, count(*) AS name), $where (column='value'), $order, $limit and $offset.
+# Like the real endpoint, it returns at most a maximum number of rows per request, whatever $limit asks for.
+#
+# Compare the original CDC retrieval with the paged retrieval of soda.py (from the main folder of the dashboard):
+# python -m apps.evaluation.sodastandin [path to csv file]
+# Without a path, the local backup file of the US county data is served.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import sys
+import tempfile
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+
+## STAND-IN SETTINGS -----------------------------------------------------------
+
+# Number of rows returned if a request has no $limit
+DEFAULT_LIMIT = 1000
+
+## SODA STAND-IN ---------------------------------------------------------------
+
+# Answer SoQL queries on a csv file
+def answerQuery(data, parameters, maxLimit):
+    """ Answers a SoQL query on a dataset.
+
+        Parameters:
+        data (dataframe): dataset that is served, all values as text
+        parameters (dict): SoQL parameters of the request, such as {"$limit": "1000"}
+        maxLimit (int): maximum number of rows per request
+
+        Returns:
+        result (dataframe): result of the query
+    """
+    result = data
+
+    # Filter on column='value'
+    if "$where" in parameters:
+        column, value = parameters["$where"].split("=", 1)
+        result = result[result[column.strip()] == value.strip().strip("'")]
+
+    # Aggregates: max(column) AS name and count(*) AS name
+    select = parameters.get("$select", "")
+    if select.startswith("max(") or select.startswith("count("):
+        expression, name = [part.strip() for part in select.split(" AS ")]
+        if expression == "count(*)":
+            return pd.DataFrame({name: [str(len(result))]})
+        column = expression[len("max("):-1]
+        return pd.DataFrame({name: [result[column].max()]})
+
+    if "$order" in parameters:
+        result = result.sort_values(parameters["$order"], kind="mergesort")
+    if select:
+        result = result[[column.strip() for column in select.split(",")]]
+
+    # Page through rows, never more than maxLimit rows per request
+    offset = int(parameters.get("$offset", 0))
+    limit = min(int(parameters.get("$limit", DEFAULT_LIMIT)), maxLimit)
+    return result.iloc[offset:offset + limit]
+
+# Start stand-in in a background thread
+def startStandIn(path, maxLimit=50000):
+    """ Starts a local SODA stand-in that serves a csv file.
+
+        Parameters:
+        path (string): path of the csv file to serve
+        maxLimit (int): maximum number of rows per request
+
+        Returns:
+        server (ThreadingHTTPServer): running stand-in, keeps count of the bytes it sent in server.bytesSent
+        resource (string): url of the served SODA resource
+    """
+    data = pd.read_csv(path, dtype=str, keep_default_na=False)
+
+    class SodaHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urllib.parse.urlparse(self.path)
+            parameters = dict(urllib.parse.parse_qsl(parsed.query))
+            try:
+                payload = answerQuery(data, parameters, maxLimit).to_csv(index=False).encode("utf-8")
+            except Exception as error:
+                self.send_error(400, str(error))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            with self.server.lock:
+                self.server.bytesSent += len(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SodaHandler)
+    server.bytesSent = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    resource = "http://127.0.0.1:" + str(server.server_port) + "/resource/standin.csv"
+    return server, resource
+
+## COMPARE RETRIEVAL -----------------------------------------------------------
+
+# Compare original retrieval with paged retrieval of the latest rows
+def compare(path, maxLimit=50000):
+    """ Retrieves the latest rows of the US county data from the stand-in,
+        with the original approach ($limit=10000, then filter on latest date)
+        and with the paged retrieval of soda.py, and reports completeness and payload size.
+
+        Parameters:
+        path (string): path of the csv file to serve
+        maxLimit (int): maximum number of rows per request of the stand-in
+
+        Returns:
+        results (list): rows at the latest date, expected rows and bytes sent per approach
+    """
+    from apps.preparation import retrieval, soda, sourcecache
+
+    # Keep the real source cache untouched
+    sourcecache.CACHE_FOLDER = tempfile.mkdtemp()
+    query = retrieval.SOURCES["vaccLocUSCounty"]["query"]
+    server, resource = startStandIn(path, maxLimit)
+    served = pd.read_csv(path, dtype=str, keep_default_na=False)
+    expected = int((served[query["latest"]] == served[query["latest"]].max()).sum())
+    results = []
+
+    # Original approach: fixed number of rows of every date and column, then filter on latest date
+    server.bytesSent = 0
+    data = soda.runQuery(resource + "?$limit=10000")
+    latest = data[data[query["latest"]] == data[query["latest"]].max()]
+    results.append({"approach": "original", "rows": len(latest), "expected": expected, "bytes": server.bytesSent})
+
+    # Paged approach: needed columns of latest date only, pages in parallel, checked for truncation
+    server.bytesSent = 0
+    try:
+        payloadPath, modified = soda.fetchLatest(resource, query)
+        rows = len(pd.read_csv(payloadPath))
+    except ValueError as error:
+        print("Paged retrieval detected an incomplete result: " + str(error))
+        rows = 0
+    results.append({"approach": "paged", "rows": rows, "expected": expected, "bytes": server.bytesSent})
+
+    server.shutdown()
+    return results
+
+## RUN COMPARISON --------------------------------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        path = "data/backup/vaccLocUSCounty.csv"
+
+    print("approach   latest rows  expected        bytes")
+    for result in compare(path):
+        print("{approach:<10} {rows:>11} {expected:>9} {bytes:>12}".format(**result))
+
+    # A stand-in that returns fewer rows than a page asks for must be detected, not silently used
+    print("\nWith a stand-in that returns at most 500 rows per request:")
+    for result in compare(path, maxLimit=500):
+        print("{approach:<10} {rows:>11} {expected:>9} {bytes:>12}".format(**result))
@@ -0,0 +1,50 @@
+## STARTUP BENCHMARK CODE ------------------------------------------------------
+
+# This file measures what the county datasets of the US cost at launch, now that they are prepared on first use
+# (see LAZY_SOURCES in preparation.py). It starts the preparation from the local backup files and reports
+# the time and memory use (RSS) of the launch, and of the first use of the county map afterwards.
+# Without lazy preparation, the launch would take both.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.startup
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import time
+from apps.evaluation.ingest import peakMemory
+
+## MEASURE STARTUP -------------------------------------------------------------
+
+# Measure launch and first use of the county map
+def measure():
+    """ Prepares the datasets from the local backup files, then uses the county map for the first time.
+        Should run in a fresh process, because the peak memory use of a process cannot be reset.
+
+        Returns:
+        result (dict): time and peak memory use after launch and after the first use of the county map
+    """
+    os.environ["VAXOSCOPE_BOOT"] = "backup"
+    baseline = peakMemory()
+    start = time.perf_counter()
+    from apps.preparation import preparation
+    launchSeconds = time.perf_counter() - start
+    launchMemory = peakMemory()
+
+    start = time.perf_counter()
+    preparation.getBundle().vaccLocMapCountyUS
+    firstUseSeconds = time.perf_counter() - start
+
+    return {"lazy": list(preparation.LAZY_SOURCES),
+            "baseline_rss_mb": round(baseline, 1),
+            "launch_seconds": round(launchSeconds, 2), "launch_rss_mb": round(launchMemory, 1),
+            "first_use_seconds": round(firstUseSeconds, 2), "first_use_rss_mb": round(peakMemory(), 1)}
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    result = measure()
+    print("Prepared on first use: " + ", ".join(result["lazy"]))
+    print("                     seconds  peak RSS (MB)")
+    print("baseline             {0:>7} {1:>14}".format("", result["baseline_rss_mb"]))
+    print("launch               {launch_seconds:>7} {launch_rss_mb:>14}".format(**result))
+    print("first use of county  {first_use_seconds:>7} {first_use_rss_mb:>14}".format(**result))
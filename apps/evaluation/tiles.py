@@ -0,0 +1,84 @@
+## VECTOR TILES BENCHMARK CODE -------------------------------------------------
+
+# This file measures the tile-based mode of the US county map (see tiles.py).
+# For a map of the usual size centred on the United States, it requests the tiles of the view at several zoom levels
+# from the tile endpoint, and reports the number of tiles, the bytes transferred and the time to make them.
+# For comparison it reports the size of the county choropleth and of the geography asset it loads.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.tiles
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import math
+import time
+from apps.evaluation.lod import loadBundle
+
+## MEASURE TILES ---------------------------------------------------------------
+
+# Tiles of a view of the map
+def viewTiles(zoom, lon=-98, lat=39, width=700, height=450, tileSize=512):
+    """ Lists the tiles that a map of a size needs to show a view at a zoom level.
+
+        Parameters:
+        zoom (int): zoom level of the view
+        lon (float): longitude of the centre of the view
+        lat (float): latitude of the centre of the view
+        width (int): width of the map in pixels
+        height (int): height of the map in pixels
+        tileSize (int): size in pixels at which a tile is drawn
+
+        Returns:
+        tiles (list): column and row of every tile of the view
+    """
+    count = 2 ** zoom
+    centreX = (lon + 180) / 360 * count
+    centreY = (1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2 * count
+    columns = range(max(0, math.floor(centreX - width / 2 / tileSize)), min(count, math.floor(centreX + width / 2 / tileSize) + 1))
+    rows = range(max(0, math.floor(centreY - height / 2 / tileSize)), min(count, math.floor(centreY + height / 2 / tileSize) + 1))
+    return [(x, y) for x in columns for y in rows]
+
+# Measure the views at several zoom levels
+def compare(zooms=range(2, 9)):
+    """ Requests the tiles of the view at several zoom levels, each time with an empty tile cache.
+
+        Parameter:
+        zooms (range): zoom levels to measure
+
+        Returns:
+        results (list): number of tiles, bytes and time per zoom level
+        figure (dict): size of the county choropleth and of its geography asset
+    """
+    bundle = loadBundle()
+    from app import server
+    from apps.preparation import geometry
+    from apps.visualisation import USA, tiles, geoassets
+
+    client = server.test_client()
+    results = []
+    for zoom in zooms:
+        # First request projects the geography of the zoom level, so it is not measured
+        tiles.zoomShapes(zoom)
+        tiles.madeTiles.clear()
+        size = 0
+        start = time.perf_counter()
+        for x, y in viewTiles(zoom):
+            response = client.get("/tiles/countiesUS/" + str(bundle.version) + "/" + str(zoom) + "/" + str(x) + "/" + str(y) + ".pbf")
+            size += len(response.data)
+        milliseconds = 1000 * (time.perf_counter() - start)
+        results.append({"zoom": zoom, "tiles": len(viewTiles(zoom)), "kb": round(size / 1024, 1), "ms": round(milliseconds)})
+
+    choropleth = USA.createLocationMapUS(bundle, "counties").to_json()
+    asset = geoassets.assetPath("countiesUS", geometry.chooseTolerance("countiesUS", 1.5))
+    figure = {"figure_kb": round(len(choropleth.encode("utf-8")) / 1024), "asset_kb": round(os.path.getsize(asset) / 1024)}
+    return results, figure
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    results, figure = compare()
+    print("zoom  tiles  view (kB)  view (ms)")
+    for result in results:
+        print("{zoom:>4} {tiles:>6} {kb:>10} {ms:>10}".format(**result))
+    print()
+    print("County choropleth: {figure_kb} kB figure and {asset_kb} kB geography asset.".format(**figure))
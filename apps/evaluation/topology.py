@@ -0,0 +1,78 @@
+## TOPOLOGY BENCHMARK CODE -----------------------------------------------------
+
+# This file compares the encodings of the shapes of the four choropleths (see topology.py and geoassets.py).
+# For each map it reports the size and serialisation time of the figure with its shapes embedded as GeoJSON
+# (the px.choropleth payload), the size of the GeoJSON and TopoJSON assets (also compressed with gzip),
+# and the time to encode the topology and to decode it again.
+#
+# Usage (from the main folder of the dashboard):
+# python -m apps.evaluation.topology
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import gzip
+import json
+import time
+from apps.evaluation.lod import loadBundle, measure
+
+## MEASURE ENCODINGS -----------------------------------------------------------
+
+# Time a function
+def timed(function):
+    """ Runs a function once.
+
+        Parameter:
+        function (function): function to run
+
+        Returns:
+        result (any): result of the function
+        milliseconds (float): time the function took
+    """
+    start = time.perf_counter()
+    result = function()
+    return result, 1000 * (time.perf_counter() - start)
+
+# Measure every map with both encodings
+def compare(repeats=5):
+    """ Measures the payload of every choropleth with embedded GeoJSON, and its shapes as GeoJSON and TopoJSON asset.
+
+        Parameter:
+        repeats (int): number of runs of the figure serialisation
+
+        Returns:
+        results (list): sizes and times per map
+    """
+    bundle = loadBundle()
+    from apps.preparation import geometry, topology
+    from apps.visualisation import NL, UK, USA, geoassets
+
+    maps = {"NL municipalities": ("municipalitiesNL", None, lambda: NL.createLocationMapNL(bundle)),
+            "UK local authorities": ("ltlaUK", None, lambda: UK.createLocationMapUK(bundle)),
+            "US counties": ("countiesUS", 1.5, lambda: USA.createLocationMapUS(bundle, "counties")),
+            "US states": ("statesUS", 1, lambda: USA.createLocationMapUS(bundle, "states"))}
+
+    results = []
+    for name, (geometryName, scale, build) in maps.items():
+        tolerance = geometry.chooseTolerance(geometryName, scale)
+        geojson, extension = geoassets.encodeAsset(geometryName, tolerance, "geojson")
+        topojson, topojsonMs = timed(lambda: geoassets.encodeAsset(geometryName, tolerance, "topojson")[0])
+        decoded, decodeMs = timed(lambda: topology.decodeTopology(json.loads(topojson)))
+
+        # Figure as px.choropleth sends it with the shapes embedded
+        shapes = json.loads(geojson)
+        embedded, embeddedMs = measure(lambda: build().update_traces(geojson=shapes), repeats)
+
+        results.append({"map": name, "tolerance": tolerance,
+                        "embedded_kb": round(embedded / 1024), "embedded_ms": round(embeddedMs),
+                        "geojson_kb": round(len(geojson) / 1024), "geojson_gzip_kb": round(len(gzip.compress(geojson)) / 1024),
+                        "topojson_kb": round(len(topojson) / 1024), "topojson_gzip_kb": round(len(gzip.compress(topojson)) / 1024),
+                        "encode_ms": round(topojsonMs), "decode_ms": round(decodeMs),
+                        "same_shapes": len(decoded["features"]) == len(shapes["features"])})
+    return results
+
+## RUN BENCHMARK ---------------------------------------------------------------
+
+if __name__ == '__main__':
+    print("map                   tolerance  embedded (kB)  embedded (ms)  geojson (kB)  gzip (kB)  topojson (kB)  gzip (kB)  encode (ms)  decode (ms)  same shapes")
+    for result in compare():
+        print("{map:<21} {tolerance:>9} {embedded_kb:>14} {embedded_ms:>14} {geojson_kb:>13} {geojson_gzip_kb:>10} "
+              "{topojson_kb:>14} {topojson_gzip_kb:>10} {encode_ms:>12} {decode_ms:>12} {same_shapes!s:>12}".format(**result))
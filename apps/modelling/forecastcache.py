@@ -0,0 +1,100 @@
+## FORECAST CACHE CODE ---------------------------------------------------------
+
+# This file contains the on-disk cache of the forecasts of vaccination coverage.
+# Fitting a forecasting model takes long, while the historical coverage of a country often did not change since the last fit.
+# Every forecast is stored under a fingerprint of the series it was trained on and the settings of the model,
+# so the same series with the same settings returns the stored forecast, also after the dashboard restarts.
+# Only the most recently used forecasts are kept, older forecasts are removed when a new forecast is stored.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import json
+import hashlib
+import pandas as pd
+from apps.preparation import sourcecache
+
+## CACHE SETTINGS --------------------------------------------------------------
+
+# Use the stored forecasts (True) or fit every forecast again (False)
+CACHE_FORECASTS = True
+
+# Folder in which the forecasts are stored
+CACHE_FOLDER = "data/cache/forecasts"
+
+# Largest number of stored forecasts: the forecasts of the bundle in use (one per country) and a few earlier ones
+MAX_FORECASTS = 12
+
+## CACHED FORECASTS ------------------------------------------------------------
+
+# Calculate fingerprint of a training series
+def fingerprint(trainingSeries, settings):
+    """ Calculates the SHA-256 hash of a training series together with the settings of the model.
+
+        Parameters:
+        trainingSeries (dataframe): historical vaccination coverage, with columns date and coverage_full_dose
+        settings (dict): settings of the model and the forecast, as JSON compatible values
+
+        Returns:
+        key (string): hexadecimal SHA-256 hash, the same for the same series and settings
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(trainingSeries[['date', 'coverage_full_dose']], index=False).values.tobytes())
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+# Load a stored forecast
+def loadForecast(key):
+    """ Loads the forecast that was stored under a fingerprint.
+
+        Parameter:
+        key (string): fingerprint of the training series and settings, see fingerprint
+
+        Returns:
+        forecast (dataframe): stored forecast, None if there is none (or the cache is not used)
+    """
+    path = os.path.join(CACHE_FOLDER, key + ".parquet")
+    if not CACHE_FORECASTS or not os.path.exists(path):
+        return None
+    try:
+        forecast = pd.read_parquet(path)
+        # Mark the forecast as used, so it is kept when older forecasts are removed, see pruneForecasts
+        os.utime(path)
+        return forecast
+    except Exception as error:
+        print("Note: could not read stored forecast " + path + ": " + str(error))
+        return None
+
+# Store a forecast
+def storeForecast(key, forecast):
+    """ Stores a forecast under a fingerprint, the file is written completely before it is used.
+        A forecast that cannot be stored is only made again next time.
+
+        Parameters:
+        key (string): fingerprint of the training series and settings, see fingerprint
+        forecast (dataframe): forecast with predicted values and confidence intervals
+    """
+    if not CACHE_FORECASTS:
+        return
+    path = os.path.join(CACHE_FOLDER, key + ".parquet")
+    try:
+        os.makedirs(CACHE_FOLDER, exist_ok=True)
+        temporaryPath = sourcecache.temporaryFile(path)
+        forecast.to_parquet(temporaryPath)
+        os.replace(temporaryPath, path)
+    except Exception as error:
+        print("Note: could not store forecast " + path + ": " + str(error))
+        return
+    pruneForecasts()
+
+# Remove forecasts that were not used recently
+def pruneForecasts():
+    """ Removes the stored forecasts that were least recently stored or loaded, so at most MAX_FORECASTS are kept.
+        A forecast that cannot be removed is tried again after the next forecast is stored.
+    """
+    try:
+        paths = [os.path.join(CACHE_FOLDER, fileName) for fileName in os.listdir(CACHE_FOLDER) if fileName.endswith(".parquet")]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[MAX_FORECASTS:]:
+            os.remove(path)
+    except OSError as error:
+        print("Note: could not remove old forecasts from " + CACHE_FOLDER + ": " + str(error))
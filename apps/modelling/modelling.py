@@ -12,6 +12,27 @@ from datetime import datetime as dt
 from datetime import timedelta
 import re
 from apps.preparation import preparation
+from apps.preparation import lazy
+from apps.modelling import forecastcache
+
+## MODELLING SETTINGS ----------------------------------------------------------
+
+# Interval of the historical vaccination coverage of each country, see predictFutureCoverage
+COVERAGE_INTERVALS = {"NL": "weekly", "UK": "daily", "US": "daily"}
+
+# Settings of the ARIMA time-series forecasting model, see predictFutureCoverage
+ARIMA_SETTINGS = {"start_p": 1, "start_q": 1,
+                  "test": 'adf',            # use adftest to find optimal 'd'
+                  "max_p": 3, "max_q": 3,   # maximum p and q
+                  "m": 1,                   # frequency of series
+                  "d": None,                # let model determine 'd'
+                  "seasonal": False,        # No Seasonality
+                  "start_P": 0,
+                  "D": 0,
+                  "trace": True,
+                  "error_action": 'ignore',
+                  "suppress_warnings": True,
+                  "stepwise": True}
 
 ## PREDICTIVE MODELLING --------------------------------------------------------
 
@@ -21,6 +42,7 @@ print("Modelling data ...")
 # Predict future vaccination coverage
 def predictFutureCoverage(countryVaccCov, interval):
     """ Forecast vaccination coverage level for upcoming month.
+        A forecast of the same historical data with the same settings is taken from the forecast cache, see forecastcache.py.
 
         Parameter:
         countryVaccCov (dataframe): dataset with historical vaccination coverage levels.
@@ -36,19 +58,15 @@ def predictFutureCoverage(countryVaccCov, interval):
         trainingSeries = trainingSeries.dropna()
         trainingSeries = trainingSeries.reset_index()
 
+        # Use the stored forecast if the historical data and settings did not change since it was made
+        key = forecastcache.fingerprint(trainingSeries, {"arima": ARIMA_SETTINGS, "interval": interval, "pmdarima": pm.__version__})
+        forecast = forecastcache.loadForecast(key)
+        if forecast is not None:
+            print("Took forecast from cache, the historical data did not change.")
+            return forecast
+
         # Create ARIMA time-series forecasting model
-        forecastModel = pm.auto_arima(  trainingSeries.coverage_full_dose, start_p=1, start_q=1,
-                                          test='adf',       # use adftest to find optimal 'd'
-                                          max_p=3, max_q=3, # maximum p and q
-                                          m=1,              # frequency of series
-                                          d=None,           # let model determine 'd'
-                                          seasonal=False,   # No Seasonality
-                                          start_P=0,
-                                          D=0,
-                                          trace=True,
-                                          error_action='ignore',
-                                          suppress_warnings=True,
-                                          stepwise=True)
+        forecastModel = pm.auto_arima(trainingSeries.coverage_full_dose, **ARIMA_SETTINGS)
 
 
         # Forecast vaccination coverage for next month
@@ -78,6 +96,9 @@ def predictFutureCoverage(countryVaccCov, interval):
             dates = pd.date_range(last_date + timedelta(days=1), periods = 4, name='date', freq='W-SUN')
         forecast['date'] = dates
 
+        # Store forecast for the next refresh and launch, see forecastcache.py
+        forecastcache.storeForecast(key, forecast)
+
     #If forecast fails due to incompatible data, then create empty table
     except:
         forecast = pd.DataFrame()
@@ -90,161 +111,222 @@ def predictFutureCoverage(countryVaccCov, interval):
     # Return forcasted coverage
     return forecast
 
+# Predict future vaccination coverage for all three countries
+def predictFutureCoverages(datasets):
+    """ Forecasts vaccination coverage for upcoming month for NL, UK and US, without publishing the forecasts yet.
+
+        By calling:
+        Function to forecast coverage for NL, UK and US dataset
+        See predictFutureCoverage
+
+        Parameter:
+        datasets (dict): prepared datasets containing vaccCovNL, vaccCovUK and vaccCovUS (or their placeholders), see preparation code
+
+        Returns:
+        predictions (dict): vaccCovPredNL, vaccCovPredUK and vaccCovPredUS forecasts, see refreshFutureCoveragePrediction
+    """
+    predictions = {}
+    for country, interval in COVERAGE_INTERVALS.items():
+        predictions["vaccCovPred" + country] = predictFutureCoverage(lazy.resolve(datasets["vaccCov" + country]), interval)
+    return predictions
+
 # Refresh pediction of future vaccination coverage for two of three countries:
 def refreshFutureCoveragePrediction():
     """ Forecasts vaccination coverage for upcoming month for NL, UK and US.
+        Publishes a new bundle with the datasets in use and the new forecasts.
 
         By calling:
         Function to forecast coverage for NL, UK and US dataset
-        See predictFutureCoverage
+        See predictFutureCoverages
 
         Requires:
-        vaccCovNL (dataframe) to be made available by preparation code
-        vaccCovUK (dataframe) to be made available by preparation code
-        vaccCovUS (dataframe) to be made available by preparation code
+        vaccCovNL (dataframe) to be included in the bundle in use
+        vaccCovUK (dataframe) to be included in the bundle in use
+        vaccCovUS (dataframe) to be included in the bundle in use
 
 
-        Makes the following datasets available:
+        Adds the following datasets to the bundle:
         vaccCovPredNL (dataframe): forecast for vaccination coverage in next month for NL
         vaccCovPredUK (dataframe): forecast for vaccination coverage in next month for UK
         vaccCovPredUS (dataframe): forecast for vaccination coverage in next month for US
     """
-    # Predict future vaccination coverage for NL
-    global vaccCovPredNL
-    vaccCovPredNL = predictFutureCoverage(preparation.vaccCovNL, "weekly")
-
-    # Predict future vaccination coverage for UK
-    global vaccCovPredUK
-    vaccCovPredUK = predictFutureCoverage(preparation.vaccCovUK, "daily")
+    datasets = preparation.currentDatasets()
+    datasets.update(predictFutureCoverages(datasets))
+    preparation.publishBundle(datasets)
 
-    # Predict future vaccination coverage for US
-    global vaccCovPredUS
-    vaccCovPredUS = predictFutureCoverage(preparation.vaccCovUS, "daily")
+# Predict the vaccination coverage of each country when it is first used
+def predictFutureCoveragesLazily():
+    """ Publishes a new bundle with the datasets in use, in which the forecast of each country is a placeholder
+        that forecasts vaccination coverage for upcoming month the first time it is used, see lazy.LazyDatasets.
 
-# Predict at dashboard launch
-refreshFutureCoveragePrediction()
+        Requires:
+        vaccCovNL (dataframe or placeholder) to be included in the bundle in use
+        vaccCovUK (dataframe or placeholder) to be included in the bundle in use
+        vaccCovUS (dataframe or placeholder) to be included in the bundle in use
+
+        Adds the following datasets to the bundle:
+        vaccCovPredNL (placeholder): forecast for vaccination coverage in next month for NL
+        vaccCovPredUK (placeholder): forecast for vaccination coverage in next month for UK
+        vaccCovPredUS (placeholder): forecast for vaccination coverage in next month for US
+    """
+    datasets = preparation.currentDatasets()
+    for country, interval in COVERAGE_INTERVALS.items():
+        history, name = datasets["vaccCov" + country], "vaccCovPred" + country
+        group = lazy.LazyDatasets(lambda kept, history=history, interval=interval, name=name: {name: predictFutureCoverage(lazy.resolve(history), interval)})
+        datasets[name] = lazy.LazyDataset(group, name)
+    preparation.publishBundle(datasets)
+
+# Predict at dashboard launch, or on first use of each forecast (see preparation.LAZY_START)
+if preparation.LAZY_START:
+    predictFutureCoveragesLazily()
+else:
+    refreshFutureCoveragePrediction()
 
 ## TARGET REPORT MODELLING -----------------------------------------------------
 
 # Target recommendation for age group in NL
-def ageTargetRecNL():
+def ageTargetRecNL(bundle):
     """ Determines the top target group in terms of age for NL.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAgeNL (dataframe) to be made available by preparation code
+        vaccAgeNL (dataframe) to be included in bundle
 
         Returns:
         a (string): the top target group in terms of age for NL
     """
 
-    a = preparation.vaccAgeNL
+    a = bundle.vaccAgeNL
     a = a[a["coverage_full_dose"] == a["coverage_full_dose"].min()]["age_group"]
     a = a.to_string(index=False)
     return a
 
 # Target recommendation for age group in UK
-def ageTargetRecUK():
+def ageTargetRecUK(bundle):
     """ Determines the top target group in terms of age for UK.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAgeUK (dataframe) to be made available by preparation code
+        vaccAgeUK (dataframe) to be included in bundle
 
         Returns:
         a (string): the top target group in terms of age for UK
     """
-    a = preparation.vaccAgeUK
+    a = bundle.vaccAgeUK
     a = a[a["coverage_full_dose"] == a["coverage_full_dose"].min()]["age_group"]
     a = a.to_string(index=False)
     return a
 
 # Target recommendation for age group in US
-def ageTargetRecUS():
+def ageTargetRecUS(bundle):
     """ Determines the top target group in terms of age for US.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAgeUS (dataframe) to be made available by preparation code
+        vaccAgeUS (dataframe) to be included in bundle
 
         Returns:
         a (string): the top target group in terms of age for US
     """
-    a = preparation.vaccAgeUS
+    a = bundle.vaccAgeUS
     a = a[a["coverage_full_dose"] == a["coverage_full_dose"].min()]["age_group"]
     a = a.to_string(index=False)
     return a
 
 # Target recommendation for locations in NL
-def locTargetRecNL():
+def locTargetRecNL(bundle):
     """ Determines the top-ten target municipalities in NL.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccLocNL (dataframe) to be made available by preparation code
+        vaccLocNL (dataframe) to be included in bundle
 
         Returns:
         l (string): the top-ten target municipalities in NL
     """
-    l = preparation.vaccLocNL
+    l = bundle.vaccLocNL
     l = l.sort_values(by='coverage_full_dose').iloc[0:10,2].to_string(index=False)
     l = re.sub('\s+',' ',l).strip().replace(" ", ", ")
     return l
 
 # Target recommendation for locations in UK
-def locTargetRecUK():
+def locTargetRecUK(bundle):
     """ Determines the top-ten target lower tier local authorities in UK.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccLocUK (dataframe) to be made available by preparation code
+        vaccLocUK (dataframe) to be included in bundle
 
         Returns:
         l (string): the top-ten target lower tier local authorities in UK
     """
-    l = preparation.vaccLocUK
+    l = bundle.vaccLocUK
     l = l.sort_values(by='coverage_full_dose').iloc[0:10,2].to_string(index=False)
     l = l.replace('\n', ",")
     l = re.sub('\s+',' ',l).strip()
     return l
 
 # Target recommendation for locations in US
-def locTargetRecUS():
+def locTargetRecUS(bundle):
     """ Determines the top-ten target states in US.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccLocStateUS (dataframe) to be made available by preparation code
+        vaccLocStateUS (dataframe) to be included in bundle
 
         Returns:
         l (string): the top-ten target states in US
     """
-    l = preparation.vaccLocUSState
+    l = bundle.vaccLocUSState
     l = l.sort_values(by='coverage_full_dose').iloc[0:10,2].to_string(index=False)
     l = l.replace("\n", ", ")
     l = re.sub('\s+',' ',l).strip()
     return l
 
 # Target recommendation for income group in UK
-def incomeTargetRecUK():
+def incomeTargetRecUK(bundle):
     """ Determines the top target group in terms of income for UK.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccIncomeUK (dataframe) to be made available by preparation code
+        vaccIncomeUK (dataframe) to be included in bundle
 
         Returns:
         i (string): the top target group in terms of income for UK
     """
-    i = preparation.vaccIncomeUK
+    i = bundle.vaccIncomeUK
     i = i[i["coverage_one_dose"] == i["coverage_one_dose"].min()]["income_group"]
     i = i.to_string(index=False)
     return i
 
 # Target recommendation for income group in US
-def incomeTargetRecUS():
+def incomeTargetRecUS(bundle):
     """ Determines the top target group in terms of income for US.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccIncomeUS (dataframe) to be made available by preparation code
+        vaccIncomeUS (dataframe) to be included in bundle
 
         Returns:
         i (string): the top target group in terms of income for US
     """
-    i = preparation.vaccIncomeUS
+    i = bundle.vaccIncomeUS
     # Line below excludes "no income reported" class as this is no clear target group
     i = i[i["income_group"] != "No Income Reported"]
     i = i[i["coverage_full_dose"] == i["coverage_full_dose"].min()]["income_group"]
@@ -252,16 +334,19 @@ def incomeTargetRecUS():
     return i
 
 # County included in dashboard with highest vaccination coverage
-def highestCovComp():
+def highestCovComp(bundle):
     """ Determines which of the three countries in the dashboard has the highest vaccination level.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccCov (dataframe) to be made available by preparation code
+        vaccCov (dataframe) to be included in bundle
 
         Returns:
         c (string): the country with the highest vaccination level
     """
-    c = preparation.vaccCov
+    c = bundle.vaccCov
     c = c[c["coverage_full_dose"]==c["coverage_full_dose"].max()]["country"]
     c = c.to_string(index=False)
     c = c.replace("NL","The Netherlands")
@@ -270,16 +355,19 @@ def highestCovComp():
     return c
 
 # County included in dashboard with highest vaccination unwillingness
-def highestUnwilComp():
+def highestUnwilComp(bundle):
     """ Determines which of the three countries in the dashboard has the highest vaccination unwillingness.
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAttitudes (dataframe) to be made available by preparation code
+        vaccAttitudes (dataframe) to be included in bundle
 
         Returns:
         c (string): the country with the highest vaccination unwillingness
     """
-    u = preparation.vaccAttitudes
+    u = bundle.vaccAttitudes
     u = u[u["unwilling_percentage"]==u["unwilling_percentage"].max()]["country"]
     u = u.to_string(index=False)
     u = u.replace("NL","The Netherlands")
@@ -0,0 +1,284 @@
+## GEOMETRY CACHE CODE ---------------------------------------------------------
+
+# This file contains the cache of the country geographies that are used to draw the maps.
+# The geography files never change between refreshes, so they are read, reprojected and simplified only once.
+# The result is stored as a binary (GeoParquet) file, which loads in milliseconds.
+# A cached geography is only made again if its source file changed.
+# Every geography is kept at several levels of detail: the maps use the coarsest level
+# at which the simplification is still invisible at the size and projection they are shown with.
+# The levels are simplified along the shared borders (see topology.py), so neighbouring shapes never get gaps or slivers,
+# and the finest level is the source geography itself, which the data is joined on.
+# The data is joined on a geography through its key index, which gives the position of the shape of every key,
+# so a join is a vectorised lookup and take instead of indexing and joining both tables on every refresh.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import json
+import math
+import threading
+import numpy as np
+import pandas as pd
+import pyproj
+import geopandas as gpd
+from apps.preparation import sourcecache, topology
+
+## GEOMETRY SETTINGS -----------------------------------------------------------
+
+# Folder in which the cached geographies are stored
+CACHE_FOLDER = "data/cache/geometry"
+
+# Country geographies used by the dashboard.
+# For each geography: the source file, the column to join the data on,
+# and the tolerances (in degrees) of its levels of detail, from fine to coarse.
+# The finest level (tolerance 0) is the unsimplified geography, which is used to join the data on.
+GEOMETRIES = {
+    "municipalitiesNL": {"path": "data/geometry/municipalitiesNL.json", "key": "statnaam", "tolerances": [0, 0.0005, 0.002, 0.005]},
+    "ltlaUK": {"path": "data/geometry/ltlaUK.json", "key": "AREANM", "tolerances": [0, 0.0005, 0.002, 0.005]},
+    "countiesUS": {"path": "data/geometry/countiesUS.json", "key": "id", "tolerances": [0, 0.001, 0.005, 0.02, 0.05]},
+    "statesUS": {"path": "data/geometry/statesUS.json", "key": "name", "tolerances": [0, 0.001, 0.005, 0.02, 0.05]},
+}
+
+# Use levels of detail for the maps (True) or always the finest level (False)
+LEVEL_OF_DETAIL = True
+
+# Size (in pixels) at which the maps are usually shown: five of twelve columns of a full HD screen
+MAP_WIDTH = 700
+MAP_HEIGHT = 450
+
+# Largest simplification (in pixels) that is allowed at the initial view of a map
+PIXEL_TOLERANCE = 0.5
+
+# Factor that users can zoom in on a map before the simplification may become visible
+ZOOM_HEADROOM = 4
+
+# Coordinate reference system of the maps (longitude and latitude)
+CRS = pyproj.CRS.from_epsg(4326)
+
+# Geographies that are already loaded in this process
+loadedGeometries = {}
+geometryLock = threading.Lock()
+
+# Key indexes of the geographies that are already loaded in this process
+keyIndexes = {}
+
+## MAKE GEOMETRY ---------------------------------------------------------------
+
+# Read, reproject and simplify a geography
+def makeGeometry(name, tolerance):
+    """ Reads a geography from its source file, reprojects it to longitude and latitude,
+        and simplifies its shapes along their shared borders, so neighbouring shapes keep fitting together
+        (see topology.simplifyShapes).
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        tolerance (float): tolerance (in degrees) with which the shapes are simplified, 0 to keep the source shapes
+
+        Returns:
+        geometry (geodataframe): geography, indexed on the column to join the data on
+    """
+    settings = GEOMETRIES[name]
+    geometry = gpd.read_file(settings["path"])
+    if geometry.crs is not None and geometry.crs != CRS:
+        geometry = geometry.to_crs(CRS)
+    if tolerance > 0:
+        geometry["geometry"] = gpd.GeoSeries(topology.simplifyShapes(geometry.geometry, tolerance), index=geometry.index, crs=geometry.crs)
+    return geometry.set_index(settings["key"])
+
+## LOAD GEOMETRY ---------------------------------------------------------------
+
+# Load a geography through the cache
+def loadGeometry(name, tolerance=None):
+    """ Loads a geography that is ready to join with the prepared data.
+        The geography is made once and stored in the cache, and only made again if its source file changed.
+        Note: the same geodataframe is returned on every call, so it should not be changed in place.
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        tolerance (float): tolerance of the level of detail, the finest (unsimplified) level if not given
+
+        Returns:
+        geometry (geodataframe): geography, indexed on the column to join the data on
+    """
+    settings = GEOMETRIES[name]
+    if tolerance is None:
+        tolerance = settings["tolerances"][0]
+    status = os.stat(settings["path"])
+    stamp = (status.st_mtime_ns, status.st_size)
+    level = name + "-" + str(tolerance)
+
+    with geometryLock:
+        # Already loaded in this process and source file not touched since
+        if level in loadedGeometries and loadedGeometries[level][0] == stamp:
+            return loadedGeometries[level][1]
+
+        payloadPath = os.path.join(CACHE_FOLDER, level + ".parquet")
+        metaPath = os.path.join(CACHE_FOLDER, level + ".json")
+        sourceHash = sourcecache.fileHash(settings["path"])
+        expected = {"source": settings["path"], "hash": sourceHash, "key": settings["key"],
+                    "tolerance": tolerance, "simplification": "shared arcs", "crs": CRS.to_string()}
+
+        # Use cached geography if it was made from the same source file with the same settings
+        meta = {}
+        if os.path.exists(payloadPath) and os.path.exists(metaPath):
+            with open(metaPath) as file:
+                meta = json.load(file)
+        if meta == expected:
+            geometry = gpd.read_parquet(payloadPath)
+
+        # Otherwise make geography again and store it, write the details last
+        else:
+            geometry = makeGeometry(name, tolerance)
+            os.makedirs(CACHE_FOLDER, exist_ok=True)
+            temporaryPath = sourcecache.temporaryFile(payloadPath)
+            geometry.to_parquet(temporaryPath)
+            os.replace(temporaryPath, payloadPath)
+            temporaryPath = sourcecache.temporaryFile(metaPath)
+            with open(temporaryPath, "w") as file:
+                json.dump(expected, file, indent=2)
+            os.replace(temporaryPath, metaPath)
+
+        loadedGeometries[level] = (stamp, geometry)
+        return geometry
+
+## LEVEL OF DETAIL -------------------------------------------------------------
+
+# Choose the level of detail of a map
+def chooseTolerance(name, scale=None, width=MAP_WIDTH, height=MAP_HEIGHT):
+    """ Chooses the coarsest level of detail of a geography at which the simplification stays invisible,
+        given the size of the map and how the map is projected.
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        scale (float): projection scale of an orthographic map that shows the globe,
+                       the map is fitted to the bounds of the geography if not given
+        width (int): width of the map in pixels
+        height (int): height of the map in pixels
+
+        Returns:
+        tolerance (float): tolerance of the chosen level of detail
+    """
+    tolerances = GEOMETRIES[name]["tolerances"]
+    if not LEVEL_OF_DETAIL:
+        return tolerances[0]
+
+    # Map fitted to the geography: its bounds fill the map (longitudes shrink away from the equator)
+    if scale is None:
+        minLon, minLat, maxLon, maxLat = loadGeometry(name).total_bounds
+        lonSpan = (maxLon - minLon) * math.cos(math.radians((minLat + maxLat) / 2))
+        degreesPerPixel = max(lonSpan / width, (maxLat - minLat) / height)
+
+    # Orthographic map of the globe: the globe fills the smallest side of the map at scale 1
+    else:
+        degreesPerPixel = 360 / (math.pi * min(width, height) * scale)
+
+    # Coarsest level that is still finer than the allowed simplification
+    allowed = PIXEL_TOLERANCE * degreesPerPixel / ZOOM_HEADROOM
+    suitable = [tolerance for tolerance in tolerances if tolerance <= allowed]
+    return max(suitable) if suitable else tolerances[0]
+
+# Shapes of a geography at the level of detail of a map
+def mapShapes(name, scale=None):
+    """ Returns the shapes of a geography at the level of detail that suits the map, see chooseTolerance.
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        scale (float): projection scale of an orthographic map that shows the globe,
+                       the map is fitted to the bounds of the geography if not given
+
+        Returns:
+        shapes (geoseries): shapes of the geography, indexed on the column to join the data on
+    """
+    return loadGeometry(name, chooseTolerance(name, scale)).geometry
+
+## JOIN DATA -------------------------------------------------------------------
+
+# Key index of a geography
+def keyIndex(name):
+    """ Returns the key index of a geography: the join key of every shape, in the order of the shapes,
+        with its hash table already built. The index is built once, and again if the geography was made again.
+
+        Parameter:
+        name (string): name of the geography as defined in GEOMETRIES
+
+        Returns:
+        keys (index): join keys of the geography, the position of a key is the position of its shape
+    """
+    geometry = loadGeometry(name)
+    with geometryLock:
+        indexed = keyIndexes.get(name)
+        if indexed is None or indexed[0] is not geometry:
+            keys = pd.Index(geometry.index)
+            # Builds the hash table of the index, so later lookups only use it
+            keys.get_indexer(keys[:1])
+            indexed = (geometry, keys)
+            keyIndexes[name] = indexed
+    return indexed[1]
+
+# Positions of the shapes of data rows
+def matchKeys(name, keys):
+    """ Looks up the position of the shape of every key in the key index of a geography.
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        keys (series): join keys of the data rows
+
+        Returns:
+        positions (array): position of the shape of every data row, -1 if the geography has no shape for its key
+    """
+    return keyIndex(name).get_indexer(keys.to_numpy())
+
+# Join data on a geography
+def joinData(name, data, column):
+    """ Joins data on the shapes of a geography (the unsimplified source shapes) through its key index.
+        Like a left join: every shape is kept once and shapes without data get missing values (NaN).
+        Data rows without a shape are left out, and of duplicate keys only the first row is used,
+        see joinReport for these rows.
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        data (dataframe): data with one row per location
+        column (string): column of the data with the join keys
+
+        Returns:
+        joined (geodataframe): geography with the columns of the data, indexed on the join key of the geography
+    """
+    geometry = loadGeometry(name)
+    positions = matchKeys(name, data[column])
+
+    # Data row of every shape, -1 if the shape has no data
+    matched = (positions >= 0) & ~data[column].duplicated().to_numpy()
+    rows = np.full(len(geometry), -1)
+    rows[positions[matched]] = np.flatnonzero(matched)
+
+    # Take the data rows in the order of the shapes, rows that do not exist (-1) become missing
+    values = data.drop(columns=column).reset_index(drop=True).reindex(rows)
+    joined = geometry.copy(deep=False)
+    for valueColumn in values.columns:
+        joined[valueColumn] = values[valueColumn].to_numpy()
+    return joined
+
+# Report the keys that could not be joined
+def joinReport(name, data, column):
+    """ Lists the keys of a join of data on a geography that could not be matched one to one, see joinData.
+
+        Parameters:
+        name (string): name of the geography as defined in GEOMETRIES
+        data (dataframe): data with one row per location
+        column (string): column of the data with the join keys
+
+        Returns:
+        report (dataframe): geography, key and problem: "no data" for shapes without data,
+                            "no shape" for data without a shape and "duplicate" for keys with several data rows
+    """
+    keys = keyIndex(name)
+    positions = matchKeys(name, data[column])
+    found = np.zeros(len(keys), dtype=bool)
+    found[positions[positions >= 0]] = True
+
+    problems = {"no data": keys[~found].to_numpy(),
+                "no shape": pd.unique(data[column][positions < 0]),
+                "duplicate": pd.unique(data[column][data[column].duplicated()])}
+    report = pd.DataFrame({"geography": name,
+                           "key": np.concatenate([np.asarray(values, dtype=object) for values in problems.values()]),
+                           "problem": np.repeat(list(problems), [len(values) for values in problems.values()])})
+    return report
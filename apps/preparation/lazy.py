@@ -0,0 +1,141 @@
+## LAZY DATASETS CODE ----------------------------------------------------------
+
+# This file contains datasets that are only retrieved and prepared when they are first used.
+# Some datasets are large but rarely shown, such as the county map of the US that is only drawn when a user picks it.
+# These are added to a bundle as placeholders, which the bundle replaces by the dataset the first time it is read.
+# Datasets that are prepared together (such as a table and its map) form one group and are loaded at the same time.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import threading
+
+## LAZY DATASETS ---------------------------------------------------------------
+
+# Group of datasets that are loaded together on first use
+class LazyDatasets:
+    """ Group of datasets that are loaded (retrieved and prepared) together, the first time one of them is used,
+        and kept afterwards. Requests that use the group while it loads wait for the same load.
+
+        Attributes:
+        load (function): function that receives the datasets kept from the previous group
+                         and returns the loaded datasets, as dict of dataset name and dataset
+        kept (dict): datasets of the previous group, which the load function may reuse
+        fingerprints (dict): version of the sources the (kept or loaded) datasets were prepared from,
+                             see preparation.sourcesChanged. The load function may replace it while it holds the lock,
+                             it is never changed in place, so other threads can copy it at any time.
+    """
+
+    def __init__(self, load, kept=None, fingerprints=None):
+        self.load = load
+        self.kept = kept or {}
+        self.fingerprints = fingerprints or {}
+        self.datasets = None
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        """ Returns a dataset of the group, loading the group first if needed.
+
+            Parameter:
+            name (string): name of the dataset
+
+            Returns:
+            dataset (dataframe or geodataframe): loaded dataset
+        """
+        if self.datasets is None:
+            with self.lock:
+                if self.datasets is None:
+                    self.datasets = self.load(self.kept)
+                    # Loaded datasets no longer need the function and datasets they were loaded with
+                    self.load, self.kept = None, {}
+        return self.datasets[name]
+
+    def isLoaded(self):
+        """ Determines if the group was loaded already.
+
+            Returns:
+            Boolean: true if the datasets of the group are loaded, false if not.
+        """
+        return self.datasets is not None
+
+    def warm(self):
+        """ Returns the datasets to keep for a next group: the loaded datasets,
+            or if the group was never loaded, the datasets that it kept itself.
+
+            Returns:
+            datasets (dict): dataset name and dataset
+        """
+        return dict(self.datasets) if self.isLoaded() else dict(self.kept)
+
+# Placeholder of a dataset in a bundle
+class LazyDataset:
+    """ Placeholder of a dataset of a group of lazy datasets, see LazyDatasets.
+        A bundle that contains a placeholder returns the dataset itself, see preparation.DatasetBundle.
+
+        Attributes:
+        group (LazyDatasets): group that loads the dataset
+        name (string): name of the dataset
+    """
+    __slots__ = ("group", "name")
+
+    def __init__(self, group, name):
+        self.group = group
+        self.name = name
+
+    def get(self):
+        """ Returns the dataset, loading its group first if needed. """
+        return self.group.get(self.name)
+
+    def isLoaded(self):
+        """ Determines if the dataset was loaded already. """
+        return self.group.isLoaded()
+
+# Resolve a placeholder
+def resolve(value):
+    """ Returns the dataset of a placeholder, or the value itself if it is no placeholder.
+        A group may load a placeholder of another group (such as the county datasets within the US datasets),
+        which is resolved as well.
+
+        Parameter:
+        value (LazyDataset, dataframe or geodataframe): dataset or its placeholder
+
+        Returns:
+        dataset (dataframe or geodataframe): dataset
+    """
+    while isinstance(value, LazyDataset):
+        value = value.get()
+    return value
+
+# Versions of the sources of placeholders
+def warmFingerprints(values):
+    """ Collects the versions of the sources that the groups of placeholders were prepared from,
+        including those recorded by groups that were loaded after their bundle was published.
+
+        Parameter:
+        values (dict): dataset name and dataset or placeholder
+
+        Returns:
+        fingerprints (dict): source name and version, see preparation.sourcesChanged
+    """
+    fingerprints = {}
+    for value in values.values():
+        if isinstance(value, LazyDataset):
+            fingerprints.update(value.group.fingerprints)
+    return fingerprints
+
+# Datasets to keep from placeholders or datasets in use
+def warmDatasets(values):
+    """ Collects the datasets that are already loaded from a dict of datasets and placeholders,
+        so a next group of lazy datasets can reuse them if their sources were not modified.
+
+        Parameter:
+        values (dict): dataset name and dataset or placeholder
+
+        Returns:
+        datasets (dict): dataset name and loaded dataset, empty if none are loaded
+    """
+    datasets = {}
+    for name, value in values.items():
+        if isinstance(value, LazyDataset):
+            datasets.update({warmName: dataset for warmName, dataset in value.group.warm().items() if warmName in values})
+        elif value is not None:
+            datasets[name] = value
+    return datasets
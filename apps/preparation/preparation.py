@@ -1,15 +1,32 @@
 ## DATA PREPARATION CODE -------------------------------------------------------
 
 # This file contains data retrieval and preparation.
-# The prepared datasets are made available as global variables.
+# The online sources are downloaded (in parallel) by the retrieval code, see retrieval.py.
+# The prepared datasets are made available as one read-only bundle, see DatasetBundle and getBundle.
 # The prepared datasets are used by the modelling and visualisation code.
 
 ## IMPORT LIBRARIES ------------------------------------------------------------
 import pandas as pd
-import geopandas as gpd
 import numpy as np
-import pyproj
 import datetime
+import os
+import threading
+from types import MappingProxyType
+from apps.preparation import retrieval
+from apps.preparation import snapshot
+from apps.preparation import schema
+from apps.preparation import geometry
+from apps.preparation import lazy
+
+## PREPARATION SETTINGS --------------------------------------------------------
+
+# Online sources of which the datasets are only retrieved and prepared when they are first used,
+# such as the county data of the US, which is only shown when a user picks the county map
+LAZY_SOURCES = ["vaccLocUSCounty"]
+
+# Prepare the datasets of each country when they are first used ("lazy") or all datasets at launch ("eager"),
+# lazy lets the dashboard accept requests right away, see prepareCountriesLazily
+LAZY_START = os.environ.get("VAXOSCOPE_START", "eager") == "lazy"
 
 ## RETRIEVE AND PREPARE DATA ---------------------------------------------------
 
@@ -17,73 +34,49 @@ import datetime
 print("Retrieving and preparing data ...")
 
 # Vaccination coverage for all three countries
-def prepareVaccCovAll():
+def prepareVaccCovAll(sources, datasets):
     """ Retrieves and prepares vaccination coverage data for all thee countries.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following datasets available:
         vaccCov (dataframe): time-series vaccination coverage data for all three countries
         vaccCovNL (dataframe): time-series vaccination coverage data of NL only
         vaccCovUK (dataframe): time-series vaccination coverage data for UK only
         vaccCovUS (dataframe): time-series vaccination coverage data for US only
     """
-    # Set data variable
-    global vaccCov
-
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccCov = pd.read_csv('https://covid.ourworldindata.org/data/owid-covid-data.csv')
-        vaccCov[['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccCov = pd.read_csv("data/backup/vaccCov.csv")
-        print("Note: could not load vaccination coverage data from online source, used local backup file instead.")
-
-    # Select relevant columns
-    vaccCov = vaccCov[['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred']]
-
-    # Select relevant countries
-    countries = ['USA', 'GBR', 'NLD']
-    vaccCov = vaccCov.loc[vaccCov['iso_code'].isin(countries)]
-
-    # Drop duplicates (check before and after)
-    vaccCov = vaccCov.drop_duplicates()
-
-    # Rename columns
-    vaccCov = vaccCov.rename(columns={'iso_code': 'country'})
-    vaccCov = vaccCov.rename(columns={'people_vaccinated': 'count_one_dose'})
-    vaccCov = vaccCov.rename(columns={'people_vaccinated_per_hundred': 'coverage_one_dose'})
-    vaccCov = vaccCov.rename(columns={'people_fully_vaccinated': 'count_full_dose'})
-    vaccCov = vaccCov.rename(columns={'people_fully_vaccinated_per_hundred': 'coverage_full_dose'})
-
-    # Change data types
-    vaccCov['date']= pd.to_datetime(vaccCov['date'])
-
-    # Change 'country' values to correct abbreviations
-    vaccCov['country'] = vaccCov['country'].replace("USA", "US")
-    vaccCov['country'] = vaccCov['country'].replace("GBR", "UK")
-    vaccCov['country'] = vaccCov['country'].replace("NLD", "NL")
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccCov = sources["vaccCov"]
 
-    # Drop missing values
-    vaccCov = vaccCov.dropna(subset=["date", "coverage_full_dose"])
+    # Select relevant countries and columns, rename and recode columns, drop duplicates and missing values
+    vaccCov = schema.applySchema(vaccCov, schema.SCHEMAS["vaccCov"])
 
     # Also provide smaller seperate versions for each of the three countries
-    global vaccCovNL
     vaccCovNL = vaccCov
     vaccCovNL = vaccCovNL[vaccCovNL["country"] == "NL"][["country", "date","coverage_full_dose"]]
 
-    global vaccCovUK
     vaccCovUK = vaccCov
     vaccCovUK = vaccCovUK[vaccCovUK["country"] == "UK"][["country", "date","coverage_full_dose"]]
 
-    global vaccCovUS
     vaccCovUS = vaccCov
     vaccCovUS = vaccCovUS[vaccCovUS["country"] == "US"][["country", "date","coverage_full_dose"]]
 
+    # Make prepared datasets available
+    datasets["vaccCov"] = vaccCov
+    datasets["vaccCovNL"] = vaccCovNL
+    datasets["vaccCovUK"] = vaccCovUK
+    datasets["vaccCovUS"] = vaccCovUS
+
 
 # Vaccination attitudes for all three countries:
-def prepareVaccAttitudesAll():
+def prepareVaccAttitudesAll(datasets):
     """ Retrieves and prepares vaccination attitude data for all thee countries.
 
+        Parameter:
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following datasets available:
         accAttitudes (dataframe): vaccination attitude data for all three countries
         accAttitudesNL (dataframe): vaccination attitude data for NL only
@@ -98,107 +91,49 @@ def prepareVaccAttitudesAll():
     # Download: on this page, select 'Download' under the second 'Willingness to get vaccinated against COVID-19'-graph.
     # Replace: rename the file to "vaccAttitudes.csv" and place it in the "data/backup/"" folder.
 
-    # Set data variable
-    global vaccAttitudes
-
     # Load data
     vaccAttitudes = pd.read_csv('data/backup/vaccAttitudes.csv')
 
-    # Select relevant columns
-    vaccAttitudes = vaccAttitudes[['Day', 'Code', 'people_vaccinated_per_hundred', 'willingness_covid_vaccinate_this_week_pct_pop', 'uncertain_covid_vaccinate_this_week_pct_pop', 'unwillingness_covid_vaccinate_this_week_pct_pop']]
-
-    # Select relevant countries
-    countries = ['USA', 'GBR', 'NLD']
-    vaccAttitudes = vaccAttitudes.loc[vaccAttitudes['Code'].isin(countries)]
-
-    # Drop duplicates (check before and after)
-    vaccAttitudes = vaccAttitudes.drop_duplicates()
-
-    # Rename columns
-    vaccAttitudes = vaccAttitudes.rename(columns={'Day': 'date'})
-    vaccAttitudes = vaccAttitudes.rename(columns={'Code': 'country'})
-    vaccAttitudes = vaccAttitudes.rename(columns={'people_vaccinated_per_hundred': 'vaccinated_one_dose_percentage'})
-    vaccAttitudes = vaccAttitudes.rename(columns={'willingness_covid_vaccinate_this_week_pct_pop': 'willing_percentage'})
-    vaccAttitudes = vaccAttitudes.rename(columns={'uncertain_covid_vaccinate_this_week_pct_pop': 'uncertain_percentage'})
-    vaccAttitudes = vaccAttitudes.rename(columns={'unwillingness_covid_vaccinate_this_week_pct_pop': 'unwilling_percentage'})
+    # Select relevant countries and columns, rename and recode columns, drop duplicates
+    vaccAttitudes = schema.applySchema(vaccAttitudes, schema.SCHEMAS["vaccAttitudes"])
     # Note: the total of Vaccinated, willing, uncertain, and unwilling is always 100%.
 
-    # Change data types
-    vaccAttitudes['date']= pd.to_datetime(vaccAttitudes['date'])
-
-    # Change 'country' values to correct abbreviations
-    vaccAttitudes['country'] = vaccAttitudes['country'].replace("USA", "US")
-    vaccAttitudes['country'] = vaccAttitudes['country'].replace("GBR", "UK")
-    vaccAttitudes['country'] = vaccAttitudes['country'].replace("NLD", "NL")
-
     # Also provide seperate versions for each of the three countries
-    global vaccAttitudesNL
     vaccAttitudesNL = vaccAttitudes
     vaccAttitudesNL = vaccAttitudesNL[vaccAttitudesNL["country"] == "NL"]
 
-    global vaccAttitudesUK
     vaccAttitudesUK = vaccAttitudes
     vaccAttitudesUK = vaccAttitudesUK[vaccAttitudesUK["country"] == "UK"]
 
-    global vaccAttitudesUS
     vaccAttitudesUS = vaccAttitudes
     vaccAttitudesUS = vaccAttitudesUS[vaccAttitudesUS["country"] == "US"]
 
+    # Make prepared datasets available
+    datasets["vaccAttitudes"] = vaccAttitudes
+    datasets["vaccAttitudesNL"] = vaccAttitudesNL
+    datasets["vaccAttitudesUK"] = vaccAttitudesUK
+    datasets["vaccAttitudesUS"] = vaccAttitudesUS
+
 
 # Vaccination coverage per age level for NL
-def prepareVaccAgeNL():
+def prepareVaccAgeNL(sources, datasets):
     """ Retrieves and prepares vaccination coverage per age group in NL.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following dataset available:
         vaccAgeNL (dataframe): vaccination coverage per age group in NL
     """
-    # Set data variable
-    global vaccAgeNL
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccAgeNL = sources["vaccAgeNL"]
 
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccAgeNL = pd.read_csv('https://data.rivm.nl/data/covid-19/COVID-19_vaccinatiegraad_per_gemeente_per_week_leeftijd.csv', sep=';')
-        vaccAgeNL[['Vaccination_coverage_partly','Vaccination_coverage_completed','Date_of_statistics', 'Age_group']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccAgeNL = pd.read_csv("data/backup/vaccAgeNL.csv", sep=';')
-        print("Note: could not load vaccination age data for NL from online source, used local backup file instead.")
-
-    # Replace outliers with NaNs
-    vaccAgeNL['Vaccination_coverage_partly'] = vaccAgeNL['Vaccination_coverage_partly'].replace(">=95", np.nan)
-    vaccAgeNL['Vaccination_coverage_partly'] = vaccAgeNL['Vaccination_coverage_partly'].replace("9999", np.nan)
-    vaccAgeNL['Vaccination_coverage_completed'] = vaccAgeNL['Vaccination_coverage_completed'].replace(">=95", np.nan)
-    vaccAgeNL['Vaccination_coverage_completed'] = vaccAgeNL['Vaccination_coverage_completed'].replace("9999", np.nan)
-
-    # Select subset of rows with 'Veiligheidsregio' as region level, because using both 'Veiligheidsregio' and 'Gemeente' would be double
-    regionLevel = ['Veiligheidsregio']
-    vaccAgeNL = vaccAgeNL.loc[vaccAgeNL['Region_level'].isin(regionLevel)]
-
-    # Make the vaccination coverages floats
-    vaccAgeNL['Vaccination_coverage_partly'] = vaccAgeNL['Vaccination_coverage_partly'].astype('float')
-    vaccAgeNL['Vaccination_coverage_completed'] = vaccAgeNL['Vaccination_coverage_completed'].astype('float')
+    # Select safety regions and relevant columns, replace outliers with NaNs, rename columns and change data types
+    vaccAgeNL = schema.applySchema(vaccAgeNL, schema.SCHEMAS["vaccAgeNL"])
 
     # Group the age groups over all regions for the vaccination coverage
-    vaccAgeNL = vaccAgeNL.groupby(['Date_of_statistics', 'Age_group']).mean()
-
-    # Make the indexes normal columns
-    vaccAgeNL.reset_index(level=0, inplace=True)
-    vaccAgeNL.reset_index(level=0, inplace=True)
-
-    # Order relevant columns
-    vaccAgeNL = vaccAgeNL[['Date_of_statistics', 'Age_group', 'Vaccination_coverage_partly', 'Vaccination_coverage_completed']]
-
-    # Drop duplicates (check before and after)
-    vaccAgeNL = vaccAgeNL.drop_duplicates()
-
-    # Rename columns
-    vaccAgeNL = vaccAgeNL.rename(columns={'Date_of_statistics': 'date'})
-    vaccAgeNL = vaccAgeNL.rename(columns={'Age_group': 'age_group'})
-    vaccAgeNL = vaccAgeNL.rename(columns={'Vaccination_coverage_partly': 'coverage_one_dose'})
-    vaccAgeNL = vaccAgeNL.rename(columns={'Vaccination_coverage_completed': 'coverage_full_dose'})
-
-    # Change data types
-    vaccAgeNL['date']= pd.to_datetime(vaccAgeNL['date'])
+    vaccAgeNL = vaccAgeNL.groupby(['date', 'age_group'], as_index=False).mean()
 
     # Add 'count_one_dose', 'count_full_dose', and 'country' column
     vaccAgeNL.insert(2, 'count_one_dose', np.nan)
@@ -208,132 +143,63 @@ def prepareVaccAgeNL():
     # Set column order
     vaccAgeNL = vaccAgeNL[['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']]
 
+    # Make prepared datasets available
+    datasets["vaccAgeNL"] = vaccAgeNL
+
 
 # Vaccination coverage per age level for UK
-def prepareVaccAgeUK():
+def prepareVaccAgeUK(sources, datasets):
     """ Retrieves and prepares vaccination coverage per age group in UK.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following dataset available:
         vaccAgeUK (dataframe): vaccination coverage per age group in UK
     """
-    # Set data variable
-    global vaccAgeUK
-
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccAgeUK = pd.read_csv('https://api.coronavirus.data.gov.uk/v2/data?areaType=nation&areaCode=E92000001&metric=vaccinationsAgeDemographics&format=csv')
-        vaccAgeUK[['date', 'age', 'cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate', 'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccAgeUK = pd.read_csv("data/backup/vaccAgeUK.csv")
-        print("Note: could not load vaccination age data for UK from online source, used local backup file instead.")
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccAgeUK = sources["vaccAgeUK"]
 
-    # Select relevant columns
-    vaccAgeUK = vaccAgeUK[['date', 'age', 'cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate', 'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage']]
+    # Select relevant columns, rename and recode columns, change data types and filter by latest date
+    vaccAgeUK = schema.applySchema(vaccAgeUK, schema.SCHEMAS["vaccAgeUK"])
 
-    # Drop duplicates (check before and after)
-    vaccAgeUK = vaccAgeUK.drop_duplicates()
-
-    # Rename columns
-    vaccAgeUK = vaccAgeUK.rename(columns={'age': 'age_group'})
-    vaccAgeUK = vaccAgeUK.rename(columns={'cumPeopleVaccinatedFirstDoseByVaccinationDate': 'count_one_dose'})
-    vaccAgeUK = vaccAgeUK.rename(columns={'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage': 'coverage_one_dose'})
-    vaccAgeUK = vaccAgeUK.rename(columns={'cumPeopleVaccinatedCompleteByVaccinationDate': 'count_full_dose'})
-    vaccAgeUK = vaccAgeUK.rename(columns={'cumVaccinationCompleteCoverageByVaccinationDatePercentage': 'coverage_full_dose'})
-
-    # Change data types
-    vaccAgeUK['date']= pd.to_datetime(vaccAgeUK['date'])
-
-    # Add 'country' column
-    vaccAgeUK['country'] = 'UK'
-
-    # Recode age group category labels
-    vaccAgeUK['age_group'] = vaccAgeUK['age_group'].replace({'12_15': '12-15', '16_17': '16-17', '18_24': '18-24', '25_29': '25-29',
-                                                      '30_34': '30-34', '35_39': '35-39', '40_44': '40-44', '45_49': '45-49',
-                                                       '50_54': '50-54', '55_59': '55-59', '60_64': '60-64', '65_69': '65-69',
-                                                      '70_74': '70-74', '75_79': '75-79', '80_84': '80-84', '85_89': '85-89', '90+': '90+'})
-
-    # Filter by latest date
-    vaccAgeUK = vaccAgeUK[vaccAgeUK["date"]==vaccAgeUK["date"].max()]
-
-    # Set column order
-    vaccAgeUK = vaccAgeUK[['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']]
+    # Make prepared datasets available
+    datasets["vaccAgeUK"] = vaccAgeUK
 
 
 # Vaccination coverage per age level for US
-def prepareVaccAgeUS():
+def prepareVaccAgeUS(sources, datasets):
     """ Retrieves and prepares vaccination coverage per age group in US.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following dataset available:
         vaccAgeUS (dataframe): vaccination coverage per age group in US
     """
-    # Set data variable
-    global vaccAgeUS
-
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccAgeUS = pd.read_csv("https://data.cdc.gov/resource/km4m-vcsb.csv")
-        vaccAgeUS[['date','demographic_category','administered_dose1','administered_dose1_pct','series_complete_yes','series_complete_pop_pct']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccAgeUS = pd.read_csv("data/backup/vaccAgeUS.csv")
-        print("Note: could not load vaccination age data for US from online source, used local backup file instead.")
-
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccAgeUS = sources["vaccAgeUS"]
 
-    age_groups = ['Ages_<12yrs','Ages_12-15_yrs','Ages_16-17_yrs','Ages_18-24_yrs','Ages_18-29_yrs',
-    'Ages_25-39_yrs','Ages_30-39_yrs','Ages_40-49_yrs','Ages_50-64_yrs','Ages_65-74_yrs','Ages_75+_yrs',
-    'Ages_<18yrs','Age_unknown','Age_known']
-
-    vaccAgeUS = vaccAgeUS.loc[vaccAgeUS['demographic_category'].isin(age_groups)]
-
-    # Select relevant columns
-    vaccAgeUS = vaccAgeUS[['date',
-     'demographic_category',
-     'administered_dose1',
-     'administered_dose1_pct',
-     'series_complete_yes',
-     'series_complete_pop_pct']]
-
-    # Rename columns
-    vaccAgeUS = vaccAgeUS.rename(columns={'demographic_category': 'age_group'})
-    vaccAgeUS = vaccAgeUS.rename(columns={'recip_state': 'state'})
-    vaccAgeUS = vaccAgeUS.rename(columns={'administered_dose1': 'count_one_dose'})
-    vaccAgeUS = vaccAgeUS.rename(columns={'administered_dose1_pct': 'coverage_one_dose'})
-    vaccAgeUS = vaccAgeUS.rename(columns={'series_complete_yes': 'count_full_dose'})
-    vaccAgeUS = vaccAgeUS.rename(columns={'series_complete_pop_pct': 'coverage_full_dose'})
-
-    # Change data types
-    vaccAgeUS = vaccAgeUS.astype({'date': 'datetime64[ns]'})
-
-    # Drop duplicates (check before and after)
-    vaccAgeUS = vaccAgeUS.drop_duplicates()
-
-    # Add 'country' column
-    vaccAgeUS['country'] = 'US'
-
-    # Recode age group category labels
-    vaccAgeUS['age_group'] = vaccAgeUS['age_group'].replace({'Ages_18-24_yrs': '18-24', 'Ages_50-64_yrs': '50-64', 'Ages_75+_yrs': '75+', 'Ages_65-74_yrs': '65-74',
-                                                      'Ages_25-39_yrs': '25-39', 'Ages_50-65_yrs': '50-65', 'Ages_16-17_yrs': '16-17', 'Ages_<12yrs': '12-',
-                                                       'Ages_40-49_yrs': '40-49', 'Ages_<18yrs': '18-', 'Ages_12-15_yrs': '12-15', 'Ages_30-39_yrs': '30-39',
-                                                      'Ages_18-29_yrs': '18-29', 'Age_unknown': 'Age unknown', 'Age_known': 'Age known'})
-
-    # Filter by latest date
-    vaccAgeUS = vaccAgeUS[vaccAgeUS["date"]==vaccAgeUS["date"].max()]
-
-    # Drop age known, age unkown and 18 minus columns
-    vaccAgeUS = vaccAgeUS[~vaccAgeUS["age_group"].isin(["Age known", "Age unknown", "18-"])]
+    # Select relevant age groups and columns, rename and recode columns, change data types and filter by latest date
+    vaccAgeUS = schema.applySchema(vaccAgeUS, schema.SCHEMAS["vaccAgeUS"])
 
     # Sort by age group
     vaccAgeUS = vaccAgeUS.sort_values(by="age_group")
 
-    # Set column order
-    vaccAgeUS = vaccAgeUS[['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']]
+    # Make prepared datasets available
+    datasets["vaccAgeUS"] = vaccAgeUS
 
 
 # Vaccination coverage per age level for all countries
-def prepareVaccAgeAll():
+def prepareVaccAgeAll(sources, datasets):
     """ Retrieves and prepares vaccination coverage per age group for all three countries.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         By calling:
         Functions that first retrieve and prepare age group datasets for each seperate country:
         See prepareVaccAgeNL, prepareVaccAgeUK, prepareVaccAgeUS functions.
@@ -344,139 +210,98 @@ def prepareVaccAgeAll():
         vaccAge (dataframe): vaccination coverage per age group for all three countries
     """
     # First retrieve and prepare vaccination coverage per age for each seperate country
-    prepareVaccAgeNL()
-    prepareVaccAgeUK()
-    prepareVaccAgeUS()
+    prepareVaccAgeNL(sources, datasets)
+    prepareVaccAgeUK(sources, datasets)
+    prepareVaccAgeUS(sources, datasets)
 
     # Then merge tables into one table
-    global vaccAge
-    vaccAge = pd.concat([vaccAgeNL, vaccAgeUK, vaccAgeUS], ignore_index=True, sort=False)
+    vaccAge = pd.concat([datasets["vaccAgeNL"], datasets["vaccAgeUK"], datasets["vaccAgeUS"]], ignore_index=True, sort=False)
     vaccAge = vaccAge[['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']]
+    datasets["vaccAge"] = vaccAge
 
 # Vaccination coverage per municipality location in NL
-def prepareVaccLocNL():
+def prepareVaccLocNL(sources, datasets):
     """ Retrieves and prepares vaccination coverage per municipality in NL.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following datasets available:
         vaccLocNL (dataframe): vaccination coverage per municipality in NL
         vaccLocMapNL (geodataframe): map with vaccination coverage per municipality in NL
     """
-    # Set data variable
-    global vaccLocNL
-
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccLocNL = pd.read_csv('https://data.rivm.nl/data/covid-19/COVID-19_vaccinatiegraad_per_gemeente_per_week_leeftijd.csv', sep=';')
-        vaccLocNL[['Region_level', 'Region_code', 'Region_name', 'Birth_year','Date_of_statistics',  'Vaccination_coverage_completed', 'Vaccination_coverage_partly']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccLocNL = pd.read_csv("data/backup/vaccLocNL.csv", sep=";")
-        print("Note: could not load vaccination location data for NL from online source, used local backup file instead.")
-
-    # Replace outliers with NaNs
-    vaccLocNL['Vaccination_coverage_partly'] = vaccLocNL['Vaccination_coverage_partly'].replace(">=95", np.nan)
-    vaccLocNL['Vaccination_coverage_partly'] = vaccLocNL['Vaccination_coverage_partly'].replace("9999", np.nan)
-    vaccLocNL['Vaccination_coverage_completed'] = vaccLocNL['Vaccination_coverage_completed'].replace(">=95", np.nan)
-    vaccLocNL['Vaccination_coverage_completed'] = vaccLocNL['Vaccination_coverage_completed'].replace("9999", np.nan)
-
-    # Replace Dutch Region_level names with English translations
-    vaccLocNL['Region_level'] = vaccLocNL['Region_level'].replace("Gemeente", "Municipality")
-    vaccLocNL['Region_level'] = vaccLocNL['Region_level'].replace("Veiligheidsregio", "Safety region")
-
-    # Make the vaccination coverages floats
-    vaccLocNL['Vaccination_coverage_partly'] = vaccLocNL['Vaccination_coverage_partly'].astype('float')
-    vaccLocNL['Vaccination_coverage_completed'] = vaccLocNL['Vaccination_coverage_completed'].astype('float')
-
-    # Select relevant columns
-    vaccLocNL = vaccLocNL[['Region_level', 'Region_code', 'Region_name', 'Birth_year','Date_of_statistics',  'Vaccination_coverage_completed', 'Vaccination_coverage_partly']]
-
-    # Drop duplicates (check before and after)
-    vaccLocNL = vaccLocNL.drop_duplicates()
-
-    # Rename columns
-    vaccLocNL = vaccLocNL.rename(columns={'Date_of_statistics': 'date'})
-    vaccLocNL = vaccLocNL.rename(columns={'Region_level': 'location_level'})
-    vaccLocNL = vaccLocNL.rename(columns={'Region_name': 'location_name'})
-    vaccLocNL = vaccLocNL.rename(columns={'Region_code': 'location_code'})
-    vaccLocNL = vaccLocNL.rename(columns={'Birth_year': 'age_group'})
-    vaccLocNL = vaccLocNL.rename(columns={'Vaccination_coverage_partly': 'coverage_one_dose'})
-    vaccLocNL = vaccLocNL.rename(columns={'Vaccination_coverage_completed': 'coverage_full_dose'})
-
-    # Change data types
-    vaccLocNL = vaccLocNL.astype({'date': 'datetime64[ns]'})
-
-    # Add 'count_one_dose', 'count_full_dose', and 'country' column
-    vaccLocNL.insert(4, 'count_full_dose', np.nan)
-    vaccLocNL.insert(5, 'count_one_dose', np.nan)
-    vaccLocNL['country'] = 'NL'
-
-    # Filter by municipality level
-    vaccLocNL = vaccLocNL[vaccLocNL["location_level"]=="Municipality"]
-
-    # Filter by latest date
-    vaccLocNL = vaccLocNL[vaccLocNL["date"] == vaccLocNL["date"].max()]
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccLocNL = sources["vaccLocNL"]
 
-    # Filter by aged 12+
-    vaccLocNL = vaccLocNL[vaccLocNL["age_group"] == "<2004"]
+    # Select municipalities aged 12+ at latest date, replace outliers with NaNs, rename and recode columns
+    vaccLocNL = schema.applySchema(vaccLocNL, schema.SCHEMAS["vaccLocNL"])
 
-    # Drop age group column
-    vaccLocNL = vaccLocNL.drop(labels = "age_group", axis=1)
+    # Match and merge data with country geography to draw map, see geometry.joinData
+    vaccLocMapNL = geometry.joinData("municipalitiesNL", vaccLocNL, 'location_name')
 
-    # Match and merge data with country geography to draw map
-    global vaccLocMapNL
-    geoNL = gpd.read_file("data/geometry/municipalitiesNL.json")
-    geoNL.to_crs(pyproj.CRS.from_epsg(4326), inplace=True)
-    vaccLocMapNL = geoNL.set_index('statnaam').join(vaccLocNL.set_index('location_name'))
+    # Make prepared datasets available
+    datasets["vaccLocNL"] = vaccLocNL
+    datasets["vaccLocMapNL"] = vaccLocMapNL
 
 # Vaccination coverage per lower tier local authority location in UK
-def prepareVaccLocUK():
+def prepareVaccLocUK(sources, datasets):
     """ Retrieves and prepares vaccination coverage per lower tier local authority in UK.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following datasets available:
         vaccLocUK (dataframe): vaccination coverage per lower tier local authority in UK
         vaccLocMapUK (geodataframe): map with vaccination coverage per lower tier local authority in NL
     """
-    # Set data variable
-    global vaccLocUK
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccLocUK = sources["vaccLocUK"]
 
-    # Load dynamic data by retrieving from online source
-    try:
-        vaccLocUK = pd.read_csv("https://api.coronavirus.data.gov.uk/v2/data?areaType=ltla&metric=cumVaccinationCompleteCoverageByVaccinationDatePercentage&format=csv")
-        vaccLocUK[['areaType','areaName', 'areaCode', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage', 'date']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccLocUK = pd.read_csv("data/backup/vaccLocUK.csv")
-        print("Note: could not load vaccination location data for UK from online source, used local backup file instead.")
+    # Select relevant columns, rename columns and filter by latest date that is available for each local authority
+    vaccLocUK = schema.applySchema(vaccLocUK, schema.SCHEMAS["vaccLocUK"])
 
-    # Drop unnecessary column
-    del vaccLocUK['areaType']
+    # Match and merge data with country geography to draw map, see geometry.joinData
+    vaccLocMapUK = geometry.joinData("ltlaUK", vaccLocUK, 'location_name')
 
-    # Drop duplicates (check before and after)
-    vaccLocUK = vaccLocUK.drop_duplicates()
+    # Make prepared datasets available
+    datasets["vaccLocUK"] = vaccLocUK
+    datasets["vaccLocMapUK"] = vaccLocMapUK
 
-    # Rename columns NOTE: difference between location_name and location_code
-    vaccLocUK = vaccLocUK.rename(columns={'areaName': 'location_name'})
-    vaccLocUK = vaccLocUK.rename(columns={'areaCode': 'location_code'})
-    vaccLocUK = vaccLocUK.rename(columns={'cumVaccinationCompleteCoverageByVaccinationDatePercentage': 'coverage_full_dose'})
+# Vaccination coverage per county location in US
+def prepareVaccLocUSCounty(sources, datasets):
+    """ Retrieves and prepares vaccination coverage per county in US.
 
-    # Change data types
-    vaccLocUK['date']= pd.to_datetime(vaccLocUK['date'])
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
 
-    # Add 'location_level' and 'country' column
-    vaccLocUK.insert(0, 'location_level', 'Lower tier local authority')
-    vaccLocUK['country'] = 'UK'
+        Makes following datasets available:
+        vaccLocUSCounty (dataframe): vaccination coverage per county in US
+        vaccLocMapCountyUS (geodataframe): map with vaccination coverage per county in US
+    """
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccLocUSCounty = sources["vaccLocUSCounty"]
 
-    # Filter by latest date that is available for each local authority
-    vaccLocUK = vaccLocUK.sort_values(['location_name', 'date']).drop_duplicates(subset = 'location_name', keep = 'last')
+    # Select relevant columns, rename columns, change data types and filter by latest date
+    vaccLocUSCounty = schema.applySchema(vaccLocUSCounty, schema.SCHEMAS["vaccLocUSCounty"])
 
-    # Match and merge data with country geography to draw map
-    global vaccLocMapUK
-    geoUK = gpd.read_file("data/geometry/ltlaUK.json")
-    vaccLocMapUK = geoUK.set_index('AREANM').join(vaccLocUK.set_index('location_name'))
+    # Match and merge data with country geography to draw map, see geometry.joinData
+    vaccLocMapCountyUS = geometry.joinData("countiesUS", vaccLocUSCounty, 'location_code')
+
+    # Make prepared datasets available
+    datasets["vaccLocUSCounty"] = vaccLocUSCounty
+    datasets["vaccLocMapCountyUS"] = vaccLocMapCountyUS
 
 # Vaccination coverage per county and state location in US
-def prepareVaccLocUS():
+def prepareVaccLocUS(sources, datasets):
     """ Retrieves and prepares vaccination coverage per county and state in US.
+        The county datasets are only retrieved and prepared when they are first used if their source is in LAZY_SOURCES.
+
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
 
         Makes following datasets available:
         vaccLocUSCounty (dataframe): vaccination coverage per county in US
@@ -486,171 +311,72 @@ def prepareVaccLocUS():
     """
     # (1/2) Location on county level:
 
-    # Set data variable
-    global vaccLocUSCounty
-
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccLocUSCounty = pd.read_csv("https://data.cdc.gov/resource/8xkx-amqh.csv?$limit=10000")
-        vaccLocUSCounty[['date','fips','recip_county','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccLocUSCounty = pd.read_csv("data/backup/vaccLocUSCounty.csv")
-        print("Note: could not load vaccination location data for US counties from online source, used local backup file instead.")
-
-
-    # Select relevant columns
-    vaccLocUSCounty = vaccLocUSCounty[['date','fips','recip_county','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct']]
-
-    # Rename columns
-    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'recip_county': 'location_name'})
-    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'fips': 'location_code'})
-    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'administered_dose1_recip': 'count_one_dose'})
-    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'administered_dose1_pop_pct': 'coverage_one_dose'})
-    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'series_complete_yes': 'count_full_dose'})
-    vaccLocUSCounty = vaccLocUSCounty.rename(columns={'series_complete_pop_pct': 'coverage_full_dose'})
-
-    # Change data types
-    vaccLocUSCounty = vaccLocUSCounty.astype({'date': 'datetime64[ns]'})
-
-    # Drop duplicates
-    vaccLocUSCounty = vaccLocUSCounty.drop_duplicates()
+    # Prepare on first use (see prepareLazily) or right away, see prepareVaccLocUSCounty
+    if "vaccLocUSCounty" in LAZY_SOURCES:
+        prepareLazily(sources, datasets, prepareVaccLocUSCounty, ["vaccLocUSCounty"], ["vaccLocUSCounty", "vaccLocMapCountyUS"])
+    else:
+        prepareVaccLocUSCounty(sources, datasets)
 
-    # Add 'location_level' and 'country' column
-    vaccLocUSCounty.insert(0, 'location_level', 'County')
-    vaccLocUSCounty['country'] = 'US'
+    # (2/2) Location on state level:
 
-    # Filter by latest date
-    vaccLocUSCounty = vaccLocUSCounty[vaccLocUSCounty["date"]==vaccLocUSCounty["date"].max()]
+    # Load dynamic data as retrieved from online source (or local backup file)
+    vaccLocUSState = sources["vaccLocUSState"]
 
-    # Match and merge data with country geography to draw map
-    global vaccLocMapCountyUS
-    geoUSCounties = gpd.read_file("data/geometry/countiesUS.json")
-    geoUSCounties.to_crs(pyproj.CRS.from_epsg(4326), inplace=True)
-    vaccLocUSCounty["location_code"] = vaccLocUSCounty["location_code"].astype("string")
-    vaccLocMapCountyUS = geoUSCounties.set_index('id').join(vaccLocUSCounty.set_index('location_code'))
+    # Select relevant columns, rename columns, recode state names and filter by latest date
+    vaccLocUSState = schema.applySchema(vaccLocUSState, schema.SCHEMAS["vaccLocUSState"])
 
-    # (2/2) Location on state level:
+    # Match and merge data with country geography to draw map, see geometry.joinData
+    vaccLocMapStateUS = geometry.joinData("statesUS", vaccLocUSState, 'location_name')
 
-    # Set data variable
-    global vaccLocUSState
-
-    # Load dynamic data by retrieving from online source and check structure
-    try:
-        vaccLocUSState = pd.read_csv("https://data.cdc.gov/resource/unsk-b7fc.csv?$limit=200")
-        vaccLocUSState[['date','location','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct']]
-    # If data cannot be retrieved: load local backup file from 05-11-2021
-    except:
-        vaccLocUSState = pd.read_csv("data/backup/vaccLocUSState.csv")
-        print("Note: could not load vaccination location data for US states from online source, used local backup file instead.")
-
-
-    # Select relevant columns
-    vaccLocUSState = vaccLocUSState[['date','location','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct']]
-
-    # Rename columns
-    vaccLocUSState = vaccLocUSState.rename(columns={'location': 'location_name'})
-    vaccLocUSState = vaccLocUSState.rename(columns={'fips': 'location_code'})
-    vaccLocUSState = vaccLocUSState.rename(columns={'administered_dose1_recip': 'count_one_dose'})
-    vaccLocUSState = vaccLocUSState.rename(columns={'administered_dose1_pop_pct': 'coverage_one_dose'})
-    vaccLocUSState = vaccLocUSState.rename(columns={'series_complete_yes': 'count_full_dose'})
-    vaccLocUSState = vaccLocUSState.rename(columns={'series_complete_pop_pct': 'coverage_full_dose'})
-
-    # Change data types
-    vaccLocUSState = vaccLocUSState.astype({'date': 'datetime64[ns]'})
-
-    # Drop duplicates
-    vaccLocUSState = vaccLocUSState.drop_duplicates()
-
-    # Add 'location_level' and 'country' column
-    vaccLocUSState.insert(0, 'location_level', 'County')
-    vaccLocUSState['country'] = 'US'
-
-    # Recode state names
-    stateNames = {"AL" : "Alabama",
-                  "AK" : "Alaska",
-                  "AZ" : "Arizona",
-                  "AR" : "Arkansas",
-                  "CA" : "California",
-                  "CO" : "Colorado",
-                  "CT" : "Connecticut",
-                  "DE" : "Delaware",
-                  "DC" : "District of Columbia",
-                  "FL" : "Florida",
-                  "GA" : "Georgia",
-                  "HI" : "Hawaii",
-                  "ID" : "Idaho",
-                  "IL" : "Illinois",
-                  "IN" : "Indiana",
-                  "IA" : "Iowa",
-                  "KS" : "Kansas",
-                  "KY" : "Kentucky",
-                  "LA" : "Louisiana",
-                  "ME" : "Maine",
-                  "MD" : "Maryland",
-                  "MA" : "Massachusetts",
-                  "MI" : "Michigan",
-                  "MN" : "Minnesota",
-                  "MS" : "Mississippi",
-                  "MO" : "Missouri",
-                  "MT" : "Montana",
-                  "NE" : "Nebraska",
-                  "NV" : "Nevada",
-                  "NH" : "New Hampshire",
-                  "NJ" : "New Jersey",
-                  "NM" : "New Mexico",
-                  "NY" : "New York",
-                  "NC" : "North Carolina",
-                  "ND" : "North Dakota",
-                  "OH" : "Ohio",
-                  "OK" : "Oklahoma",
-                  "OR" : "Oregon",
-                  "PA" : "Pennsylvania",
-                  "RI" : "Rhode Island",
-                  "SC" : "South Carolina",
-                  "SD" : "South Dakota",
-                  "TN" : "Tennessee",
-                  "TX" : "Texas",
-                  "UT" : "Utah",
-                  "VT" : "Vermont",
-                  "VA" : "Virginia",
-                  "WA" : "Washington",
-                  "WV" : "West Virginia",
-                  "WI" : "Wisconsin",
-                  "WY" : "Wyoming"
-                 }
-
-    vaccLocUSState['location_name'] = vaccLocUSState['location_name'].map(stateNames)
-    vaccLocUSState.dropna(subset=['location_name'], inplace = True)
-
-    # Filter by latest date
-    vaccLocUSState = vaccLocUSState[vaccLocUSState["date"]==vaccLocUSState["date"].max()]
-
-    # Match and merge data with country geography to draw map
-    global vaccLocMapStateUS
-    geoUSStates = gpd.read_file("data/geometry/statesUS.json")
-    geoUSStates.to_crs(pyproj.CRS.from_epsg(4326), inplace=True)
-    vaccLocMapStateUS = geoUSStates.set_index('name').join(vaccLocUSState.set_index('location_name'))
+    # Make prepared datasets available
+    datasets["vaccLocUSState"] = vaccLocUSState
+    datasets["vaccLocMapStateUS"] = vaccLocMapStateUS
 
 
 # Vaccination coverage per location for all three countries
-def prepareVaccLocAll():
+def prepareVaccLocAll(sources, datasets):
     """ Retrieves and prepares vaccination coverage per location for all three countries.
 
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         By calling:
         Functions that first retrieve and prepare location level datasets for each seperate country:
         See prepareVaccLocNL, prepareVaccLocUS, prepareVaccLocUK functions.
+
+        Then reports the locations that could not be matched with the country geographies.
+
+        Makes following dataset available:
+        joinReport (dataframe): locations without data, data without location and duplicate locations per geography,
+                                except for datasets that are prepared on first use
     """
     # Retrieve and prepare vaccination coverage per location for each country
-    prepareVaccLocUS()
-    prepareVaccLocNL()
-    prepareVaccLocUK()
+    prepareVaccLocUS(sources, datasets)
+    prepareVaccLocNL(sources, datasets)
+    prepareVaccLocUK(sources, datasets)
+
+    # Report locations that could not be matched with the geographies, see geometry.joinReport
+    # Datasets that are prepared on first use are not reported, to not prepare them now
+    reports = [geometry.joinReport("municipalitiesNL", datasets["vaccLocNL"], 'location_name'),
+               geometry.joinReport("ltlaUK", datasets["vaccLocUK"], 'location_name'),
+               geometry.joinReport("statesUS", datasets["vaccLocUSState"], 'location_name')]
+    if not isinstance(datasets["vaccLocUSCounty"], lazy.LazyDataset):
+        reports.append(geometry.joinReport("countiesUS", datasets["vaccLocUSCounty"], 'location_code'))
+    joinReport = pd.concat(reports, ignore_index=True)
+    datasets["joinReport"] = joinReport
+    counts = joinReport["problem"].value_counts()
+    print("Matched locations with geographies: " + str(counts.get("no data", 0)) + " locations without data, "
+          + str(counts.get("no shape", 0)) + " without location, " + str(counts.get("duplicate", 0)) + " duplicate.")
 
 
 # Vaccination coverage per income for NL
-def prepareVaccIncomeNL():
+def prepareVaccIncomeNL(datasets):
     """ Placeholder for function to retrieve and prepare vaccination coverage per income group in NL.
 
+        Parameter:
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following dataset available:
         vaccIncomeNL (dataframe): empty placeholder for vaccination coverage per income group in NL
     """
@@ -658,7 +384,6 @@ def prepareVaccIncomeNL():
     # Therefore: this function is a placeholder that creates an empty dataframe with expected structure.
     # Extendable: function can be updated if data becomes available in future.
 
-    global vaccIncomeNL
     vaccIncomeNL = pd.DataFrame()
     vaccIncomeNL['date'] = np.NaN
     vaccIncomeNL['income_group'] = np.NaN
@@ -668,10 +393,16 @@ def prepareVaccIncomeNL():
     vaccIncomeNL['count_full_dose'] = np.NaN
     vaccIncomeNL['country'] = "NL"
 
+    # Make prepared datasets available
+    datasets["vaccIncomeNL"] = vaccIncomeNL
+
 # Vaccination coverage per income for UK
-def prepareVaccIncomeUK():
+def prepareVaccIncomeUK(datasets):
     """ Retrieves and prepares vaccination coverage per income group in UK.
 
+        Parameter:
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following dataset available:
         vaccIncomeUK (dataframe): vaccination coverage per income group in UK
     """
@@ -682,13 +413,18 @@ def prepareVaccIncomeUK():
     # Instead: dashboard uses pre-included and pre-processed version of dataset from July 2021 (most recent version during development).
 
     # Load data
-    global vaccIncomeUK
     vaccIncomeUK = pd.read_csv("data/backup/incomeUK.csv")
 
+    # Make prepared datasets available
+    datasets["vaccIncomeUK"] = vaccIncomeUK
+
 # Vaccination coverage per income for US
-def prepareVaccIncomeUS():
+def prepareVaccIncomeUS(datasets):
     """ Retrieves and prepares vaccination coverage per income group in US.
 
+        Parameter:
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         Makes following dataset available:
         vaccIncomeUS (dataframe): vaccination coverage per income group in US
     """
@@ -699,87 +435,423 @@ def prepareVaccIncomeUS():
     # Update: data can be updated by manually extracting relevant statistics and calculating coverage per income group.
 
     # Load data
-    global vaccIncomeUS
     vaccIncomeUS = pd.read_csv("data/backup/incomeUSA.csv")
 
+    # Make prepared datasets available
+    datasets["vaccIncomeUS"] = vaccIncomeUS
+
 
 # Vaccination coverage per income group for all three countries
-def prepareVaccIncomeAll():
+def prepareVaccIncomeAll(datasets):
     """ Retrieves and prepares vaccination coverage per income level for all three countries.
 
+        Parameter:
+        datasets (dict): prepared datasets, to which the datasets below are added
+
         By calling:
         Functions that first create income level datasets for each seperate country:
         See prepareVaccIncomeNL, prepareVaccIncomeUK, prepareVaccIncomeUS functions.
     """
     # Retrieve and prepare vaccination coverage per income group for each country
-    prepareVaccIncomeUK()
-    prepareVaccIncomeNL()
-    prepareVaccIncomeUS()
+    prepareVaccIncomeUK(datasets)
+    prepareVaccIncomeNL(datasets)
+    prepareVaccIncomeUS(datasets)
+
+
+## LAZY PREPARATION ------------------------------------------------------------
+
+# Prepare datasets when they are first used
+def prepareLazily(sources, datasets, prepare, sourceNames, names):
+    """ Adds datasets that are only retrieved and prepared the first time one of them is used, see lazy.LazyDatasets.
+        Once prepared, they are kept for the next refresh, which only prepares them again (on first use)
+        if they were not prepared from the retrieved version of their online sources, see sourcesChanged.
+
+        Parameters:
+        sources (RetrievedSources): raw datasets of the refresh, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added as placeholders
+        prepare (function): function that prepares the datasets, such as prepareVaccLocUSCounty
+        sourceNames (list): names of the online sources the datasets are prepared from, see LAZY_SOURCES
+        names (list): names of the datasets that the prepare function makes available
+    """
+    offline = sources.offline
+    previous = {name: datasets.get(name) for name in names}
+
+    # Retrieve sources on first use, and keep the datasets in use if they were prepared from the same sources
+    # The load runs under the lock of the group, it records the versions in the group, not in the bundle in use
+    def load(kept):
+        lazySources = retrieval.retrieveSources(sourceNames, offline=offline)
+        if len(kept) == len(names) and not sourcesChanged(lazySources, group.fingerprints, sourceNames):
+            return kept
+        prepared = {}
+        prepare(lazySources, prepared)
+        group.fingerprints = recordSources(lazySources, group.fingerprints, sourceNames)
+        print("Prepared " + ", ".join(names) + " on first use.")
+        return prepared
+
+    fingerprints = dict(datasets.get("sourceFingerprints", {}), **lazy.warmFingerprints(previous))
+    group = lazy.LazyDatasets(load, lazy.warmDatasets(previous),
+                              {name: fingerprints[name] for name in sourceNames if name in fingerprints})
+    for name in names:
+        datasets[name] = lazy.LazyDataset(group, name)
+
+# Datasets of NL only
+def prepareCountryNL(sources, datasets):
+    """ Retrieves and prepares the datasets that are only shown for NL.
+
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
+        By calling:
+        See prepareVaccAgeNL, prepareVaccLocNL, prepareVaccIncomeNL functions.
+    """
+    prepareVaccAgeNL(sources, datasets)
+    prepareVaccLocNL(sources, datasets)
+    prepareVaccIncomeNL(datasets)
+
+# Datasets of UK only
+def prepareCountryUK(sources, datasets):
+    """ Retrieves and prepares the datasets that are only shown for UK.
+
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
+        By calling:
+        See prepareVaccAgeUK, prepareVaccLocUK, prepareVaccIncomeUK functions.
+    """
+    prepareVaccAgeUK(sources, datasets)
+    prepareVaccLocUK(sources, datasets)
+    prepareVaccIncomeUK(datasets)
+
+# Datasets of US only
+def prepareCountryUS(sources, datasets):
+    """ Retrieves and prepares the datasets that are only shown for US.
+        The county datasets are still prepared on their own first use if their source is in LAZY_SOURCES.
+
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
+        By calling:
+        See prepareVaccAgeUS, prepareVaccLocUS, prepareVaccIncomeUS functions.
+    """
+    prepareVaccAgeUS(sources, datasets)
+    prepareVaccLocUS(sources, datasets)
+    prepareVaccIncomeUS(datasets)
+
+# Datasets shown for all three countries
+def prepareCountriesAll(sources, datasets):
+    """ Retrieves and prepares the datasets that are shown for every country and on the comparison page.
+
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        datasets (dict): prepared datasets, to which the datasets below are added
+
+        By calling:
+        See prepareVaccCovAll, prepareVaccAttitudesAll functions.
+    """
+    prepareVaccCovAll(sources, datasets)
+    prepareVaccAttitudesAll(datasets)
+
+# Datasets that are prepared together when one of them is first used, with the online sources they are prepared from
+COUNTRY_GROUPS = {
+    "NL": (prepareCountryNL, ["vaccAgeNL", "vaccLocNL"], ["vaccAgeNL", "vaccLocNL", "vaccLocMapNL", "vaccIncomeNL"]),
+    "UK": (prepareCountryUK, ["vaccAgeUK", "vaccLocUK"], ["vaccAgeUK", "vaccLocUK", "vaccLocMapUK", "vaccIncomeUK"]),
+    "US": (prepareCountryUS, ["vaccAgeUS", "vaccLocUSState", "vaccLocUSCounty"],
+           ["vaccAgeUS", "vaccLocUSState", "vaccLocMapStateUS", "vaccLocUSCounty", "vaccLocMapCountyUS", "vaccIncomeUS"]),
+    "All": (prepareCountriesAll, ["vaccCov"],
+            ["vaccCov", "vaccCovNL", "vaccCovUK", "vaccCovUS", "vaccAttitudes", "vaccAttitudesNL", "vaccAttitudesUK", "vaccAttitudesUS"])
+}
+
+# Prepare the datasets of each country when they are first used
+def prepareCountriesLazily(offline=False):
+    """ Creates the datasets of a lazy launch (see LAZY_START): a placeholder for every dataset in COUNTRY_GROUPS,
+        so nothing is retrieved or prepared before the dashboard accepts requests.
+        The first use of a dataset retrieves and prepares the datasets of its country, see prepareLazily,
+        for example the first view of the NL page prepares the NL datasets and those of all three countries.
+        The merged datasets (vaccAge, joinReport) are only prepared by the next refresh, see prepareDatasets.
+
+        Parameter:
+        offline (boolean): only load the local backup files, without retrieving the online sources
+
+        Returns:
+        datasets (dict): placeholders of the datasets of every country
+    """
+    sources = retrieval.RetrievedSources([], retrieval.FetchSession(), offline=offline)
+    datasets = {}
+    for country, (prepare, sourceNames, names) in COUNTRY_GROUPS.items():
+        # Sources that are prepared on their own first use are retrieved by their own placeholders
+        prepareLazily(sources, datasets, prepare, [name for name in sourceNames if name not in LAZY_SOURCES], names)
+    return datasets
+
+# Sources to retrieve during a refresh
+def eagerSources():
+    """ Lists the online sources that are retrieved during a refresh: all sources except those in LAZY_SOURCES.
+
+        Returns:
+        names (list): names of the sources as defined in retrieval.SOURCES
+    """
+    return [name for name in retrieval.SOURCES if name not in LAZY_SOURCES]
+
+
+## SOURCE VERSIONS -------------------------------------------------------------
+
+# Check if datasets were prepared from other versions of their sources
+def sourcesChanged(sources, fingerprints, names):
+    """ Determines if datasets need to be prepared again: if any of their sources was retrieved in another version
+        than the version they were prepared from (such as datasets prepared from the local backup files or a snapshot),
+        see retrieval.RetrievedSources.fingerprint.
+
+        Parameters:
+        sources (RetrievedSources): raw datasets of the refresh, see retrieval.retrieveSources
+        fingerprints (dict): version of every source that the datasets in use were prepared from
+        names (list): names of the sources of the datasets, sources that were not retrieved are skipped
+
+        Returns:
+        Boolean: true if at least one of the sources differs from the version the datasets were prepared from, false if not.
+    """
+    return any(sources.fingerprint(name) != fingerprints.get(name) for name in names if name in sources.names)
+
+# Remember the versions of the sources that datasets were prepared from
+def recordSources(sources, fingerprints, names):
+    """ Records the version of every retrieved source of which datasets were prepared, see sourcesChanged.
+        The given versions are not changed, as they may be read by other threads.
+
+        Parameters:
+        sources (RetrievedSources): raw datasets of the refresh, see retrieval.retrieveSources
+        fingerprints (dict): version of every source that the datasets in use were prepared from
+        names (list): names of the sources of the prepared datasets, sources that were not retrieved are skipped
+
+        Returns:
+        fingerprints (dict): new dict with the versions of the given fingerprints and of the prepared sources
+    """
+    recorded = dict(fingerprints)
+    for name in names:
+        if name in sources.names:
+            recorded[name] = sources.fingerprint(name)
+    return recorded
 
 
 ## DATA REFRESH MECHANISM ------------------------------------------------------
 
-# Function to retrieve updated data from data sources
-def refreshData():
-    """ Retrieves and prepares all of the datasets used within the dashboard.
+# Function to prepare an updated set of datasets
+def prepareDatasets(sources, previous=None):
+    """ Prepares all of the datasets used within the dashboard, next to the datasets that are in use.
 
         By calling:
-        Functions that retrieve and preprare all of the datasets used within the dashboard
+        Functions that preprare all of the datasets used within the dashboard
         See prepareVaccCovAll, prepareVaccAttitudesAll, prepareVaccAgeAll, prepareVaccLocAll, prepareVaccIncomeAll
+
+        Parameters:
+        sources (dict): raw datasets as retrieved from the online sources, see retrieval.retrieveSources
+        previous (dict): datasets in use, those that were prepared from the retrieved version of all their sources
+                         are kept as they are (see sourcesChanged). All datasets are prepared if not given.
+
+        Returns:
+        datasets (dict): prepared datasets, with the version of the sources they were prepared from as sourceFingerprints
     """
-    print("Refreshing data, note that this might take 0,5 to 3 minutes...")
+    datasets = dict(previous) if previous else {}
+    # Versions of the bundle in use, with those recorded by datasets that were prepared on first use since
+    fingerprints = dict(datasets.get("sourceFingerprints", {}), **lazy.warmFingerprints(datasets))
+    prepareVaccIncomeAll(datasets)
+    prepareVaccAttitudesAll(datasets)
+
+    # Only prepare datasets again if they were not prepared from the retrieved version of their sources,
+    # such as after a launch from the local backup files or a snapshot
+    locationSources = ["vaccLocNL", "vaccLocUK", "vaccLocUSCounty", "vaccLocUSState"]
+    if not previous or sourcesChanged(sources, fingerprints, locationSources):
+        prepareVaccLocAll(sources, datasets)
+        fingerprints = recordSources(sources, fingerprints, locationSources)
+    # Datasets prepared on first use are checked again on their next use
+    elif "vaccLocUSCounty" in LAZY_SOURCES:
+        prepareLazily(sources, datasets, prepareVaccLocUSCounty, ["vaccLocUSCounty"], ["vaccLocUSCounty", "vaccLocMapCountyUS"])
+    ageSources = ["vaccAgeNL", "vaccAgeUK", "vaccAgeUS"]
+    if not previous or sourcesChanged(sources, fingerprints, ageSources):
+        prepareVaccAgeAll(sources, datasets)
+        fingerprints = recordSources(sources, fingerprints, ageSources)
+    if not previous or sourcesChanged(sources, fingerprints, ["vaccCov"]):
+        prepareVaccCovAll(sources, datasets)
+        fingerprints = recordSources(sources, fingerprints, ["vaccCov"])
+
+    datasets["sourceFingerprints"] = fingerprints
+    return datasets
 
-    prepareVaccIncomeAll()
-    prepareVaccLocAll()
-    prepareVaccAgeAll()
-    prepareVaccAttitudesAll()
-    prepareVaccCovAll()
+# Function to retrieve updated data from data sources
+def buildDatasets():
+    """ Retrieves and prepares an updated set of all datasets, without making it available yet.
+        The datasets in use stay available to the dashboard while this function runs.
 
+        Returns:
+        datasets (dict): prepared datasets
+    """
+    # First retrieve all online sources (in parallel), then prepare the datasets
+    sources = retrieval.retrieveSources(eagerSources())
+    return prepareDatasets(sources, currentDatasets())
+
+# Function to get the datasets in use
+def currentDatasets():
+    """ Collects the prepared datasets (and forecasts) that are currently used within the dashboard.
+
+        Returns:
+        datasets (dict): prepared datasets in use, empty if no datasets were published yet
+    """
+    bundle = getBundle()
+    if bundle is None:
+        return {}
+    return bundle.datasets()
+
+# Function to refresh the datasets in use
+def refreshData():
+    """ Retrieves, prepares and publishes all of the datasets used within the dashboard.
+        Datasets of which none of the online sources were modified since the last refresh are kept as they are.
+        Forecasts in use are kept as well, see modelling code to update these.
+        See buildDatasets and publishBundle.
+    """
+    print("Refreshing data, note that this might take 0,5 to 3 minutes...")
+    publishBundle(buildDatasets())
     print("Succefully refreshed data.")
 
-def checkForRefresh():
-    """ Determines if data that is currently being used in the dashboard should be refreshed.
-        If an hour has passed since the last automatic refresh, then the data should be refreshed.
-        Note that this refresh check is only invoked if the user selects a new page in the dashboard.
-        Note that this function does not take manual refreshes into account.
+
+## DATASET BUNDLE --------------------------------------------------------------
+
+# Immutable set of all prepared datasets and forecasts
+class DatasetBundle:
+    """ Read-only set of all prepared datasets and forecasts that belong together.
+        A refresh never changes a bundle: it builds a new bundle and publishes it in one step.
+        The dashboard reads one bundle per request, so it never combines datasets of different refreshes.
+        Note that the datasets themselves should not be changed in place either.
+
+        Attributes:
+        version (int): number that increases with every published bundle, usable as cache key
+        created (datetime): date and time at which the bundle was published
+        Every dataset, as attribute with its name, for example bundle.vaccCovNL
+        sourceFingerprints (dict): version of the sources the datasets were prepared from, see sourcesChanged
+        Datasets that are prepared on first use are prepared when they are first read, see prepareLazily
+    """
+    __slots__ = ("version", "created", "_datasets")
+
+    def __init__(self, datasets, version):
+        object.__setattr__(self, "_datasets", MappingProxyType(dict(datasets)))
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "created", datetime.datetime.now())
+
+    def __getattr__(self, name):
+        # Only a missing dataset is reported as such, errors while preparing a dataset on first use are raised as they are
+        try:
+            value = self._datasets[name]
+        except KeyError:
+            raise AttributeError("Dataset bundle has no dataset '" + name + "'")
+        return lazy.resolve(value)
+
+    def __getitem__(self, name):
+        return lazy.resolve(self._datasets[name])
+
+    def __contains__(self, name):
+        return name in self._datasets
+
+    def isLoaded(self, name):
+        """ Determines if a dataset can be read without retrieving or preparing it first, see prepareLazily.
+
+            Parameter:
+            name (string): name of the dataset
+
+            Returns:
+            Boolean: true if the dataset is prepared already, false if it is prepared on first use.
+        """
+        value = self._datasets[name]
+        return not isinstance(value, lazy.LazyDataset) or value.isLoaded()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Dataset bundles cannot be changed, publish a new bundle instead")
+
+    def datasets(self):
+        """ Returns a (new) dict with all datasets of the bundle, to build a next bundle from.
+            Datasets that are prepared on first use are returned as placeholders, see lazy.LazyDataset.
+        """
+        return dict(self._datasets)
+
+# Function to get the bundle in use
+def getBundle():
+    """ Returns the most recently published bundle of datasets and forecasts.
+        Read it once per request and use that bundle for the entire request.
 
         Returns:
-        Boolean: true if data is due to be refreshed, false if not.
-    """
-    # Calculate minutes since last refresh
-    global lastRefreshTime
-    currentTime = datetime.datetime.now()
-    timeElapsed = currentTime - lastRefreshTime
-    minutesElapsed = timeElapsed.total_seconds() / 60
-
-    # Refresh data if more than an hour has passed
-    if(minutesElapsed > 60):
-        lastRefreshTime = datetime.datetime.now()
-        return True
-    else:
-        return False
+        bundle (DatasetBundle): bundle in use, None if no bundle was published yet
+    """
+    return currentBundle
+
+# Function to make a new set of datasets available
+def publishBundle(datasets):
+    """ Makes a new set of datasets (and forecasts) available to the modelling and visualisation code.
+        The new bundle replaces the bundle in use with a single reference swap,
+        after the functions registered with onPublish have prepared for it.
+        The functions run outside the lock, so a function that waits for data never blocks other publications;
+        a bundle is only swapped in if no newer bundle was published meanwhile.
 
-def recordLaunchTime():
-    """ Records the date and time when the dashboard is launched.
-        This date and time is used by the mechanism to automatically refresh data.
-        See the checkForRefresh function.
+        Parameter:
+        datasets (dict): all prepared datasets (and forecasts) of the new bundle
 
-        Makes following data available:
-        lastRefreshTime (datetime): last time the data was automatically refreshed.
+        Returns:
+        bundle (DatasetBundle): the published bundle
+    """
+    global currentBundle, lastVersion
+    with publishLock:
+        lastVersion += 1
+        bundle = DatasetBundle(datasets, lastVersion)
+
+    # Let the visualisation code prepare for the new bundle (such as precomputing figures) before it is used
+    for listener in list(publishListeners):
+        try:
+            listener(bundle)
+        except Exception as error:
+            print("Note: could not prepare for the new datasets in " + listener.__name__ + ": " + str(error))
+
+    with publishLock:
+        if currentBundle is None or currentBundle.version < bundle.version:
+            currentBundle = bundle
+    return bundle
+
+# Function to prepare for every new set of datasets
+def onPublish(listener):
+    """ Registers a function that is called with every new bundle, before the bundle replaces the bundle in use.
+        If a bundle is in use already, the function is also called with that bundle, in the background.
+
+        Parameter:
+        listener (function): function that receives the new bundle (DatasetBundle)
     """
-    # Record timestamp when launching dashboard
-    global lastRefreshTime
-    lastRefreshTime = datetime.datetime.now()
+    publishListeners.append(listener)
+    bundle = getBundle()
+    if bundle is not None:
+        threading.Thread(target=listener, args=(bundle,), daemon=True).start()
+
+# No bundle is in use before the datasets are prepared at launch
+currentBundle = None
+publishLock = threading.Lock()
+
+# Version of the most recently created bundle, see publishBundle
+lastVersion = 0
+
+# Functions that are called with every new bundle, see onPublish
+publishListeners = []
 
 
 ## RUN FUNCTIONS DURING LAUNCH -------------------------------------------------
 
-recordLaunchTime()
-prepareVaccIncomeAll()
-prepareVaccLocAll()
-prepareVaccAgeAll()
-prepareVaccAttitudesAll()
-prepareVaccCovAll()
+# Choose how to obtain the datasets at launch:
+# "online" retrieves the online sources, "backup" only uses the local backup files,
+# "snapshot" loads the already prepared datasets from the snapshot (see snapshot.py).
+bootMode = os.environ.get("VAXOSCOPE_BOOT", "online")
+
+if bootMode == "snapshot" and snapshot.snapshotExists():
+    publishBundle(snapshot.loadSnapshot())
+    print("Loaded prepared datasets from snapshot, these are used until the next refresh.")
+elif LAZY_START:
+    publishBundle(prepareCountriesLazily(offline = bootMode != "online"))
+    print("The datasets of each country are prepared when they are first used.")
+else:
+    sources = retrieval.retrieveSources(eagerSources(), offline = bootMode != "online")
+    publishBundle(prepareDatasets(sources))
 
 # Log when the dashboard finished with retrieving and preparing data
 print("Finished retrieving and preparing data.")
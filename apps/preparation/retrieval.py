@@ -0,0 +1,397 @@
+## DATA RETRIEVAL CODE ---------------------------------------------------------
+
+# This file contains the retrieval of the online data sources.
+# All sources are retrieved concurrently, so a refresh only waits for the slowest source.
+# Sources that share the same url are downloaded and parsed only once per refresh.
+# Sources that did not change since the last retrieval are taken from the on-disk cache.
+# For sources with an API (CDC and UKHSA) only the latest rows are retrieved.
+# The retrieved (raw) datasets are handed to the preparation code.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import pandas as pd
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from apps.preparation import sourcecache
+from apps.preparation import soda
+from apps.preparation import ukhsa
+
+## DATA SOURCES ----------------------------------------------------------------
+
+# Online sources used by the dashboard.
+# For each source: the columns it should contain, the options to read it,
+# and the local backup file from 05-11-2021 to use if it cannot be retrieved.
+# Optionally: the rows to keep, sources with this setting are streamed in chunks.
+# Optionally: the query for the latest rows only, for SODA (see soda.py) and UKHSA (see ukhsa.py) sources.
+SOURCES = {
+    "vaccCov": {
+        "url": 'https://covid.ourworldindata.org/data/owid-covid-data.csv',
+        "columns": ['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred'],
+        "options": {"usecols": ['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred'],
+                    "dtype": {'date': 'object', 'iso_code': 'object',
+                              'people_vaccinated': 'float64', 'people_vaccinated_per_hundred': 'float64',
+                              'people_fully_vaccinated': 'float64', 'people_fully_vaccinated_per_hundred': 'float64'}},
+        "rows": ('iso_code', ['USA', 'GBR', 'NLD']),
+        "backup": "data/backup/vaccCov.csv",
+        "description": "vaccination coverage data"},
+    "vaccAgeNL": {
+        "url": 'https://data.rivm.nl/data/covid-19/COVID-19_vaccinatiegraad_per_gemeente_per_week_leeftijd.csv',
+        "columns": ['Vaccination_coverage_partly','Vaccination_coverage_completed','Date_of_statistics', 'Age_group'],
+        "options": {"sep": ";"},
+        "backup": "data/backup/vaccAgeNL.csv",
+        "description": "vaccination age data for NL"},
+    "vaccAgeUK": {
+        "url": 'https://api.coronavirus.data.gov.uk/v2/data?areaType=nation&areaCode=E92000001&metric=vaccinationsAgeDemographics&format=csv',
+        "columns": ['date', 'age', 'cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate', 'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage'],
+        "options": {},
+        "query": {"api": "ukhsa",
+                  "columns": ['date', 'age', 'cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate', 'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage'],
+                  "filters": "areaType=nation;areaCode=E92000001",
+                  "structure": {"date": "date", "vaccinationsAgeDemographics": "vaccinationsAgeDemographics"},
+                  "latestBy": "vaccinationsAgeDemographics",
+                  "nested": "vaccinationsAgeDemographics"},
+        "backup": "data/backup/vaccAgeUK.csv",
+        "description": "vaccination age data for UK"},
+    "vaccAgeUS": {
+        "url": "https://data.cdc.gov/resource/km4m-vcsb.csv",
+        "columns": ['date','demographic_category','administered_dose1','administered_dose1_pct','series_complete_yes','series_complete_pop_pct'],
+        "options": {},
+        "backup": "data/backup/vaccAgeUS.csv",
+        "description": "vaccination age data for US"},
+    "vaccLocNL": {
+        "url": 'https://data.rivm.nl/data/covid-19/COVID-19_vaccinatiegraad_per_gemeente_per_week_leeftijd.csv',
+        "columns": ['Region_level', 'Region_code', 'Region_name', 'Birth_year','Date_of_statistics',  'Vaccination_coverage_completed', 'Vaccination_coverage_partly'],
+        "options": {"sep": ";"},
+        "backup": "data/backup/vaccLocNL.csv",
+        "description": "vaccination location data for NL"},
+    "vaccLocUK": {
+        "url": "https://api.coronavirus.data.gov.uk/v2/data?areaType=ltla&metric=cumVaccinationCompleteCoverageByVaccinationDatePercentage&format=csv",
+        "columns": ['areaType','areaName', 'areaCode', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage', 'date'],
+        "options": {},
+        "query": {"api": "ukhsa",
+                  "columns": ['areaType','areaName', 'areaCode', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage', 'date'],
+                  "filters": "areaType=ltla",
+                  "structure": {"areaType": "areaType", "areaName": "areaName", "areaCode": "areaCode",
+                                "cumVaccinationCompleteCoverageByVaccinationDatePercentage": "cumVaccinationCompleteCoverageByVaccinationDatePercentage",
+                                "date": "date"},
+                  "latestBy": "cumVaccinationCompleteCoverageByVaccinationDatePercentage",
+                  "area": "areaCode",
+                  "latest": "date"},
+        "backup": "data/backup/vaccLocUK.csv",
+        "description": "vaccination location data for UK"},
+    "vaccLocUSCounty": {
+        "url": "https://data.cdc.gov/resource/8xkx-amqh.csv",
+        "columns": ['date','fips','recip_county','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct'],
+        "options": {"dtype": {'fips': 'object'}},
+        "query": {"api": "soda",
+                  "columns": ['date','fips','recip_county','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct'],
+                  "latest": "date",
+                  "order": "fips"},
+        "backup": "data/backup/vaccLocUSCounty.csv",
+        "description": "vaccination location data for US counties"},
+    "vaccLocUSState": {
+        "url": "https://data.cdc.gov/resource/unsk-b7fc.csv",
+        "columns": ['date','location','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct'],
+        "options": {},
+        "query": {"api": "soda",
+                  "columns": ['date','location','series_complete_pop_pct','series_complete_yes','administered_dose1_recip','administered_dose1_pop_pct'],
+                  "latest": "date",
+                  "order": "location"},
+        "backup": "data/backup/vaccLocUSState.csv",
+        "description": "vaccination location data for US states"},
+}
+
+# Retrieve all sources at the same time (True) or one after another (False)
+RETRIEVE_CONCURRENTLY = True
+
+# Number of rows per chunk when streaming a source
+CHUNK_SIZE = 50000
+
+## READ DATA -------------------------------------------------------------------
+
+# Read a downloaded source or local backup file
+def readData(path, options, rows=None):
+    """ Reads a csv file into a dataframe.
+        If only some rows are needed, the file is streamed in chunks and filtered chunk by chunk,
+        so memory use grows with the kept rows instead of with the whole file.
+
+        Parameters:
+        path (string): path or url of the csv file
+        options (dict): options passed to pd.read_csv, such as the columns to read and their data types
+        rows (tuple): column and list of values of the rows to keep, all rows if not given
+
+        Returns:
+        data (dataframe): parsed csv file
+    """
+    if rows is None:
+        return pd.read_csv(path, **options)
+
+    column, values = rows
+    chunks = pd.read_csv(path, chunksize=CHUNK_SIZE, **options)
+    data = pd.concat([chunk[chunk[column].isin(values)] for chunk in chunks], ignore_index=True)
+    return data
+
+## FETCH LAYER -----------------------------------------------------------------
+
+# Download an online source, or only its latest rows
+def fetchSource(url, query=None):
+    """ Downloads an online source through the on-disk source cache.
+        If the source has a query, then only its latest rows are retrieved from the API of the source.
+
+        Parameters:
+        url (string): url of the online source
+        query (dict): query for the latest rows only, the whole source is downloaded if not given
+
+        Returns:
+        path (string): path of the downloaded (or cached) file
+        modified (boolean): true if the file changed compared to the cached copy, false if not
+    """
+    if query is None:
+        return sourcecache.fetchSource(url)
+    if query["api"] == "soda":
+        return soda.fetchLatest(url, query)
+    if query["api"] == "ukhsa":
+        return ukhsa.fetchLatest(url, query)
+    raise ValueError("Unknown api " + query["api"] + " for " + url + ".")
+
+# Refresh-scoped cache of downloaded and parsed online sources
+class FetchSession:
+    """ Downloads and parses each distinct online source (url) only once.
+        A new session is used for every refresh, so every refresh still retrieves up-to-date data.
+        Downloads go through the on-disk source cache, see sourcecache.py.
+        Keeps track of hits (reused downloads) and misses (actual downloads) per url.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.modified = {}
+        self.errors = {}
+        self.frames = {}
+        self.locks = {}
+        self.hits = {}
+        self.misses = {}
+        self.lock = threading.Lock()
+
+    def keyLock(self, key):
+        """ Returns the lock that makes sure only one thread works on a url (or parsed url) at the time. """
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+    def download(self, url, query=None):
+        """ Downloads an online source, only if this was not done before in this session.
+
+            Parameters:
+            url (string): url of the online source
+            query (dict): query for the latest rows only, see fetchSource, the whole source is downloaded if not given
+
+            Returns:
+            path (string): path of the downloaded (or cached) file
+        """
+        # Only one thread downloads a url, other threads wait for its result
+        with self.keyLock(url):
+            if url in self.paths or url in self.errors:
+                with self.lock:
+                    self.hits[url] = self.hits.get(url, 0) + 1
+            else:
+                with self.lock:
+                    self.misses[url] = self.misses.get(url, 0) + 1
+                try:
+                    self.paths[url], self.modified[url] = fetchSource(url, query)
+                # Remember failed downloads, so the url is not retried within the same refresh
+                except Exception as error:
+                    self.errors[url] = error
+
+        if url in self.errors:
+            raise self.errors[url]
+        return self.paths[url]
+
+    def read(self, url, options, rows=None, query=None):
+        """ Reads an online source, downloads and parses it only if this was not done before in this session.
+
+            Parameters:
+            url (string): url of the online source
+            options (dict): options passed to pd.read_csv
+            rows (tuple): column and list of values of the rows to keep, all rows if not given
+            query (dict): query for the latest rows only, see fetchSource, the whole source is downloaded if not given
+
+            Returns:
+            data (dataframe): copy of the parsed online source
+        """
+        path = self.download(url, query)
+        key = (url, repr(sorted(options.items())), repr(rows))
+        with self.keyLock(key):
+            if key not in self.frames:
+                self.frames[key] = readData(path, options, rows)
+
+        # Hand out a copy, because the preparation code changes datasets in place
+        return self.frames[key].copy()
+
+    def isModified(self, url):
+        """ Determines if an online source changed since it was last retrieved.
+            Sources that could not be retrieved count as not modified.
+
+            Parameter:
+            url (string): url of the online source
+
+            Returns:
+            Boolean: true if the source was modified, false if not.
+        """
+        return self.modified.get(url, False)
+
+    def report(self):
+        """ Summarises how often each url was reused and downloaded in this session.
+
+            Returns:
+            report (dataframe): hits, misses and modification per url
+        """
+        urls = sorted(set(self.hits) | set(self.misses))
+        report = pd.DataFrame({'url': urls,
+                               'hits': [self.hits.get(url, 0) for url in urls],
+                               'misses': [self.misses.get(url, 0) for url in urls],
+                               'modified': [self.isModified(url) for url in urls]})
+        return report
+
+
+# Retrieved sources of a refresh, parsed when the preparation code first needs them
+class RetrievedSources(Mapping):
+    """ Read-only mapping from source name to its retrieved (raw) dataset.
+        Sources are only parsed when they are used, so unmodified sources that are
+        not prepared again during a refresh are never parsed.
+    """
+
+    def __init__(self, names, session, offline=False):
+        self.names = list(names)
+        self.session = session
+        self.offline = offline
+        self.datasets = {}
+
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        if name not in self.datasets:
+            self.datasets[name] = retrieveSource(name, self.session, self.offline)
+        return self.datasets[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def modified(self, names):
+        """ Determines if any of the given online sources changed since they were last retrieved.
+
+            Parameter:
+            names (list): names of the sources as defined in SOURCES
+
+            Returns:
+            Boolean: true if at least one of the sources was modified, false if not.
+        """
+        return any(self.session.isModified(SOURCES[name]["url"]) for name in names)
+
+    def fingerprint(self, name):
+        """ Identifies the version of a source that this retrieval reads: the file it is read from,
+            with the time it was last written and its size. A cached source only gets a new fingerprint
+            when a new version is stored, so it tells whether datasets were prepared from this version.
+
+            Parameter:
+            name (string): name of the source as defined in SOURCES
+
+            Returns:
+            fingerprint (string): file, modification time and size of the (cached) source or local backup file
+        """
+        source = SOURCES[name]
+        path = None if self.offline else self.session.paths.get(source["url"])
+        if path is None:
+            path = source["backup"]
+        try:
+            status = os.stat(path)
+        except OSError:
+            return path
+        return path + ":" + str(status.st_mtime_ns) + ":" + str(status.st_size)
+
+
+## RETRIEVE DATA ---------------------------------------------------------------
+
+# Retrieve a single source
+def retrieveSource(name, session=None, offline=False):
+    """ Retrieves a (raw) dataset from its online source.
+        If the dataset cannot be retrieved or does not have the expected structure,
+        then the cached copy of the source is used or, if there is none, the local backup file.
+
+        Parameters:
+        name (string): name of the source as defined in SOURCES
+        session (FetchSession): session to share downloads with, a new session if not given
+        offline (boolean): load the local backup file without retrieving the online source
+
+        Returns:
+        data (dataframe): retrieved (raw) dataset
+    """
+    source = SOURCES[name]
+    if offline:
+        return readData(source["backup"], source["options"], source.get("rows"))
+    if session is None:
+        session = FetchSession()
+
+    # Load dynamic data by retrieving from online source (or cached copy) and check structure
+    try:
+        data = session.read(source["url"], source["options"], source.get("rows"), source.get("query"))
+        data[source["columns"]]
+    # If data cannot be retrieved: load local backup file
+    except:
+        data = readData(source["backup"], source["options"], source.get("rows"))
+        print("Note: could not load " + source["description"] + " from online source, used local backup file instead.")
+
+    return data
+
+# Retrieve multiple sources
+def retrieveSources(names=None, concurrent=None, offline=False):
+    """ Retrieves the (raw) datasets of multiple online sources.
+        By default all sources are downloaded in parallel, so retrieval takes
+        as long as the slowest source instead of the sum of all sources.
+        Sources with the same url are downloaded and parsed only once.
+        Sources that were not modified since they were cached are not downloaded again.
+
+        Parameters:
+        names (list): names of the sources to retrieve, all sources in SOURCES if not given
+        concurrent (boolean): retrieve sources in parallel, RETRIEVE_CONCURRENTLY if not given
+        offline (boolean): only load the local backup files, without retrieving the online sources
+
+        Returns:
+        sources (RetrievedSources): retrieved (raw) dataset for each source name
+    """
+    if names is None:
+        names = list(SOURCES)
+    if concurrent is None:
+        concurrent = RETRIEVE_CONCURRENTLY
+    session = FetchSession()
+    if offline:
+        return RetrievedSources(names, session, offline=True)
+
+    # Download a source, failures are handled when the source is read
+    def download(name):
+        try:
+            session.download(SOURCES[name]["url"], SOURCES[name].get("query"))
+        except Exception:
+            pass
+
+    # Download sources in parallel: each download mostly waits on the network
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            list(executor.map(download, names))
+
+    # Download sources one after another
+    else:
+        for name in names:
+            download(name)
+
+    # Log how many downloads were shared between sources and how many sources changed
+    report = session.report()
+    print("Retrieved " + str(len(names)) + " sources: " + str(report['misses'].sum()) + " downloads (misses), "
+          + str(report['hits'].sum()) + " shared downloads (hits), "
+          + str(report['modified'].sum()) + " modified since last retrieval.")
+    if (report['misses'] > 1).any():
+        print("Note: some online sources were downloaded more than once.")
+
+    return RetrievedSources(names, session)
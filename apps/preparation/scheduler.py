@@ -0,0 +1,78 @@
+## REFRESH SCHEDULER CODE ------------------------------------------------------
+
+# This file contains the background scheduler that refreshes the data.
+# Datasets and forecasts are rebuilt in a background thread, off the request path.
+# Page requests always use the last successfully refreshed data and never refresh data themselves.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import threading
+import datetime
+from apps.preparation import preparation
+from apps.modelling import modelling
+
+## SCHEDULER SETTINGS ----------------------------------------------------------
+
+# Minutes between two automatic refreshes
+REFRESH_INTERVAL = 60
+
+# Signal to refresh immediately instead of waiting for the next automatic refresh
+refreshRequested = threading.Event()
+
+# Background thread that runs the scheduler
+schedulerThread = None
+schedulerLock = threading.Lock()
+
+## REFRESH DATA ----------------------------------------------------------------
+
+# Rebuild datasets and forecasts
+def refreshAll():
+    """ Retrieves and prepares all datasets, forecasts vaccination coverage with the new datasets,
+        and only then publishes the datasets and forecasts together as one new bundle.
+    """
+    print("Refreshing data in the background, note that this might take 0,5 to 3 minutes...")
+    datasets = preparation.buildDatasets()
+    datasets.update(modelling.predictFutureCoverages(datasets))
+    preparation.publishBundle(datasets)
+    print("Succefully refreshed data.")
+
+# Loop that refreshes the data on a fixed cadence
+def runScheduler():
+    """ Refreshes the data every REFRESH_INTERVAL minutes, or immediately when a refresh is requested.
+        If a refresh fails, the dashboard keeps using the last successfully refreshed data.
+    """
+    nextRefresh = preparation.getBundle().created + datetime.timedelta(minutes=REFRESH_INTERVAL)
+    while True:
+        # Wait until the next refresh is due or a refresh is requested
+        secondsLeft = (nextRefresh - datetime.datetime.now()).total_seconds()
+        refreshRequested.wait(timeout=max(0, secondsLeft))
+        refreshRequested.clear()
+
+        try:
+            refreshAll()
+        except Exception as error:
+            print("Could not refresh data, the last refreshed data stays in use: " + repr(error))
+        nextRefresh = datetime.datetime.now() + datetime.timedelta(minutes=REFRESH_INTERVAL)
+
+## CONTROL SCHEDULER -----------------------------------------------------------
+
+# Start the scheduler together with the dashboard
+def startScheduler(refreshNow=False):
+    """ Starts the background scheduler, if it is not running yet.
+
+        Parameter:
+        refreshNow (boolean): refresh immediately after starting, instead of after REFRESH_INTERVAL minutes
+    """
+    global schedulerThread
+    with schedulerLock:
+        if schedulerThread is None:
+            schedulerThread = threading.Thread(target=runScheduler, name="refresh-scheduler", daemon=True)
+            schedulerThread.start()
+    if refreshNow:
+        requestRefresh()
+
+# Ask the scheduler for a refresh
+def requestRefresh():
+    """ Asks the background scheduler to refresh the data as soon as possible.
+        Returns immediately, the refreshed data is used as soon as it is ready.
+    """
+    refreshRequested.set()
@@ -0,0 +1,240 @@
+## SCHEMA MAPPING CODE ---------------------------------------------------------
+
+# This file contains the schema of every (raw) source and the code that maps a source onto its schema.
+# A schema declares the columns and rows to keep, how columns are renamed and recoded,
+# which values mean "missing", the data types, and whether only the latest date is kept.
+# The schema is applied in a single pass: every needed column is transformed once, on the kept rows only,
+# and the prepared table is built once, instead of copying the whole table for every rename, replace and astype.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+## SCHEMAS ---------------------------------------------------------------------
+
+# Full state names of the state abbreviations used by the CDC
+STATE_NAMES = {"AL" : "Alabama", "AK" : "Alaska", "AZ" : "Arizona", "AR" : "Arkansas", "CA" : "California",
+               "CO" : "Colorado", "CT" : "Connecticut", "DE" : "Delaware", "DC" : "District of Columbia", "FL" : "Florida",
+               "GA" : "Georgia", "HI" : "Hawaii", "ID" : "Idaho", "IL" : "Illinois", "IN" : "Indiana",
+               "IA" : "Iowa", "KS" : "Kansas", "KY" : "Kentucky", "LA" : "Louisiana", "ME" : "Maine",
+               "MD" : "Maryland", "MA" : "Massachusetts", "MI" : "Michigan", "MN" : "Minnesota", "MS" : "Mississippi",
+               "MO" : "Missouri", "MT" : "Montana", "NE" : "Nebraska", "NV" : "Nevada", "NH" : "New Hampshire",
+               "NJ" : "New Jersey", "NM" : "New Mexico", "NY" : "New York", "NC" : "North Carolina", "ND" : "North Dakota",
+               "OH" : "Ohio", "OK" : "Oklahoma", "OR" : "Oregon", "PA" : "Pennsylvania", "RI" : "Rhode Island",
+               "SC" : "South Carolina", "SD" : "South Dakota", "TN" : "Tennessee", "TX" : "Texas", "UT" : "Utah",
+               "VT" : "Vermont", "VA" : "Virginia", "WA" : "Washington", "WV" : "West Virginia", "WI" : "Wisconsin",
+               "WY" : "Wyoming"}
+
+# Country codes used by Our World in Data and their abbreviations in the dashboard
+COUNTRY_CODES = {"USA": "US", "GBR": "UK", "NLD": "NL"}
+
+# Values that the RIVM uses for suppressed or unknown vaccination coverages
+RIVM_MISSING = [">=95", "9999"]
+
+# Schema of every (raw) source.
+# "columns" and "rows" use the column names of the source, all other rules use the new column names.
+# columns (list): columns to keep, in this order unless "order" is given
+# rows (dict): for a column, the values of the rows to keep
+# rowsAfterLatest (dict): like rows, but these rows are only dropped after the latest value is chosen (see latest),
+#                         so the latest value is chosen among all rows, as the original preparation code did
+# rename (dict): new name of a column
+# missing (dict): for a column, the values that mean the value is missing (NaN)
+# recode (dict): for a column, the new values of some values, other values are kept
+# lookup (dict): for a column, the new value of every value, values that are not listed become missing (NaN)
+# dtypes (dict): data type of a column
+# pad (dict): for a column of codes, the length to which the codes are padded with leading zeros
+#            (the original preparation code did not pad, so county fips codes below 10000 did not match their shape)
+# constants (dict): columns to add with the same value in every row
+# dropna (list): columns in which rows with a missing value are dropped
+# unique (boolean): drop duplicate rows
+# latest (string): keep only the rows with the latest value of this column, such as the latest date
+# latestPer (string): keep the latest row for every value of this column instead, such as every location
+# order (list): order of the columns of the prepared table
+SCHEMAS = {
+    "vaccCov": {
+        "columns": ['date', 'iso_code', 'people_vaccinated', 'people_vaccinated_per_hundred', 'people_fully_vaccinated', 'people_fully_vaccinated_per_hundred'],
+        "rows": {'iso_code': list(COUNTRY_CODES)},
+        "rename": {'iso_code': 'country', 'people_vaccinated': 'count_one_dose', 'people_vaccinated_per_hundred': 'coverage_one_dose',
+                   'people_fully_vaccinated': 'count_full_dose', 'people_fully_vaccinated_per_hundred': 'coverage_full_dose'},
+        "recode": {'country': COUNTRY_CODES},
+        "dtypes": {'date': 'datetime64[ns]'},
+        "dropna": ['date', 'coverage_full_dose'],
+        "unique": True},
+    "vaccAttitudes": {
+        "columns": ['Day', 'Code', 'people_vaccinated_per_hundred', 'willingness_covid_vaccinate_this_week_pct_pop', 'uncertain_covid_vaccinate_this_week_pct_pop', 'unwillingness_covid_vaccinate_this_week_pct_pop'],
+        "rows": {'Code': list(COUNTRY_CODES)},
+        "rename": {'Day': 'date', 'Code': 'country', 'people_vaccinated_per_hundred': 'vaccinated_one_dose_percentage',
+                   'willingness_covid_vaccinate_this_week_pct_pop': 'willing_percentage',
+                   'uncertain_covid_vaccinate_this_week_pct_pop': 'uncertain_percentage',
+                   'unwillingness_covid_vaccinate_this_week_pct_pop': 'unwilling_percentage'},
+        "recode": {'country': COUNTRY_CODES},
+        "dtypes": {'date': 'datetime64[ns]'},
+        "unique": True},
+    "vaccAgeNL": {
+        "columns": ['Date_of_statistics', 'Age_group', 'Vaccination_coverage_partly', 'Vaccination_coverage_completed'],
+        # Only 'Veiligheidsregio' as region level, because using both 'Veiligheidsregio' and 'Gemeente' would be double
+        "rows": {'Region_level': ['Veiligheidsregio']},
+        "rename": {'Date_of_statistics': 'date', 'Age_group': 'age_group',
+                   'Vaccination_coverage_partly': 'coverage_one_dose', 'Vaccination_coverage_completed': 'coverage_full_dose'},
+        "missing": {'coverage_one_dose': RIVM_MISSING, 'coverage_full_dose': RIVM_MISSING},
+        "dtypes": {'date': 'datetime64[ns]', 'coverage_one_dose': 'float', 'coverage_full_dose': 'float'}},
+    "vaccAgeUK": {
+        "columns": ['date', 'age', 'cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate', 'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage'],
+        "rename": {'age': 'age_group', 'cumPeopleVaccinatedFirstDoseByVaccinationDate': 'count_one_dose',
+                   'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage': 'coverage_one_dose',
+                   'cumPeopleVaccinatedCompleteByVaccinationDate': 'count_full_dose',
+                   'cumVaccinationCompleteCoverageByVaccinationDatePercentage': 'coverage_full_dose'},
+        "recode": {'age_group': {'12_15': '12-15', '16_17': '16-17', '18_24': '18-24', '25_29': '25-29',
+                                 '30_34': '30-34', '35_39': '35-39', '40_44': '40-44', '45_49': '45-49',
+                                 '50_54': '50-54', '55_59': '55-59', '60_64': '60-64', '65_69': '65-69',
+                                 '70_74': '70-74', '75_79': '75-79', '80_84': '80-84', '85_89': '85-89', '90+': '90+'}},
+        "dtypes": {'date': 'datetime64[ns]'},
+        "constants": {'country': 'UK'},
+        "unique": True,
+        "latest": 'date',
+        "order": ['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']},
+    "vaccAgeUS": {
+        "columns": ['date', 'demographic_category', 'administered_dose1', 'administered_dose1_pct', 'series_complete_yes', 'series_complete_pop_pct'],
+        "rows": {'demographic_category': ['Ages_<12yrs', 'Ages_12-15_yrs', 'Ages_16-17_yrs', 'Ages_18-24_yrs', 'Ages_18-29_yrs',
+                                          'Ages_25-39_yrs', 'Ages_30-39_yrs', 'Ages_40-49_yrs', 'Ages_50-64_yrs', 'Ages_65-74_yrs', 'Ages_75+_yrs',
+                                          'Ages_<18yrs', 'Age_unknown', 'Age_known']},
+        # Age known, age unknown and 18 minus are not shown
+        "rowsAfterLatest": {'demographic_category': ['Ages_<12yrs', 'Ages_12-15_yrs', 'Ages_16-17_yrs', 'Ages_18-24_yrs', 'Ages_18-29_yrs',
+                                                     'Ages_25-39_yrs', 'Ages_30-39_yrs', 'Ages_40-49_yrs', 'Ages_50-64_yrs', 'Ages_65-74_yrs', 'Ages_75+_yrs']},
+        "rename": {'demographic_category': 'age_group', 'administered_dose1': 'count_one_dose', 'administered_dose1_pct': 'coverage_one_dose',
+                   'series_complete_yes': 'count_full_dose', 'series_complete_pop_pct': 'coverage_full_dose'},
+        "recode": {'age_group': {'Ages_18-24_yrs': '18-24', 'Ages_50-64_yrs': '50-64', 'Ages_75+_yrs': '75+', 'Ages_65-74_yrs': '65-74',
+                                 'Ages_25-39_yrs': '25-39', 'Ages_50-65_yrs': '50-65', 'Ages_16-17_yrs': '16-17', 'Ages_<12yrs': '12-',
+                                 'Ages_40-49_yrs': '40-49', 'Ages_<18yrs': '18-', 'Ages_12-15_yrs': '12-15', 'Ages_30-39_yrs': '30-39',
+                                 'Ages_18-29_yrs': '18-29', 'Age_unknown': 'Age unknown', 'Age_known': 'Age known'}},
+        "dtypes": {'date': 'datetime64[ns]'},
+        "constants": {'country': 'US'},
+        "unique": True,
+        "latest": 'date',
+        "order": ['date', 'country', 'age_group', 'count_one_dose', 'coverage_one_dose', 'count_full_dose', 'coverage_full_dose']},
+    "vaccLocNL": {
+        "columns": ['Region_level', 'Region_code', 'Region_name', 'Date_of_statistics', 'Vaccination_coverage_completed', 'Vaccination_coverage_partly'],
+        # Municipality level and aged 12+ only
+        "rows": {'Region_level': ['Gemeente']},
+        "rowsAfterLatest": {'Birth_year': ['<2004']},
+        "rename": {'Region_level': 'location_level', 'Region_code': 'location_code', 'Region_name': 'location_name', 'Date_of_statistics': 'date',
+                   'Vaccination_coverage_completed': 'coverage_full_dose', 'Vaccination_coverage_partly': 'coverage_one_dose'},
+        "missing": {'coverage_one_dose': RIVM_MISSING, 'coverage_full_dose': RIVM_MISSING},
+        "recode": {'location_level': {'Gemeente': 'Municipality', 'Veiligheidsregio': 'Safety region'}},
+        "dtypes": {'date': 'datetime64[ns]', 'coverage_one_dose': 'float', 'coverage_full_dose': 'float'},
+        "constants": {'count_full_dose': np.nan, 'count_one_dose': np.nan, 'country': 'NL'},
+        "unique": True,
+        "latest": 'date',
+        "order": ['location_level', 'location_code', 'location_name', 'count_full_dose', 'count_one_dose', 'date', 'coverage_full_dose', 'coverage_one_dose', 'country']},
+    "vaccLocUK": {
+        "columns": ['areaCode', 'areaName', 'date', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage'],
+        "rename": {'areaName': 'location_name', 'areaCode': 'location_code', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage': 'coverage_full_dose'},
+        "dtypes": {'date': 'datetime64[ns]'},
+        "constants": {'location_level': 'Lower tier local authority', 'country': 'UK'},
+        "unique": True,
+        "latest": 'date',
+        "latestPer": 'location_name',
+        "order": ['location_level', 'location_code', 'location_name', 'date', 'coverage_full_dose', 'country']},
+    "vaccLocUSCounty": {
+        "columns": ['date', 'fips', 'recip_county', 'series_complete_pop_pct', 'series_complete_yes', 'administered_dose1_recip', 'administered_dose1_pop_pct'],
+        "rename": {'recip_county': 'location_name', 'fips': 'location_code', 'administered_dose1_recip': 'count_one_dose',
+                   'administered_dose1_pop_pct': 'coverage_one_dose', 'series_complete_yes': 'count_full_dose', 'series_complete_pop_pct': 'coverage_full_dose'},
+        "dtypes": {'date': 'datetime64[ns]', 'location_code': 'string'},
+        "pad": {'location_code': 5},
+        "constants": {'location_level': 'County', 'country': 'US'},
+        "unique": True,
+        "latest": 'date',
+        "order": ['location_level', 'date', 'location_code', 'location_name', 'coverage_full_dose', 'count_full_dose', 'count_one_dose', 'coverage_one_dose', 'country']},
+    "vaccLocUSState": {
+        "columns": ['date', 'location', 'series_complete_pop_pct', 'series_complete_yes', 'administered_dose1_recip', 'administered_dose1_pop_pct'],
+        "rename": {'location': 'location_name', 'administered_dose1_recip': 'count_one_dose', 'administered_dose1_pop_pct': 'coverage_one_dose',
+                   'series_complete_yes': 'count_full_dose', 'series_complete_pop_pct': 'coverage_full_dose'},
+        "lookup": {'location_name': STATE_NAMES},
+        "dtypes": {'date': 'datetime64[ns]'},
+        "constants": {'location_level': 'County', 'country': 'US'},
+        "dropna": ['location_name'],
+        "unique": True,
+        "latest": 'date',
+        "order": ['location_level', 'date', 'location_name', 'coverage_full_dose', 'count_full_dose', 'count_one_dose', 'coverage_one_dose', 'country']},
+}
+
+## APPLY SCHEMA ----------------------------------------------------------------
+
+# Change data type of a column
+def convertColumn(values, dtype):
+    """ Changes the data type of a column.
+
+        Parameters:
+        values (series): values of the column
+        dtype (string): new data type, such as 'float' or 'datetime64[ns]'
+
+        Returns:
+        values (series): values with the new data type
+    """
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(values)
+    return values.astype(dtype)
+
+# Map a (raw) source onto its schema
+def applySchema(data, schema):
+    """ Prepares a (raw) source in a single pass according to its schema, see SCHEMAS.
+        The source itself is not changed.
+
+        Parameters:
+        data (dataframe): (raw) source
+        schema (dict): schema of the source
+
+        Returns:
+        prepared (dataframe): prepared table
+    """
+    rename = schema.get("rename", {})
+
+    # Rows to keep, determined on the columns of the source
+    keep = np.ones(len(data), dtype=bool)
+    for column, values in schema.get("rows", {}).items():
+        keep &= data[column].isin(values).to_numpy()
+    index = data.index[keep]
+    keepAfterLatest = np.ones(len(index), dtype=bool)
+    for column, values in schema.get("rowsAfterLatest", {}).items():
+        keepAfterLatest &= data[column].isin(values).to_numpy()[keep]
+
+    # Transform every needed column once, on the kept rows only
+    columns = {}
+    for column in schema["columns"]:
+        name = rename.get(column, column)
+        values = pd.Series(data[column].to_numpy()[keep], index=index, name=name)
+        if name in schema.get("missing", {}):
+            values = values.mask(values.isin(schema["missing"][name]))
+        if name in schema.get("recode", {}):
+            values = values.replace(schema["recode"][name])
+        if name in schema.get("lookup", {}):
+            values = values.map(schema["lookup"][name])
+        if name in schema.get("dtypes", {}):
+            values = convertColumn(values, schema["dtypes"][name])
+        if name in schema.get("pad", {}):
+            values = values.str.zfill(schema["pad"][name])
+        columns[name] = values
+
+    # Rows to drop because of missing values or because they are not the latest
+    keep = np.ones(len(index), dtype=bool)
+    for name in schema.get("dropna", []):
+        keep &= columns[name].notna().to_numpy()
+    if "latest" in schema and "latestPer" not in schema and keep.any():
+        latest = columns[schema["latest"]]
+        keep &= (latest == latest[keep].max()).to_numpy()
+    keep &= keepAfterLatest
+
+    # Build prepared table once, with its columns in the right order
+    for name, value in schema.get("constants", {}).items():
+        columns[name] = value
+    order = schema.get("order", list(columns))
+    prepared = pd.DataFrame({name: columns[name][keep] if isinstance(columns[name], pd.Series) else columns[name]
+                             for name in order}, index=index[keep])
+
+    if schema.get("unique", False):
+        prepared = prepared.drop_duplicates()
+
+    # Latest row for every value of a column, such as the latest date that is available for each location
+    if "latestPer" in schema:
+        prepared = prepared.sort_values([schema["latestPer"], schema["latest"]]).drop_duplicates(subset=schema["latestPer"], keep='last')
+    return prepared
@@ -0,0 +1,159 @@
+## DATA SNAPSHOT CODE ----------------------------------------------------------
+
+# This file contains the snapshot of the prepared datasets.
+# A snapshot stores the already prepared datasets in a columnar format (Parquet),
+# so the dashboard can start without parsing and preparing the raw data again.
+#
+# Build a snapshot from the local backup files (from the main folder of the dashboard):
+# python -m apps.preparation.snapshot
+#
+# Start the dashboard from the snapshot:
+# VAXOSCOPE_BOOT=snapshot python index.py
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import json
+import time
+import datetime
+import pandas as pd
+import geopandas as gpd
+from apps.preparation import lazy
+
+## SNAPSHOT SETTINGS -----------------------------------------------------------
+
+# Folder in which the snapshot is stored
+SNAPSHOT_FOLDER = "data/snapshot"
+
+# Prepared datasets that are stored in the snapshot
+DATASETS = ['vaccCov', 'vaccCovNL', 'vaccCovUK', 'vaccCovUS',
+            'vaccAttitudes', 'vaccAttitudesNL', 'vaccAttitudesUK', 'vaccAttitudesUS',
+            'vaccAge', 'vaccAgeNL', 'vaccAgeUK', 'vaccAgeUS',
+            'vaccLocNL', 'vaccLocMapNL', 'vaccLocUK', 'vaccLocMapUK',
+            'vaccLocUSCounty', 'vaccLocMapCountyUS', 'vaccLocUSState', 'vaccLocMapStateUS',
+            'vaccIncomeNL', 'vaccIncomeUK', 'vaccIncomeUS', 'joinReport']
+
+# Prepared datasets that are only read from the snapshot when they are first used, see lazy.py
+LAZY_DATASETS = ['vaccLocUSCounty', 'vaccLocMapCountyUS']
+
+## SAVE AND LOAD SNAPSHOT ------------------------------------------------------
+
+# Check if a snapshot is available
+def snapshotExists(folder=SNAPSHOT_FOLDER):
+    """ Determines if a snapshot is available.
+
+        Parameter:
+        folder (string): folder of the snapshot
+
+        Returns:
+        Boolean: true if a complete snapshot is available, false if not.
+    """
+    return os.path.exists(os.path.join(folder, "manifest.json"))
+
+# Store prepared datasets in snapshot
+def saveSnapshot(datasets, folder=SNAPSHOT_FOLDER):
+    """ Stores prepared datasets as Parquet files, together with a manifest that describes them.
+
+        Parameters:
+        datasets (dict): prepared dataset (dataframe or geodataframe) for each dataset name
+        folder (string): folder of the snapshot
+    """
+    os.makedirs(folder, exist_ok=True)
+    manifest = {"created": datetime.datetime.now().isoformat(), "datasets": {}}
+
+    for name, data in datasets.items():
+        # Geodataframes also store their geometry and coordinate reference system
+        data.to_parquet(os.path.join(folder, name + ".parquet"))
+        manifest["datasets"][name] = {"file": name + ".parquet",
+                                      "geometry": isinstance(data, gpd.GeoDataFrame)}
+
+    # Write manifest last, so an interrupted build never leaves a snapshot that looks complete
+    with open(os.path.join(folder, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+# Load prepared datasets from snapshot
+def loadSnapshot(folder=SNAPSHOT_FOLDER):
+    """ Loads the prepared datasets from a snapshot.
+
+        Parameter:
+        folder (string): folder of the snapshot
+
+        Returns:
+        datasets (dict): prepared dataset (dataframe or geodataframe) for each dataset name,
+                         datasets in LAZY_DATASETS as placeholders that read the dataset when it is first used
+    """
+    with open(os.path.join(folder, "manifest.json")) as file:
+        manifest = json.load(file)
+
+    datasets = {}
+    for name, entry in manifest["datasets"].items():
+        path = os.path.join(folder, entry["file"])
+        if name in LAZY_DATASETS:
+            group = lazy.LazyDatasets(lambda kept, name=name, path=path, entry=entry: {name: readDataset(path, entry)})
+            datasets[name] = lazy.LazyDataset(group, name)
+        else:
+            datasets[name] = readDataset(path, entry)
+    return datasets
+
+# Read a dataset of the snapshot
+def readDataset(path, entry):
+    """ Reads a prepared dataset from its Parquet file.
+
+        Parameters:
+        path (string): path of the Parquet file
+        entry (dict): description of the dataset in the manifest
+
+        Returns:
+        data (dataframe or geodataframe): prepared dataset
+    """
+    if entry["geometry"]:
+        return gpd.read_parquet(path)
+    return pd.read_parquet(path)
+
+## BUILD SNAPSHOT --------------------------------------------------------------
+
+# Create missing local backup files
+def ensureBackups():
+    """ Creates the local backup files that are missing (such as vaccCov.csv) from the online sources.
+        Only the columns and rows that the preparation code needs are stored.
+    """
+    from apps.preparation import retrieval
+
+    for name, source in retrieval.SOURCES.items():
+        if os.path.exists(source["backup"]):
+            continue
+        print("Creating missing backup file " + source["backup"] + " ...")
+        session = retrieval.FetchSession()
+        data = session.read(source["url"], source["options"], source.get("rows"), source.get("query"))
+        data = data[source["columns"]]
+        data.to_csv(source["backup"], sep=source["options"].get("sep", ","), index=False)
+
+# Build snapshot from the local backup files
+def buildSnapshot(folder=SNAPSHOT_FOLDER):
+    """ Prepares all datasets from the local backup files and stores them in a snapshot.
+
+        Parameter:
+        folder (string): folder of the snapshot
+    """
+    ensureBackups()
+
+    # Prepare datasets from the local backup files only
+    os.environ["VAXOSCOPE_BOOT"] = "backup"
+    start = time.perf_counter()
+    from apps.preparation import preparation
+    prepareSeconds = time.perf_counter() - start
+
+    bundle = preparation.getBundle()
+    datasets = {name: bundle[name] for name in DATASETS}
+    saveSnapshot(datasets, folder)
+    print("Stored snapshot of " + str(len(datasets)) + " datasets in " + folder + ".")
+
+    # Compare start-up time of snapshot with preparing the local backup files
+    start = time.perf_counter()
+    loadSnapshot(folder)
+    loadSeconds = time.perf_counter() - start
+    print("Preparing the local backup files takes " + str(round(prepareSeconds, 2)) + " seconds, "
+          + "loading the snapshot takes " + str(round(loadSeconds, 2)) + " seconds.")
+
+
+if __name__ == '__main__':
+    buildSnapshot()
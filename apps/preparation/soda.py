@@ -0,0 +1,169 @@
+## SODA RETRIEVAL CODE ---------------------------------------------------------
+
+# This file contains the retrieval of datasets from Socrata Open Data API (SODA) endpoints, such as data.cdc.gov.
+# Only the needed columns of the latest date are requested, instead of a fixed number of rows of all dates.
+# The rows are requested in pages, in parallel, and the number of retrieved rows is checked
+# against the number of rows on the server, so a truncated result is never used.
+# The combined result is stored in the on-disk source cache, see sourcecache.py.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import io
+import os
+import urllib.parse
+import urllib.request
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from apps.preparation import sourcecache
+
+## SODA SETTINGS ---------------------------------------------------------------
+
+# Number of rows per requested page
+PAGE_SIZE = 1000
+
+# Number of pages that are requested at the same time
+PARALLEL_PAGES = 4
+
+## QUERY SODA ENDPOINT ---------------------------------------------------------
+
+# Build the url of a SODA query
+def queryUrl(resource, **parameters):
+    """ Builds the url of a query on a SODA resource.
+
+        Parameters:
+        resource (string): url of the SODA resource, such as https://data.cdc.gov/resource/8xkx-amqh.csv
+        parameters (strings): SoQL parameters without $, such as select="date,fips" or limit=1000
+
+        Returns:
+        url (string): url of the query
+    """
+    query = urllib.parse.urlencode({"$" + name: value for name, value in parameters.items()},
+                                   quote_via=urllib.parse.quote)
+    return resource + "?" + query
+
+# Run a SODA query
+def runQuery(url):
+    """ Runs a query on a SODA resource.
+        All values are kept as text, so they are stored exactly as the server returned them.
+
+        Parameter:
+        url (string): url of the query, see queryUrl
+
+        Returns:
+        data (dataframe): result of the query
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": "VaxoScopeDashboard"})
+    with urllib.request.urlopen(request, timeout=sourcecache.TIMEOUT) as response:
+        payload = response.read()
+    return pd.read_csv(io.BytesIO(payload), dtype=str, keep_default_na=False)
+
+# Determine latest value of a column on the server
+def latestValue(resource, column):
+    """ Determines the latest (highest) value of a column of a SODA resource, such as the latest date.
+
+        Parameters:
+        resource (string): url of the SODA resource
+        column (string): name of the column
+
+        Returns:
+        latest (string): latest value of the column
+    """
+    result = runQuery(queryUrl(resource, select="max(" + column + ") AS latest"))
+    return result["latest"][0]
+
+# Count rows on the server
+def countRows(resource, where):
+    """ Counts the rows of a SODA resource that match a condition.
+
+        Parameters:
+        resource (string): url of the SODA resource
+        where (string): SoQL condition, such as date='2021-11-04T00:00:00.000'
+
+        Returns:
+        count (int): number of matching rows
+    """
+    result = runQuery(queryUrl(resource, select="count(*) AS count", where=where))
+    return int(result["count"][0])
+
+# Retrieve matching rows page by page
+def retrievePages(resource, columns, where, order, count, pageSize=None, parallel=None):
+    """ Retrieves the matching rows of a SODA resource in pages, with multiple pages at the same time.
+        Raises a ValueError if the retrieved rows do not match the number of rows on the server,
+        for example because the server returned fewer rows than requested.
+
+        Parameters:
+        resource (string): url of the SODA resource
+        columns (list): names of the columns to retrieve
+        where (string): SoQL condition that the rows should match
+        order (string): column that gives the rows a stable order, needed to page through them
+        count (int): number of matching rows on the server, see countRows
+        pageSize (int): number of rows per page, PAGE_SIZE if not given
+        parallel (int): number of pages requested at the same time, PARALLEL_PAGES if not given
+
+        Returns:
+        data (dataframe): all matching rows
+    """
+    if pageSize is None:
+        pageSize = PAGE_SIZE
+    if parallel is None:
+        parallel = PARALLEL_PAGES
+
+    offsets = list(range(0, count, pageSize))
+    urls = [queryUrl(resource, select=",".join(columns), where=where, order=order, limit=pageSize, offset=offset)
+            for offset in offsets]
+    with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(urls)))) as executor:
+        pages = list(executor.map(runQuery, urls))
+
+    # Every page should be full, except for the last page
+    for offset, page in zip(offsets, pages):
+        expected = min(pageSize, count - offset)
+        if len(page) != expected:
+            raise ValueError("Truncated result from " + resource + ": page at offset " + str(offset)
+                             + " has " + str(len(page)) + " rows instead of " + str(expected) + ".")
+
+    data = pd.concat(pages, ignore_index=True)
+    if len(data) != count or len(data.drop_duplicates()) != count:
+        raise ValueError("Incomplete result from " + resource + ": retrieved " + str(len(data))
+                         + " rows instead of " + str(count) + ".")
+    return data[columns]
+
+## FETCH LATEST DATA -----------------------------------------------------------
+
+# Retrieve the latest rows of a SODA resource through the source cache
+def fetchLatest(resource, query, pageSize=None):
+    """ Retrieves the needed columns of the latest rows of a SODA resource, and stores them in the source cache.
+        Falls back to the cached copy if the resource cannot be reached or the result is incomplete.
+
+        Parameters:
+        resource (string): url of the SODA resource
+        query (dict): columns to retrieve ("columns"), column that determines the latest rows ("latest")
+                      and column that gives the rows a stable order ("order")
+        pageSize (int): number of rows per page, PAGE_SIZE if not given
+
+        Returns:
+        payloadPath (string): path of the (cached) csv file with the latest rows
+        modified (boolean): true if the latest rows changed compared to the cached copy, false if not
+    """
+    os.makedirs(sourcecache.CACHE_FOLDER, exist_ok=True)
+    cacheKey = queryUrl(resource, select=",".join(query["columns"]))
+    payloadPath, metaPath = sourcecache.cachePaths(cacheKey)
+
+    try:
+        latest = latestValue(resource, query["latest"])
+        where = query["latest"] + "='" + latest + "'"
+        count = countRows(resource, where)
+        if count == 0:
+            raise ValueError("No rows in " + resource + " where " + where + ".")
+        data = retrievePages(resource, query["columns"], where, query["order"], count, pageSize)
+
+        # Write to a temporary file first, so a failed retrieval never damages the cached copy
+        temporaryPath = sourcecache.temporaryFile(payloadPath)
+        data.to_csv(temporaryPath, index=False)
+        return sourcecache.storeSource(cacheKey, temporaryPath)
+
+    # If resource cannot be reached or result is incomplete: use cached copy
+    except Exception as error:
+        meta = sourcecache.readMeta(cacheKey)
+        if not meta:
+            raise
+        print("Note: could not retrieve latest rows of " + resource + " (" + str(error) + "), used cached copy instead.")
+        return sourcecache.cachedFile(meta), False
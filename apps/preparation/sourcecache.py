@@ -0,0 +1,230 @@
+## SOURCE CACHE CODE -----------------------------------------------------------
+
+# This file contains the on-disk cache of the online data sources.
+# For every url the cache stores the downloaded file and its validators (ETag, Last-Modified).
+# Conditional requests are used, so unchanged sources are not downloaded again.
+# If an online source cannot be reached, then the cached copy is used instead.
+# Every version of a source is stored under its own name and its details name the current version,
+# so replacing the details switches the cached file and its validators at the same time.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import glob
+import json
+import shutil
+import tempfile
+import hashlib
+import datetime
+import urllib.request
+import urllib.error
+
+## CACHE SETTINGS --------------------------------------------------------------
+
+# Folder in which the cached sources are stored
+CACHE_FOLDER = "data/cache/sources"
+
+# Maximum number of seconds to wait for an online source
+TIMEOUT = 120
+
+## FETCH SOURCES ---------------------------------------------------------------
+
+# Determine where a source is stored in the cache
+def cachePaths(url):
+    """ Determines the cache files of an online source.
+
+        Parameter:
+        url (string): url of the online source
+
+        Returns:
+        payloadPath (string): path of the current version of the cached file, see readMeta
+        metaPath (string): path of the validators and details of the cached file
+    """
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    metaPath = os.path.join(CACHE_FOLDER, key + ".json")
+    meta = loadMeta(metaPath)
+    payloadPath = os.path.join(CACHE_FOLDER, meta.get("payload", key + ".data"))
+    return payloadPath, metaPath
+
+# Create a temporary file next to a file
+def temporaryFile(path):
+    """ Creates an empty temporary file with a unique name in the folder of a file.
+        A new version of the file is written to it and then moved over the file with os.replace,
+        so writers of the same file at the same time (such as a refresh and a first use) never share a temporary file.
+
+        Parameter:
+        path (string): path of the file that will be replaced
+
+        Returns:
+        temporaryPath (string): path of the temporary file
+    """
+    handle, temporaryPath = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".part")
+    os.close(handle)
+    return temporaryPath
+
+# Calculate fingerprint of a cached file
+def fileHash(path):
+    """ Calculates the SHA-256 hash of a file.
+
+        Parameter:
+        path (string): path of the file
+
+        Returns:
+        hash (string): hexadecimal SHA-256 hash of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Load the details file of a cached source
+def loadMeta(metaPath):
+    """ Loads a details file of the cache as it is at this moment.
+
+        Parameter:
+        metaPath (string): path of the details file
+
+        Returns:
+        meta (dict): validators and details, empty if there is no (readable) details file
+    """
+    try:
+        with open(metaPath) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+# Load validators and details of a cached source
+def readMeta(url):
+    """ Loads the validators and details of the cached copy of an online source.
+        The details name the cached file they belong to ("payload"), see cachedFile.
+
+        Parameter:
+        url (string): url of the online source
+
+        Returns:
+        meta (dict): validators and details of the cached copy, empty if there is no cached copy
+    """
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    meta = loadMeta(os.path.join(CACHE_FOLDER, key + ".json"))
+    if meta:
+        # Details from before versions were stored under their own name
+        meta.setdefault("payload", key + ".data")
+        if not os.path.exists(cachedFile(meta)):
+            return {}
+    return meta
+
+# Path of the cached file that details belong to
+def cachedFile(meta):
+    """ Returns the path of the version of a cached source that its details belong to.
+
+        Parameter:
+        meta (dict): validators and details of the cached copy, see readMeta
+
+        Returns:
+        payloadPath (string): path of the cached file
+    """
+    return os.path.join(CACHE_FOLDER, meta["payload"])
+
+# Store a new version of a source in the cache
+def storeSource(url, temporaryPath, etag=None, lastModified=None):
+    """ Replaces the cached copy of an online source by a newly downloaded file.
+        The file is stored under a name with its hash, and only then the details are replaced to name it,
+        so readers always find a cached file together with its own validators.
+        The previous version is kept for readers that loaded the details just before, older versions are removed.
+
+        Parameters:
+        url (string): url of the online source
+        temporaryPath (string): path of the newly downloaded file, moved into the cache
+        etag (string): ETag validator of the new version, if any
+        lastModified (string): Last-Modified validator of the new version, if any
+
+        Returns:
+        payloadPath (string): path of the cached file
+        modified (boolean): true if the file changed compared to the previous cached copy, false if not
+    """
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    metaPath = os.path.join(CACHE_FOLDER, key + ".json")
+    previous = readMeta(url)
+    payloadHash = fileHash(temporaryPath)
+    payloadName = key + "." + payloadHash[:16] + ".data"
+    os.replace(temporaryPath, os.path.join(CACHE_FOLDER, payloadName))
+
+    # Sources without validators are compared on their content instead
+    modified = payloadHash != previous.get("hash")
+    meta = {"url": url,
+            "payload": payloadName,
+            "etag": etag,
+            "last_modified": lastModified,
+            "hash": payloadHash,
+            "retrieved": datetime.datetime.now().isoformat()}
+    temporaryMetaPath = temporaryFile(metaPath)
+    with open(temporaryMetaPath, "w") as file:
+        json.dump(meta, file, indent=2)
+    os.replace(temporaryMetaPath, metaPath)
+
+    # Remove the versions before the previous one
+    for path in glob.glob(os.path.join(CACHE_FOLDER, key + ".*data")):
+        if os.path.basename(path) not in (payloadName, previous.get("payload")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return cachedFile(meta), modified
+
+# Download an online source if it changed since it was cached
+def fetchSource(url):
+    """ Retrieves an online source through the on-disk cache.
+        Sends a conditional request with the validators of the cached copy,
+        so the source is only downloaded again if it was modified.
+        Falls back to the cached copy if the online source cannot be reached.
+
+        Parameter:
+        url (string): url of the online source
+
+        Returns:
+        payloadPath (string): path of the (cached) file of the online source
+        modified (boolean): true if the file changed compared to the cached copy, false if not
+    """
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    payloadPath, metaPath = cachePaths(url)
+
+    # Load validators of cached copy, if there is one
+    meta = readMeta(url)
+    if meta:
+        payloadPath = cachedFile(meta)
+
+    # Send conditional request
+    request = urllib.request.Request(url, headers={"User-Agent": "VaxoScopeDashboard"})
+    if meta.get("etag"):
+        request.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        request.add_header("If-Modified-Since", meta["last_modified"])
+
+    try:
+        # Stream the new version to a temporary file, so a failed download never damages the cached copy
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            temporaryPath = temporaryFile(payloadPath)
+            try:
+                with open(temporaryPath, "wb") as file:
+                    shutil.copyfileobj(response, file)
+            except Exception:
+                os.remove(temporaryPath)
+                raise
+            headers = response.headers
+        return storeSource(url, temporaryPath, headers.get("ETag"), headers.get("Last-Modified"))
+
+    # Online source was not modified: use cached copy
+    except urllib.error.HTTPError as error:
+        if error.code == 304 and meta:
+            return payloadPath, False
+        if not meta:
+            raise
+        print("Note: could not reach " + url + " (HTTP " + str(error.code) + "), used cached copy instead.")
+        return payloadPath, False
+
+    # If online source cannot be reached: use cached copy
+    except Exception:
+        if not meta:
+            raise
+        print("Note: could not reach " + url + ", used cached copy instead.")
+        return payloadPath, False
@@ -0,0 +1,341 @@
+## TOPOLOGY ENCODING CODE ------------------------------------------------------
+
+# This file contains the encoding of the country geographies as quantized topology (TopoJSON).
+# Neighbouring shapes share their borders: GeoJSON stores every shared border twice, with full-precision coordinates.
+# A topology stores every border once, as an arc that the shapes refer to (reversed if needed),
+# and stores its coordinates as small integer steps on a grid instead of floating-point numbers.
+# The grid is chosen per level of detail, so the rounding stays well below the simplification of the shapes.
+# The arcs are found on the unsimplified shapes and simplified before they are rounded to the grid.
+# The same arcs are used to simplify the geographies: every arc is simplified once (Douglas-Peucker),
+# so neighbouring shapes keep sharing exactly the same border at every level of detail, without gaps or slivers.
+# The browser decodes the topology back to GeoJSON before drawing the map, see assets/topology_script.js.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import math
+from shapely.geometry import Polygon, MultiPolygon
+
+## TOPOLOGY SETTINGS -----------------------------------------------------------
+
+# Grid (in degrees, about a centimetre) on which the borders of the source shapes are matched to find the shared arcs
+SNAP_STEP = 2.0 ** -24
+
+# Grid (in degrees, about a metre) of the topology of the unsimplified shapes
+FINEST_STEP = 2.0 ** -16
+
+## BUILD ARCS ------------------------------------------------------------------
+
+# Quantize the rings of a shape
+def quantizeRings(shape, translate, step):
+    """ Rounds the coordinates of every ring of a (multi)polygon to the grid of the topology.
+
+        Parameters:
+        shape (polygon or multipolygon): shape in longitude and latitude
+        translate (tuple): longitude and latitude of the origin of the grid
+        step (float): distance between grid lines in degrees
+
+        Returns:
+        polygons (list): rings of every polygon, every ring as list of grid points without repeated points
+    """
+    polygons = []
+    parts = shape.geoms if isinstance(shape, MultiPolygon) else [shape] if isinstance(shape, Polygon) else []
+    for polygon in parts:
+        rings = []
+        for ring in [polygon.exterior] + list(polygon.interiors):
+            points = []
+            for x, y in ring.coords:
+                point = (round((x - translate[0]) / step), round((y - translate[1]) / step))
+                if not points or points[-1] != point:
+                    points.append(point)
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+            if len(points) >= 3:
+                rings.append(points)
+        if rings:
+            polygons.append(rings)
+    return polygons
+
+# Find the points where borders meet
+def findJunctions(rings):
+    """ Finds the points at which an arc starts or ends: points that have different neighbours in different rings,
+        such as the points where the borders of three shapes meet.
+
+        Parameter:
+        rings (list): every ring of every shape, as list of grid points
+
+        Returns:
+        junctions (set): grid points at which arcs are cut
+    """
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        for number, point in enumerate(ring):
+            previous, following = ring[number - 1], ring[(number + 1) % len(ring)]
+            pair = (previous, following) if previous < following else (following, previous)
+            if neighbours.setdefault(point, pair) != pair:
+                junctions.add(point)
+    return junctions
+
+# Cut a ring into arcs
+def cutRing(ring, junctions):
+    """ Cuts a ring into arcs at its junctions. A ring without junctions becomes one closed arc,
+        which starts at its smallest point so the same ring (also reversed) always gives the same arc.
+
+        Parameters:
+        ring (list): grid points of the ring
+        junctions (set): grid points at which arcs are cut
+
+        Returns:
+        arcs (list): arcs of the ring in order, every arc as list of grid points
+    """
+    cuts = [number for number, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        start = ring.index(min(ring))
+        return [ring[start:] + ring[:start] + [ring[start]]]
+    ring = ring[cuts[0]:] + ring[:cuts[0]] + [ring[cuts[0]]]
+    arcs, start = [], 0
+    for number in range(1, len(ring)):
+        if ring[number] in junctions:
+            arcs.append(ring[start:number + 1])
+            start = number
+    return arcs
+
+# Build the arcs of shapes
+def buildArcs(quantized):
+    """ Cuts the rings of shapes into arcs and stores every arc once, so shapes that share a border refer to the same arc.
+
+        Parameter:
+        quantized (list): rings of every polygon of every shape as grid points, see quantizeRings
+
+        Returns:
+        arcs (list): every arc once, as list of grid points
+        shapeArcs (list): of every shape, the arcs of every ring of every polygon,
+                          an arc that runs the other way is referred to with its ones' complement (~index)
+    """
+    junctions = findJunctions([ring for polygons in quantized for rings in polygons for ring in rings])
+    arcs, arcIndex = [], {}
+    def arcNumber(arc):
+        key = tuple(arc)
+        if key in arcIndex:
+            return arcIndex[key]
+        if key[::-1] in arcIndex:
+            return ~arcIndex[key[::-1]]
+        arcIndex[key] = len(arcs)
+        arcs.append(arc)
+        return arcIndex[key]
+
+    shapeArcs = [[[[arcNumber(arc) for arc in cutRing(ring, junctions)] for ring in rings] for rings in polygons]
+                 for polygons in quantized]
+    return arcs, shapeArcs
+
+# Join the arcs of a ring
+def joinArcs(arcs, numbers):
+    """ Joins arcs into a ring, arcs with a negative number (~index) run the other way.
+
+        Parameters:
+        arcs (list): every arc once, as list of points
+        numbers (list): arcs of the ring in order
+
+        Returns:
+        ring (list): points of the closed ring
+    """
+    points = []
+    for number in numbers:
+        arc = arcs[number] if number >= 0 else arcs[~number][::-1]
+        points.extend(arc if not points else arc[1:])
+    return points
+
+## SIMPLIFY ARCS ---------------------------------------------------------------
+
+# Simplify an arc
+def simplifyArc(arc, tolerance):
+    """ Simplifies an arc with the Douglas-Peucker algorithm. The first and last point are always kept,
+        so the arc still meets the arcs of the same junctions.
+
+        Parameters:
+        arc (list): grid points of the arc
+        tolerance (float): largest distance (in grid steps) between the arc and its simplification
+
+        Returns:
+        arc (list): kept grid points of the arc
+    """
+    if len(arc) <= 2 or tolerance <= 0:
+        return arc
+    keep = [False] * len(arc)
+    keep[0] = keep[-1] = True
+    segments = [(0, len(arc) - 1)]
+    while segments:
+        first, last = segments.pop()
+        (firstX, firstY), (lastX, lastY) = arc[first], arc[last]
+        deltaX, deltaY = lastX - firstX, lastY - firstY
+        length = math.hypot(deltaX, deltaY)
+
+        # Point farthest from the line between the first and last point (from the first point of a closed arc)
+        farthest, distance = None, tolerance
+        for number in range(first + 1, last):
+            x, y = arc[number]
+            if length:
+                pointDistance = abs(deltaY * (x - firstX) - deltaX * (y - firstY)) / length
+            else:
+                pointDistance = math.hypot(x - firstX, y - firstY)
+            if pointDistance > distance:
+                farthest, distance = number, pointDistance
+        if farthest is not None:
+            keep[farthest] = True
+            segments.extend([(first, farthest), (farthest, last)])
+    return [point for point, kept in zip(arc, keep) if kept]
+
+# Simplify the arcs of shapes
+def simplifyArcs(arcs, shapeArcs, tolerance):
+    """ Simplifies every arc once, see simplifyArc, so shapes that share an arc share its simplification as well.
+        The arcs of a ring that would collapse (fewer than three points) are kept as they are.
+
+        Parameters:
+        arcs (list): every arc once, see buildArcs
+        shapeArcs (list): arcs of every ring of every polygon of every shape, see buildArcs
+        tolerance (float): largest distance (in grid steps) between an arc and its simplification
+
+        Returns:
+        arcs (list): simplified arcs, in the same order
+    """
+    simplified = [simplifyArc(arc, tolerance) for arc in arcs]
+    for polygons in shapeArcs:
+        for rings in polygons:
+            for numbers in rings:
+                indexes = [number if number >= 0 else ~number for number in numbers]
+                if sum(len(simplified[index]) - 1 for index in indexes) < 3:
+                    for index in indexes:
+                        simplified[index] = arcs[index]
+    return simplified
+
+# Simplify shapes along their shared borders
+def simplifyShapes(shapes, tolerance):
+    """ Simplifies shapes so that neighbouring shapes keep sharing the same border (topology-aware simplification):
+        the borders are cut into arcs, and every arc is simplified once, see simplifyArcs.
+        A shape that becomes invalid is repaired.
+
+        Parameters:
+        shapes (geoseries): shapes in longitude and latitude
+        tolerance (float): tolerance (in degrees) with which the shapes are simplified
+
+        Returns:
+        shapes (list): simplified (multi)polygons in the same order, None for shapes without area
+    """
+    minX, minY = shapes.total_bounds[:2]
+    translate = (float(minX), float(minY))
+    quantized = [quantizeRings(shape, translate, SNAP_STEP) if shape is not None else [] for shape in shapes]
+    arcs, shapeArcs = buildArcs(quantized)
+    arcs = simplifyArcs(arcs, shapeArcs, tolerance / SNAP_STEP)
+    arcs = [[(x * SNAP_STEP + translate[0], y * SNAP_STEP + translate[1]) for x, y in arc] for arc in arcs]
+
+    simplified = []
+    for polygons in shapeArcs:
+        parts = []
+        for rings in polygons:
+            coordinates = [joinArcs(arcs, numbers) for numbers in rings]
+            parts.append(Polygon(coordinates[0], coordinates[1:]))
+        shape = MultiPolygon(parts) if len(parts) > 1 else parts[0] if parts else None
+        if shape is not None and not shape.is_valid:
+            shape = shape.buffer(0)
+        simplified.append(shape)
+    return simplified
+
+## ENCODE TOPOLOGY -------------------------------------------------------------
+
+# Encode shapes as topology
+def encodeTopology(shapes, step, tolerance=0):
+    """ Encodes shapes as quantized topology (TopoJSON) in which every shared border is stored once.
+        The arcs are found on the unsimplified shapes (where neighbouring shapes share the same points),
+        then every arc is simplified (see simplifyArcs) and only then rounded to the grid of the topology.
+
+        Parameters:
+        shapes (geoseries): unsimplified shapes in longitude and latitude, indexed on the id of every shape
+        step (float): distance between grid lines in degrees, coordinates are rounded to this grid
+        tolerance (float): tolerance (in degrees) with which the arcs are simplified, 0 to keep every point
+
+        Returns:
+        topology (dict): TopoJSON topology with the shapes as geometry collection "shapes"
+    """
+    minX, minY = shapes.total_bounds[:2]
+    translate = (float(minX), float(minY))
+    quantized = [quantizeRings(shape, translate, SNAP_STEP) if shape is not None else [] for shape in shapes]
+    arcs, shapeArcs = buildArcs(quantized)
+    arcs = simplifyArcs(arcs, shapeArcs, tolerance / SNAP_STEP)
+
+    # Round the simplified arcs to the grid of the topology, without repeated points
+    gridArcs = []
+    for arc in arcs:
+        gridArc = []
+        for x, y in arc:
+            point = (round(x * SNAP_STEP / step), round(y * SNAP_STEP / step))
+            if not gridArc or gridArc[-1] != point:
+                gridArc.append(point)
+        gridArcs.append(gridArc)
+
+    geometries = []
+    for key, polygonArcs in zip(shapes.index, shapeArcs):
+        if not polygonArcs:
+            geometries.append({"type": None, "id": key})
+        elif len(polygonArcs) == 1:
+            geometries.append({"type": "Polygon", "id": key, "arcs": polygonArcs[0]})
+        else:
+            geometries.append({"type": "MultiPolygon", "id": key, "arcs": polygonArcs})
+
+    # Store every arc as its first point followed by the steps to the next points (delta encoding)
+    encodedArcs = [[list(arc[0])] + [[x - previousX, y - previousY] for (previousX, previousY), (x, y) in zip(arc, arc[1:])]
+                   for arc in gridArcs]
+    return {"type": "Topology",
+            "transform": {"scale": [step, step], "translate": list(translate)},
+            "objects": {"shapes": {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": encodedArcs}
+
+# Grid of a level of detail
+def quantizationStep(tolerance):
+    """ Chooses the grid of a topology for a level of detail: a quarter of its tolerance, rounded down to a power of two,
+        so rounding to the grid stays invisible next to the simplification.
+
+        Parameter:
+        tolerance (float): tolerance of the level of detail in degrees
+
+        Returns:
+        step (float): distance between grid lines in degrees, FINEST_STEP for the unsimplified shapes (tolerance 0)
+    """
+    if tolerance <= 0:
+        return FINEST_STEP
+    return 2.0 ** math.floor(math.log2(tolerance / 4))
+
+## DECODE TOPOLOGY -------------------------------------------------------------
+
+# Decode a topology to GeoJSON
+def decodeTopology(topology):
+    """ Decodes a topology made by encodeTopology back to a GeoJSON feature collection.
+        Does the same as the decoding in the browser (see assets/topology_script.js), to check and measure it.
+
+        Parameter:
+        topology (dict): TopoJSON topology with the shapes as geometry collection "shapes"
+
+        Returns:
+        features (dict): GeoJSON feature collection
+    """
+    (scaleX, scaleY), (translateX, translateY) = topology["transform"]["scale"], topology["transform"]["translate"]
+    arcs = []
+    for arc in topology["arcs"]:
+        x = y = 0
+        points = []
+        for deltaX, deltaY in arc:
+            x, y = x + deltaX, y + deltaY
+            points.append([x * scaleX + translateX, y * scaleY + translateY])
+        arcs.append(points)
+
+    def ring(numbers):
+        return joinArcs(arcs, numbers)
+
+    features = []
+    for geometry in topology["objects"]["shapes"]["geometries"]:
+        if geometry["type"] == "Polygon":
+            shape = {"type": "Polygon", "coordinates": [ring(numbers) for numbers in geometry["arcs"]]}
+        elif geometry["type"] == "MultiPolygon":
+            shape = {"type": "MultiPolygon", "coordinates": [[ring(numbers) for numbers in rings] for rings in geometry["arcs"]]}
+        else:
+            shape = None
+        features.append({"type": "Feature", "id": geometry["id"], "properties": {}, "geometry": shape})
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,214 @@
+## UKHSA RETRIEVAL CODE --------------------------------------------------------
+
+# This file contains the retrieval of the latest rows from the UK coronavirus dashboard API (UKHSA).
+# The full csv downloads of this API contain every date, while the dashboard only shows the latest date.
+# Instead, the API is asked for the latest record of every area only (latestBy), which is a fraction of the size.
+# The API only returns the records of the latest date of the whole source, so an area whose latest record is older
+# would be missing: such an area keeps its last record of the previous retrieval, until it lags too far behind.
+# Only if that query fails, does not have the expected structure, or there is no previous retrieval
+# (or an area lags behind for a while), the full csv file is downloaded,
+# and its latest record of every area is stored as the previous retrieval of the next query.
+# The result is stored in the on-disk source cache, see sourcecache.py.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import json
+import urllib.parse
+import urllib.request
+import pandas as pd
+from apps.preparation import sourcecache
+
+## UKHSA SETTINGS --------------------------------------------------------------
+
+# Endpoint that supports latest-only queries
+LATEST_ENDPOINT = "https://api.coronavirus.data.gov.uk/v1/data"
+
+# Maximum number of result pages of a single query
+MAX_PAGES = 20
+
+# Number of days an area may lag behind the latest date of the source before it is left out (such as a retired area)
+STALE_DAYS = 14
+
+# Number of days an area may lag behind before its latest record is looked up again in the full download
+REFRESH_DAYS = 7
+
+## QUERY UKHSA API -------------------------------------------------------------
+
+# Build the url of a latest-only query
+def latestUrl(query, endpoint=None):
+    """ Builds the url of a query for the latest record of every area.
+
+        Parameters:
+        query (dict): filters of the areas ("filters"), returned fields ("structure")
+                      and metric that determines the latest record ("latestBy")
+        endpoint (string): url of the API endpoint, LATEST_ENDPOINT if not given
+
+        Returns:
+        url (string): url of the query
+    """
+    if endpoint is None:
+        endpoint = LATEST_ENDPOINT
+    parameters = {"filters": query["filters"],
+                  "structure": json.dumps(query["structure"], separators=(",", ":")),
+                  "latestBy": query["latestBy"]}
+    return endpoint + "?" + urllib.parse.urlencode(parameters, quote_via=urllib.parse.quote)
+
+# Run a latest-only query
+def runLatestQuery(url):
+    """ Runs a query on the API and follows its result pages.
+
+        Parameter:
+        url (string): url of the query, see latestUrl
+
+        Returns:
+        records (list): returned records
+    """
+    records = []
+    for page in range(MAX_PAGES):
+        request = urllib.request.Request(url, headers={"User-Agent": "VaxoScopeDashboard", "Accept": "application/json"})
+        with urllib.request.urlopen(request, timeout=sourcecache.TIMEOUT) as response:
+            # No content: there are no records for the query
+            if response.status == 204:
+                return records
+            result = json.load(response)
+        records.extend(result["data"])
+
+        # Follow the next page of the result, if any
+        nextPage = (result.get("pagination") or {}).get("next")
+        if not nextPage:
+            return records
+        url = urllib.parse.urljoin(url, nextPage)
+    raise ValueError("Result of " + url + " has more than " + str(MAX_PAGES) + " pages.")
+
+# Turn returned records into a table
+def recordsToData(records, query):
+    """ Turns the returned records of a latest-only query into the table of the full csv download.
+        Nested metrics (such as the coverage per age group) become one row per nested record.
+
+        Parameters:
+        records (list): returned records
+        query (dict): latest-only query, with the nested metric ("nested"), if any
+
+        Returns:
+        data (dataframe): table with the same columns as the full csv download
+    """
+    if not records:
+        raise ValueError("Latest-only query returned no records.")
+    if "nested" not in query:
+        return pd.DataFrame.from_records(records)
+    others = [field for field in query["structure"] if field != query["nested"]]
+    return pd.json_normalize(records, record_path=query["nested"], meta=others)
+
+## FILL AREAS ------------------------------------------------------------------
+
+# Load the latest rows of the previous retrieval
+def previousRows(cacheKey, query):
+    """ Loads the cached copy of the latest rows of a source.
+
+        Parameters:
+        cacheKey (string): url of the latest-only query, see latestUrl
+        query (dict): latest-only query, with the columns the result should contain ("columns")
+                      and the column that names the area ("area")
+
+        Returns:
+        data (dataframe): latest row of every area of the previous retrieval, None if there is no cached copy
+    """
+    meta = sourcecache.readMeta(cacheKey)
+    if not meta:
+        return None
+    return pd.read_csv(sourcecache.cachedFile(meta), usecols=query["columns"], dtype={query["area"]: 'object'})[query["columns"]]
+
+# Add the areas that lag behind to the latest rows
+def fillAreas(data, previous, query):
+    """ Adds the areas that are missing from the result of a latest-only query, with their row of the previous retrieval.
+        The API only returns the records of the latest date, so an area whose latest record is older is missing.
+        Areas that lag more than STALE_DAYS behind the latest date are left out.
+
+        Parameters:
+        data (dataframe): result of the latest-only query, see recordsToData
+        previous (dataframe): latest rows of the previous retrieval, see previousRows
+        query (dict): latest-only query, with the columns of the area ("area") and the date ("latest")
+
+        Returns:
+        data (dataframe): latest row of every area that does not lag too far behind
+        refresh (boolean): true if an area lags more than REFRESH_DAYS behind, so the full download should be used
+    """
+    missing = previous[~previous[query["area"]].isin(data[query["area"]].astype(str))]
+    lag = pd.to_datetime(data[query["latest"]]).max() - pd.to_datetime(missing[query["latest"]])
+    missing = missing[lag <= pd.Timedelta(days=STALE_DAYS)]
+    refresh = bool((lag[lag <= pd.Timedelta(days=STALE_DAYS)] > pd.Timedelta(days=REFRESH_DAYS)).any())
+    return pd.concat([data, missing], ignore_index=True), refresh
+
+# Store the latest record of every area of the full download
+def storeLatestPerArea(cacheKey, fullPath, query):
+    """ Stores the latest record of every area of the full csv download as the cached copy of the latest rows,
+        so the next latest-only query can add the areas that lag behind. A copy that cannot be stored is only made again next time.
+
+        Parameters:
+        cacheKey (string): url of the latest-only query, see latestUrl
+        fullPath (string): path of the (cached) full csv download
+        query (dict): latest-only query, with the column that names the area ("area") and the date ("latest")
+    """
+    payloadPath, metaPath = sourcecache.cachePaths(cacheKey)
+    try:
+        data = pd.read_csv(fullPath, usecols=query["columns"], dtype={query["area"]: 'object'})
+        data = data.sort_values([query["area"], query["latest"]]).drop_duplicates(subset=query["area"], keep='last')
+        temporaryPath = sourcecache.temporaryFile(payloadPath)
+        data[query["columns"]].to_csv(temporaryPath, index=False)
+        sourcecache.storeSource(cacheKey, temporaryPath)
+    except Exception as error:
+        print("Note: could not store latest rows of " + fullPath + ": " + str(error))
+
+## FETCH LATEST DATA -----------------------------------------------------------
+
+# Retrieve the latest rows of a UKHSA source through the source cache
+def fetchLatest(url, query):
+    """ Retrieves the latest record of every area of a UKHSA source and stores it in the source cache.
+        Areas that lag behind keep their row of the previous retrieval, see fillAreas.
+        Falls back to the full download (url) if the latest-only query fails, does not return the expected columns,
+        there is no previous retrieval, or an area lags behind for longer than REFRESH_DAYS.
+
+        Parameters:
+        url (string): url of the full csv download of the source
+        query (dict): latest-only query, see latestUrl, with the columns the result should contain ("columns")
+                      and optionally the columns of the area ("area") and the date ("latest") to add the areas that lag behind
+
+        Returns:
+        payloadPath (string): path of the (cached) csv file
+        modified (boolean): true if the file changed compared to the cached copy, false if not
+    """
+    os.makedirs(sourcecache.CACHE_FOLDER, exist_ok=True)
+    cacheKey = latestUrl(query)
+    payloadPath, metaPath = sourcecache.cachePaths(cacheKey)
+
+    try:
+        data = recordsToData(runLatestQuery(cacheKey), query)
+        data = data[query["columns"]]
+        if "area" in query:
+            previous = previousRows(cacheKey, query)
+            if previous is None:
+                raise ValueError("No previous retrieval to add the areas that lag behind from.")
+            data, refresh = fillAreas(data, previous, query)
+            if refresh:
+                raise ValueError("Areas lag more than " + str(REFRESH_DAYS) + " days behind the latest date.")
+
+        # Write to a temporary file first, so a failed retrieval never damages the cached copy
+        temporaryPath = sourcecache.temporaryFile(payloadPath)
+        data.to_csv(temporaryPath, index=False)
+        return sourcecache.storeSource(cacheKey, temporaryPath)
+
+    # If latest-only query fails: download the full source instead
+    except Exception as error:
+        print("Note: could not retrieve latest rows of " + url + " (" + repr(error) + "), downloading full source instead.")
+        try:
+            fullPath, modified = sourcecache.fetchSource(url)
+        # If full source cannot be retrieved either: use cached copy of latest rows
+        except Exception:
+            meta = sourcecache.readMeta(cacheKey)
+            if not meta:
+                raise
+            print("Note: could not reach " + url + ", used cached copy of latest rows instead.")
+            return sourcecache.cachedFile(meta), False
+        if "area" in query:
+            storeLatestPerArea(cacheKey, fullPath, query)
+        return fullPath, modified
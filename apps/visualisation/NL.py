@@ -10,56 +10,30 @@ import pathlib
 from app import app
 import dash_bootstrap_components as dbc
 from apps.preparation import preparation
-from apps.modelling import modelling
+from apps.visualisation import geoassets
+from apps.visualisation import figurecache
+from apps.visualisation import figures
 
 
 
 ## CREATE VISUALISATIONS FOR NL ------------------------------------------------
 
 # Line graph for vaccination coverage in NL
-def createCovFigNL():
+def createCovFigNL(bundle):
     """ Create line graph for vaccination coverage in NL
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccCovNL (dataframe) to be made available by preparation code
+        vaccCovNL (dataframe) to be included in bundle
+        vaccCovPredNL (dataframe) to be included in bundle
 
         Returns:
-        figVacNL (plotly express graph): line graph for vaccination coverage in NL
+        figVacNL (plotly graph): line graph for vaccination coverage in NL
     """
-    # Line graph for historical vaccination coverage in NL
-    figVacNL = px.line( preparation.vaccCovNL,
-                        x="date",
-                        y="coverage_full_dose",
-                        title='<b>Vaccination level in The Netherlands:</b>',
-                        labels = {"coverage_full_dose" : "Vaccination Level (%)",
-                                  "date" : "Date"},
-                        range_y = [0,100],
-                        template = "seaborn")
-
-    # Line graph for predicted vaccination coverage in NL
-    figVacPredNL = px.line(     modelling.vaccCovPredNL,
-                                x="date",
-                                y="predicted",
-                                labels = {"predicted" : "Predicted Vaccination Level (%)"})
-    figVacConfLowNL = px.line(  modelling.vaccCovPredNL,
-                                x="date",
-                                y="lower_confint",
-                                labels = {"lower_confint" : "Lower limit of confidence interval"})
-    figVacConfUpNL = px.line(   modelling.vaccCovPredNL,
-                                x="date",
-                                y="upper_confint",
-                                labels = {"upper_confint" : "Upper limit of confidence interval"})
-
-    figVacNL.update_traces(connectgaps=True)
-    figVacNL.update_traces(line_color='#b67a0c')
-    figVacPredNL.update_traces(line_color="seagreen")
-    figVacConfLowNL.update_traces(line_color="#b8d7c6")
-    figVacConfUpNL.update_traces(line_color="#b8d7c6")
-    figVacNL.add_hline(y=90, line_width=2, line_dash="dash", opacity=0.2, annotation_text="<i>theoretical herd immunity</i>", annotation_position="top right")
-    figVacNL.add_trace(figVacPredNL.data[0])
-    figVacNL.add_trace(figVacConfLowNL.data[0])
-    figVacNL.add_trace(figVacConfUpNL.data[0])
-    return figVacNL
+    # Line graph for historical and predicted vaccination coverage in NL, built in one pass (see figures.py)
+    return figures.createCoverageFigure(bundle.vaccCovNL, bundle.vaccCovPredNL, '<b>Vaccination level in The Netherlands:</b>', "#b67a0c")
 
 
 # Define function to recode category labels
@@ -77,16 +51,19 @@ def custom_legend_name(figure, new_names):
         figure.data[i].name = new_name
 
 # Line graph for attitudes towards vaccination in NL
-def createAttitudeFigNL():
+def createAttitudeFigNL(bundle):
     """ Creates a line graph with vaccination attitudes in NL
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAttitudesNL (dataframe) to be made available by preparation code
+        vaccAttitudesNL (dataframe) to be included in bundle
 
         Returns:
         figAttNL (plotly express graph): line graph with vaccination attitudes in NL
     """
-    figAttNL = px.line( preparation.vaccAttitudesNL,
+    figAttNL = px.line( bundle.vaccAttitudesNL,
                         x="date",
                         y=["unwilling_percentage", "uncertain_percentage", "willing_percentage"],
                         title='<b>Attitudes towards vaccination in The Netherlands:</b>',
@@ -102,16 +79,19 @@ def createAttitudeFigNL():
     return figAttNL
 
 # Bar chart for vaccination coverage per age in NL
-def createAgeBarChartNL():
+def createAgeBarChartNL(bundle):
     """ Creates a bar chart with vaccination coverage per age group in NL
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAgeNL (dataframe) to be made available by preparation code
+        vaccAgeNL (dataframe) to be included in bundle
 
         Returns:
         figAgeNL (plotly express graph): bar chart with vaccination coverage per age group in NL
     """
-    figAgeNL = px.bar(  preparation.vaccAgeNL,
+    figAgeNL = px.bar(  bundle.vaccAgeNL,
                         x='age_group',
                         y='coverage_full_dose',
                         title='<b>Vaccination level per age group The Netherlands:</b>',
@@ -125,18 +105,23 @@ def createAgeBarChartNL():
 
 
 # Choropleth for vaccination coverage per Dutch municipality
-def createLocationMapNL():
+def createLocationMapNL(bundle):
     """ Creates a choropleth of vaccination coverage per Dutch municipality
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccLocMapNL (geodataframe) to be made available by preparation code
+        vaccLocMapNL (geodataframe) to be included in bundle
 
         Returns:
         figMunicNL (plotly express choropleth): map of vaccination coverage per Dutch municipality
     """
-    figMunicNL = px.choropleth( preparation.vaccLocMapNL,
-                                geojson=preparation.vaccLocMapNL.geometry,
-                                locations=preparation.vaccLocMapNL.index,
+    # Shapes are loaded (and decoded) by the browser from a cached asset, at the level of detail that suits the size of the map, see geoassets.mapAsset
+    figMunicNL = px.choropleth( bundle.vaccLocMapNL,
+                                geojson=geoassets.mapAsset("municipalitiesNL"),
+                                featureidkey="id",
+                                locations=bundle.vaccLocMapNL.index,
                                 color="coverage_full_dose",
                                 title="<b>Vaccination level per Dutch municipality:</b>",
                                 labels = {"coverage_full_dose":"Vaccination Level (%), 12+", "statnaam":"Municipality"},
@@ -157,25 +142,34 @@ def createLayoutNL():
         Returns:
         layout (dash layout): layout for NL screen
     """
+    # Use the same bundle of datasets and forecasts for all visualisations, created once per bundle (see figurecache.py)
+    bundle = preparation.getBundle()
+
     layout = dbc.Container([
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='vaccinations_NL', figure=createCovFigNL())
+                dcc.Graph(id='vaccinations_NL', figure=figurecache.cachedFigure("covFigNL", bundle, createCovFigNL))
             ], width = {"size":5, "offset":1}),
             dbc.Col([
-                dcc.Graph(id='attitudes_NL', figure=createAttitudeFigNL())
+                dcc.Graph(id='attitudes_NL', figure=figurecache.cachedFigure("attitudeFigNL", bundle, createAttitudeFigNL))
             ], width = {"size":5})
         ]),
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='ages_NL', figure=createAgeBarChartNL())
+                dcc.Graph(id='ages_NL', figure=figurecache.cachedFigure("ageBarChartNL", bundle, createAgeBarChartNL))
             ], width = {"size":5, "offset":1}),
             dbc.Col([
-                dcc.Graph(id='munic_NL', figure=createLocationMapNL())
+                geoassets.mapGraph('munic_NL', figurecache.cachedFigure("locationMapNL", bundle, createLocationMapNL))
             ], width = {"size":5})
         ]),
 
     ], fluid = True)
     return layout
+
+## UPDATE NL VISUALISATIONS ----------------------------------------------------
+
+
+# Decode the shapes of the choropleth in the browser, see geoassets.mapGraph
+geoassets.registerMap('munic_NL')
@@ -10,57 +10,30 @@ import pathlib
 from app import app
 import dash_bootstrap_components as dbc
 from apps.preparation import preparation
-from apps.modelling import modelling
+from apps.visualisation import geoassets
+from apps.visualisation import figurecache
+from apps.visualisation import figures
 
 
 
 ## CREATE VISUALISATIONS FOR UK ------------------------------------------------
 
 # Line graph for vaccination coverage in UK
-def createCovFigUK():
+def createCovFigUK(bundle):
     """ Create line graph for vaccination coverage in UK
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccCovUK (dataframe) to be made available by preparation code
+        vaccCovUK (dataframe) to be included in bundle
+        vaccCovPredUK (dataframe) to be included in bundle
 
         Returns:
-        figVacUK (plotly express graph): line graph for vaccination coverage in UK
+        figVacUK (plotly graph): line graph for vaccination coverage in UK
     """
-    # Line graph for historical vaccination coverage in UK
-    figVacUK = px.line( preparation.vaccCovUK,
-                        x="date",
-                        y="coverage_full_dose",
-                        title='<b>Vaccination level in the United Kingdom:</b>',
-                        labels = {"coverage_full_dose" : "Vaccination Level (%)",
-                                  "date" : "Date"},
-                        range_y = [0,100],
-                        template = "seaborn")
-
-    # Line graph for predicted vaccination coverage in UK
-    figVacPredUK = px.line(     modelling.vaccCovPredUK,
-                                x="date",
-                                y="predicted",
-                                labels = {"predicted" : "Predicted Vaccination Level (%)"})
-    figVacConfLowUK = px.line(  modelling.vaccCovPredUK,
-                                x="date",
-                                y="lower_confint",
-                                labels = {"lower_confint" : "Lower limit of confidence interval"})
-    figVacConfUpUK = px.line(   modelling.vaccCovPredUK,
-                                x="date",
-                                y="upper_confint",
-                                labels = {"upper_confint" : "Upper limit of confidence interval"})
-
-    # Combine line graphs from above and adjust appearance
-    figVacUK.update_traces(connectgaps=True)
-    figVacUK.update_traces(line_color="crimson")
-    figVacPredUK.update_traces(line_color="seagreen")
-    figVacConfLowUK.update_traces(line_color="#b8d7c6")
-    figVacConfUpUK.update_traces(line_color="#b8d7c6")
-    figVacUK.add_hline(y=90, line_width=2, line_dash="dash", opacity=0.2, annotation_text="<i>theoretical herd immunity</i>", annotation_position="top right")
-    figVacUK.add_trace(figVacPredUK.data[0])
-    figVacUK.add_trace(figVacConfLowUK.data[0])
-    figVacUK.add_trace(figVacConfUpUK.data[0])
-    return figVacUK
+    # Line graph for historical and predicted vaccination coverage in UK, built in one pass (see figures.py)
+    return figures.createCoverageFigure(bundle.vaccCovUK, bundle.vaccCovPredUK, '<b>Vaccination level in the United Kingdom:</b>', "crimson")
 
 # Define function to recode category labels
 def custom_legend_name(figure, new_names):
@@ -77,16 +50,19 @@ def custom_legend_name(figure, new_names):
         figure.data[i].name = new_name
 
 # Line graph for attitudes towards vaccination in UK
-def createAttitudeFigUK():
+def createAttitudeFigUK(bundle):
     """ Creates a line graph with vaccination attitudes in UK
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAttitudesUK (dataframe) to be made available by preparation code
+        vaccAttitudesUK (dataframe) to be included in bundle
 
         Returns:
         figAttUK (plotly express graph): line graph with vaccination attitudes in UK
     """
-    figAttUK = px.line( preparation.vaccAttitudesUK,
+    figAttUK = px.line( bundle.vaccAttitudesUK,
                         x="date",
                         y=["unwilling_percentage", "uncertain_percentage", "willing_percentage"],
                         title='<b>Attitudes towards vaccination in the United Kingdom:</b>',
@@ -102,16 +78,19 @@ def createAttitudeFigUK():
     return figAttUK
 
 # Bar chart for vaccination level per income group in UK
-def createIncomeBarChartUK():
+def createIncomeBarChartUK(bundle):
     """ Creates a bar chart with vaccination coverage per income group in UK
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccIncomeUK (dataframe) to be made available by preparation code
+        vaccIncomeUK (dataframe) to be included in bundle
 
         Returns:
         figIncomeUK (plotly express graph): bar chart with vaccination coverage per income group in UK
     """
-    figIncomeUK = px.bar(   preparation.vaccIncomeUK,
+    figIncomeUK = px.bar(   bundle.vaccIncomeUK,
                             x='income_group',
                             y='coverage_one_dose',
                             title='<b>Vaccination level per deprivation class in the United Kingdom:</b>',
@@ -124,16 +103,19 @@ def createIncomeBarChartUK():
     return figIncomeUK
 
 # Bar chart for vaccination coverage per age in UK
-def createAgeBarChartUK():
+def createAgeBarChartUK(bundle):
     """ Creates a bar chart with vaccination coverage per age group in UK
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAgeUK (dataframe) to be made available by preparation code
+        vaccAgeUK (dataframe) to be included in bundle
 
         Returns:
         figAgeUK (plotly express graph): bar chart with vaccination coverage per age group in UK
     """
-    figAgeUK = px.bar(  preparation.vaccAgeUK,
+    figAgeUK = px.bar(  bundle.vaccAgeUK,
                         x='age_group',
                         y='coverage_full_dose',
                         title='<b>Vaccination level per age group in the United Kingdom:</b>',
@@ -146,18 +128,23 @@ def createAgeBarChartUK():
     return figAgeUK
 
 # Choropleth for vaccination coverage per UK lower tier local authority
-def createLocationMapUK():
+def createLocationMapUK(bundle):
     """ Creates a choropleth of vaccination coverage per UK lower tier local authority
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccLocMapUK (geodataframe) to be made available by preparation code
+        vaccLocMapUK (geodataframe) to be included in bundle
 
         Returns:
         figLtlaUK (plotly express choropleth): map of vaccination coverage per UK lower tier local authority
     """
-    figLtlaUK = px.choropleth( preparation.vaccLocMapUK,
-                                geojson=preparation.vaccLocMapUK.geometry,
-                                locations=preparation.vaccLocMapUK.index,
+    # Shapes are loaded (and decoded) by the browser from a cached asset, at the level of detail that suits the size of the map, see geoassets.mapAsset
+    figLtlaUK = px.choropleth( bundle.vaccLocMapUK,
+                                geojson=geoassets.mapAsset("ltlaUK"),
+                                featureidkey="id",
+                                locations=bundle.vaccLocMapUK.index,
                                 color="coverage_full_dose",
                                 title="<b>Vaccination level per UK Lower Tier Local Authority:</b>",
                                 labels = {"coverage_full_dose":"Vaccination Level (%)", "AREANM":"Lower Tier Local Authority"},
@@ -178,32 +165,41 @@ def createLayoutUK():
         Returns:
         layout (dash layout): layout for UK screen
     """
+    # Use the same bundle of datasets and forecasts for all visualisations, created once per bundle (see figurecache.py)
+    bundle = preparation.getBundle()
+
     layout = dbc.Container([
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='vaccinations_UK', figure=createCovFigUK())
+                dcc.Graph(id='vaccinations_UK', figure=figurecache.cachedFigure("covFigUK", bundle, createCovFigUK))
             ], width = {"size":5, "offset":1}),
             dbc.Col([
-                dcc.Graph(id='attitudes_UK', figure=createAttitudeFigUK())
+                dcc.Graph(id='attitudes_UK', figure=figurecache.cachedFigure("attitudeFigUK", bundle, createAttitudeFigUK))
             ], width = {"size":5})
         ]),
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='age_UK', figure=createAgeBarChartUK())
+                dcc.Graph(id='age_UK', figure=figurecache.cachedFigure("ageBarChartUK", bundle, createAgeBarChartUK))
             ], width = {"size":5, "offset":1}),
             dbc.Col([
-                dcc.Graph(id='region_UK', figure=createLocationMapUK())
+                geoassets.mapGraph('region_UK', figurecache.cachedFigure("locationMapUK", bundle, createLocationMapUK))
             ], width = {"size":5})
         ]),
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='income_UK', figure=createIncomeBarChartUK())
+                dcc.Graph(id='income_UK', figure=figurecache.cachedFigure("incomeBarChartUK", bundle, createIncomeBarChartUK))
             ], width = {"size":5, "offset":1}),
         ]),
 
     ], fluid = True)
 
     return layout
+
+## UPDATE UK VISUALISATIONS ----------------------------------------------------
+
+
+# Decode the shapes of the choropleth in the browser, see geoassets.mapGraph
+geoassets.registerMap('region_UK')
@@ -1,65 +1,43 @@
 from dash import dcc
 from dash import html
 from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
 import plotly.express as px
-import pandas as pd
-import geopandas as gpd
-import numpy as np
-import pyproj
-import pathlib
 from app import app
 import dash_bootstrap_components as dbc
 from apps.preparation import preparation
-from apps.modelling import modelling
+from apps.visualisation import geoassets
+from apps.visualisation import figurecache
+from apps.visualisation import figures
+from apps.visualisation import responses
+from apps.visualisation import tiles
 
 
 
+## US SETTINGS -----------------------------------------------------------------
+
+# Levels of the choropleth of US that users can choose, with their label in the dropdown menu
+LOCATION_LEVELS = {"counties": "US County Level", "states": "US State Level"}
+
+
 ## CREATE VISUALISATIONS FOR US ------------------------------------------------
 
 # Line graph for vaccination coverage in US
-def createCovFigUS():
+def createCovFigUS(bundle):
     """ Create line graph for vaccination coverage in US
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccCovUS (dataframe) to be made available by preparation code
+        vaccCovUS (dataframe) to be included in bundle
+        vaccCovPredUS (dataframe) to be included in bundle
 
         Returns:
-        figVacUSA (plotly express graph): line graph for vaccination coverage in US
+        figVacUSA (plotly graph): line graph for vaccination coverage in US
     """
-    figVacUSA = px.line(preparation.vaccCovUS,
-                        x="date",
-                        y="coverage_full_dose",
-                        title='<b>Vaccination level in the United States:</b>',
-                        labels = {"coverage_full_dose" : "Vaccination Level (%)",
-                                  "date" : "Date"},
-                        range_y = [0,100],
-                        template = "seaborn")
-
-    # Line graph for predicted vaccination coverage in US
-    figVacPredUSA = px.line(     modelling.vaccCovPredUS,
-                                x="date",
-                                y="predicted",
-                                labels = {"predicted" : "Predicted Vaccination Level (%)"})
-    figVacConfLowUSA = px.line(  modelling.vaccCovPredUS,
-                                x="date",
-                                y="lower_confint",
-                                labels = {"lower_confint" : "Lower limit of confidence interval"})
-    figVacConfUpUSA = px.line(   modelling.vaccCovPredUS,
-                                x="date",
-                                y="upper_confint",
-                                labels = {"upper_confint" : "Upper limit of confidence interval"})
-
-    # Combine line graphs from above and adjust appearance
-    figVacUSA.update_traces(connectgaps=True)
-    figVacUSA.update_traces(line_color="steelblue")
-    figVacPredUSA.update_traces(line_color="seagreen")
-    figVacConfLowUSA.update_traces(line_color="#b8d7c6")
-    figVacConfUpUSA.update_traces(line_color="#b8d7c6")
-    figVacUSA.add_hline(y=90, line_width=2, line_dash="dash", opacity=0.2, annotation_text="<i>theoretical herd immunity</i>", annotation_position="top right")
-    figVacUSA.add_trace(figVacPredUSA.data[0])
-    figVacUSA.add_trace(figVacConfLowUSA.data[0])
-    figVacUSA.add_trace(figVacConfUpUSA.data[0])
-    return figVacUSA
+    # Line graph for historical and predicted vaccination coverage in US, built in one pass (see figures.py)
+    return figures.createCoverageFigure(bundle.vaccCovUS, bundle.vaccCovPredUS, '<b>Vaccination level in the United States:</b>', "steelblue")
 
 # Define function to recode category labels
 def custom_legend_name(figure, new_names):
@@ -76,16 +54,19 @@ def custom_legend_name(figure, new_names):
         figure.data[i].name = new_name
 
 # Line graph for attitudes towards vaccination in US
-def createAttitudeFigUS():
+def createAttitudeFigUS(bundle):
     """ Creates a line graph with vaccination attitudes in US
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAttitudesUS (dataframe) to be made available by preparation code
+        vaccAttitudesUS (dataframe) to be included in bundle
 
         Returns:
         figAttUSA (plotly express graph): line graph with vaccination attitudes in US
     """
-    figAttUSA = px.line(preparation.vaccAttitudesUS,
+    figAttUSA = px.line(bundle.vaccAttitudesUS,
                         x="date",
                         y=["unwilling_percentage", "uncertain_percentage", "willing_percentage"],
                         title='<b>Attitudes towards vaccination in the United States:</b>',
@@ -101,16 +82,19 @@ def createAttitudeFigUS():
     return figAttUSA
 
 # Bar chart for vaccination coverage per age in US
-def createAgeBarChartUS():
+def createAgeBarChartUS(bundle):
     """ Creates a bar chart with vaccination coverage per age group in US
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccAgeUS (dataframe) to be made available by preparation code
+        vaccAgeUS (dataframe) to be included in bundle
 
         Returns:
         figAgeUSA (plotly express graph): bar chart with vaccination coverage per age group in US
     """
-    figAgeUSA = px.bar( preparation.vaccAgeUS,
+    figAgeUSA = px.bar( bundle.vaccAgeUS,
                         x='age_group',
                         y='coverage_full_dose',
                         title='<b>Vaccination level per age group the United States:</b>',
@@ -123,16 +107,19 @@ def createAgeBarChartUS():
     return figAgeUSA
 
 # Bar chart for vaccination level per income group in US
-def createIncomeBarChartUS():
+def createIncomeBarChartUS(bundle):
     """ Creates a bar chart with vaccination coverage per income group in US
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Requires:
-        vaccIncomeUS (dataframe) to be made available by preparation code
+        vaccIncomeUS (dataframe) to be included in bundle
 
         Returns:
         figIncomeUSA (plotly express graph): bar chart with vaccination coverage per income group in US
     """
-    figIncomeUSA = px.bar(  preparation.vaccIncomeUS,
+    figIncomeUSA = px.bar(  bundle.vaccIncomeUS,
                             x='income_group',
                             y='coverage_full_dose',
                             title='<b>Vaccination level per income group the United States:</b>',
@@ -145,6 +132,64 @@ def createIncomeBarChartUS():
     return figIncomeUSA
 
 
+# Choropleth for vaccination coverage per US county or state
+def createLocationMapUS(bundle, level):
+    """ Creates a choropleth of vaccination coverage per US county or per US state
+
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        level (string): "counties" or "states"
+
+        Requires:
+        vaccLocMapCountyUS (geodataframe) to be included in bundle
+        vaccLocMapStateUS (geodataframe) to be included in bundle
+
+        Returns:
+        figLocationUSA (plotly express choropleth): map of vaccination coverage per US county or state, empty for other levels.
+                                                    County map is tiled if tiles.VECTOR_TILES is set, see tiles.createCountyTileMap
+    """
+    figLocationUSA = {}
+
+    # Shapes are loaded (and decoded) by the browser from a cached asset, at the level of detail that suits the size and projection of the map, see geoassets.mapAsset
+
+    # If user selected counties in tile-based mode, then create and return county level US map that loads its shapes as vector tiles
+    if level == "counties" and tiles.VECTOR_TILES:
+        figLocationUSA = tiles.createCountyTileMap(bundle)
+
+    # If user selected counties, then create and return county level US choropleth
+    elif level == "counties":
+        figLocationUSA = px.choropleth( bundle.vaccLocMapCountyUS,
+                                    geojson=geoassets.mapAsset("countiesUS", scale=1.5),
+                                    featureidkey="id",
+                                    locations=bundle.vaccLocMapCountyUS.index,
+                                    color="coverage_full_dose",
+                                    labels = {"coverage_full_dose":"Vaccination Level (%)", "index":"County code"},
+                                    color_continuous_scale = [[0,"red"], [0.6,"orange"], [1,"steelblue"]],
+                                    template = "seaborn")
+        figLocationUSA.update_geos(fitbounds=False, visible=True)
+        figLocationUSA.update_geos(projection_rotation_lon=-100)
+        figLocationUSA.update_geos(projection_rotation_lat=40)
+        figLocationUSA.update_geos(projection_scale=1.5)
+        figLocationUSA.update_geos(projection_type="orthographic")
+
+    # If user selected states, then create and return state level US choropleth
+    elif level == "states":
+        figLocationUSA = px.choropleth( bundle.vaccLocMapStateUS,
+                                    geojson=geoassets.mapAsset("statesUS", scale=1),
+                                    featureidkey="id",
+                                    locations=bundle.vaccLocMapStateUS.index,
+                                    color="coverage_full_dose",
+                                    labels = {"coverage_full_dose":"Vaccination Level (%)", "name":"State"},
+                                    color_continuous_scale = [[0,"red"], [0.6,"orange"], [1,"steelblue"]],
+                                    template = "seaborn")
+        figLocationUSA.update_geos(fitbounds=False, visible=True)
+        figLocationUSA.update_geos(projection_rotation_lon=-100)
+        figLocationUSA.update_geos(projection_rotation_lat=40)
+        figLocationUSA.update_geos(projection_type="orthographic")
+
+    return figLocationUSA
+
+
 ## DEFINE LAYOUT OF US PAGE ----------------------------------------------------
 
 # Create a grid with the US visualisations as defined above and below
@@ -155,23 +200,26 @@ def createLayoutUS():
         Returns:
         layout (dash layout): layout for US screen
     """
+    # Use the same bundle of datasets and forecasts for all visualisations, created once per bundle (see figurecache.py)
+    bundle = preparation.getBundle()
+
     layout = dbc.Container([
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='vaccinations_USA', figure=createCovFigUS())
+                dcc.Graph(id='vaccinations_USA', figure=figurecache.cachedFigure("covFigUS", bundle, createCovFigUS))
             ], width = {"size":5, "offset":1}),
             dbc.Col([
-                dcc.Graph(id='attitudes_USA', figure=createAttitudeFigUS())
+                dcc.Graph(id='attitudes_USA', figure=figurecache.cachedFigure("attitudeFigUS", bundle, createAttitudeFigUS))
             ], width = {"size":5})
         ]),
 
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id='ages_USA', figure=createAgeBarChartUS())
+                dcc.Graph(id='ages_USA', figure=figurecache.cachedFigure("ageBarChartUS", bundle, createAgeBarChartUS))
             ], width = {"size":5, "offset":1}),
             dbc.Col([
-                dcc.Graph(id='income_USA', figure=createIncomeBarChartUS())
+                dcc.Graph(id='income_USA', figure=figurecache.cachedFigure("incomeBarChartUS", bundle, createIncomeBarChartUS))
             ], width = {"size":5})
         ]),
 
@@ -180,10 +228,9 @@ def createLayoutUS():
                 html.Div([html.P("Vaccination level per US Location:")],
                                 className='custom-graph-title'),
                 dcc.Dropdown(   id='US-location-dropwdown', multi=False,
-                                options = [{"label": "US County Level", "value":"counties"},
-                                          {"label": "US State Level", "value":"states"}],
+                                options = [{"label": label, "value": level} for level, label in LOCATION_LEVELS.items()],
                                 value = "states"),
-                dcc.Graph(id='counties_USA', figure={})
+                geoassets.mapGraph('counties_USA', {})
             ], width = {"size":5, "offset":1}),
         ]),
 
@@ -193,41 +240,17 @@ def createLayoutUS():
 ## UPDATE US VISUALISATIONS ----------------------------------------------------
 
 
-# Return correct user requested choropleth of US
+# Return correct user requested choropleth of US, its shapes are decoded in the browser (see geoassets.mapGraph)
+# The choropleth is serialised once per bundle and level (see responses.py)
 @app.callback(
-    Output('counties_USA', 'figure'),
+    Output(geoassets.figureStore('counties_USA'), 'data'),
     Input('US-location-dropwdown', 'value')
 )
 def update_graph(US_location_dropwdown):
-    figLocationUSA = {}
+    # Other values are not created, so they never take the place of figures in the figure cache
+    if US_location_dropwdown not in LOCATION_LEVELS:
+        raise PreventUpdate
+    return responses.serialisedFigure("locationMapUS", preparation.getBundle(), createLocationMapUS, US_location_dropwdown)
 
-    # If user selected counties, then create and return county level US choropleth
-    if US_location_dropwdown == "counties":
-        figLocationUSA = px.choropleth( preparation.vaccLocMapCountyUS,
-                                    geojson=preparation.vaccLocMapCountyUS.geometry,
-                                    locations=preparation.vaccLocMapCountyUS.index,
-                                    color="coverage_full_dose",
-                                    labels = {"coverage_full_dose":"Vaccination Level (%)", "index":"County code"},
-                                    color_continuous_scale = [[0,"red"], [0.6,"orange"], [1,"steelblue"]],
-                                    template = "seaborn")
-        figLocationUSA.update_geos(fitbounds=False, visible=True)
-        figLocationUSA.update_geos(projection_rotation_lon=-100)
-        figLocationUSA.update_geos(projection_rotation_lat=40)
-        figLocationUSA.update_geos(projection_scale=1.5)
-        figLocationUSA.update_geos(projection_type="orthographic")
-
-    # If user selected states, then create and return state level US choropleth
-    elif US_location_dropwdown == "states":
-        figLocationUSA = px.choropleth( preparation.vaccLocMapStateUS,
-                                    geojson=preparation.vaccLocMapStateUS.geometry,
-                                    locations=preparation.vaccLocMapStateUS.index,
-                                    color="coverage_full_dose",
-                                    labels = {"coverage_full_dose":"Vaccination Level (%)", "name":"State"},
-                                    color_continuous_scale = [[0,"red"], [0.6,"orange"], [1,"steelblue"]],
-                                    template = "seaborn")
-        figLocationUSA.update_geos(fitbounds=False, visible=True)
-        figLocationUSA.update_geos(projection_rotation_lon=-100)
-        figLocationUSA.update_geos(projection_rotation_lat=40)
-        figLocationUSA.update_geos(projection_type="orthographic")
-
-    return figLocationUSA
+# Decode the shapes of the choropleth in the browser
+geoassets.registerMap('counties_USA')
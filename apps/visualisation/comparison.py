@@ -1,6 +1,6 @@
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, ClientsideFunction
 import plotly.express as px
 import pandas as pd
 import geopandas as gpd
@@ -10,22 +10,36 @@ import pathlib
 from app import app
 import dash_bootstrap_components as dbc
 from apps.preparation import preparation
+from apps.visualisation import figurecache
+from apps.visualisation import downsampling
 
 
 
+## COMPARISON SETTINGS ---------------------------------------------------------
+
+# Countries and attitudes that users can select on the comparison page
+COUNTRIES = ['NL', 'UK', 'US']
+ATTITUDES = ['unwilling_percentage', 'uncertain_percentage', 'willing_percentage']
+
 ## DEFINE LAYOUT OF COMPARISON PAGE --------------------------------------------
 
 # Create a grid with the comparison visualisations as defined below
 # Also contains checkboxes to select countries to compare
 # Also contains dropdown menu to choose between vaccination attitude
+# Also contains the figures of all countries, which the browser filters on the selection (see assets/comparison_script.js)
 def createLayoutComparison():
     """ Create updated layout for Comparison screen
 
         Returns:
         layout (dash layout): layout for Comparison screen
     """
+    # Figures of all countries are sent once per page view, created once per bundle (see figurecache.py)
+    bundle = preparation.getBundle()
+
     layout = dbc.Container([
 
+        dcc.Store(id='comparison-figures', data=figurecache.cachedFigure("comparisonFigures", bundle, createComparisonFigures)),
+
         dbc.Row([
 
             dbc.Col([
@@ -70,18 +84,25 @@ def createLayoutComparison():
     return layout
 
 
-## UPDATE COMPARISON VISUALISATIONS --------------------------------------------
+## CREATE VISUALISATIONS FOR COMPARISON ----------------------------------------
 
+# Line graph for vaccination coverage of selected countries
+def createCovFigComp(bundle, selectedCountries):
+    """ Create line graph that compares selected countries in terms of vaccination coverage
+        The line of every country is downsampled to the width of the graph (see downsampling.py)
 
-# Return correct user requested line graph of vaccination coverage comparison
-@app.callback(
-    Output('vaccinations_Comp', 'figure'),
-    Input('selected-countries', 'value')
-)
-def update_graph(selected_countries):
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        selectedCountries (tuple): abbreviations of the selected countries, such as ("NL", "UK")
+
+        Requires:
+        vaccCov (dataframe) to be included in bundle
 
-    # Create and return line graph that compares selected countries in terms of vaccination coverage
-    figVacComp = px.line(   preparation.vaccCov.loc[preparation.vaccCov['country'].isin(selected_countries)],
+        Returns:
+        figVacComp (plotly express graph): line graph for vaccination coverage of selected countries
+    """
+    vaccCov = downsampling.downsampleGroups(bundle.vaccCov.loc[bundle.vaccCov['country'].isin(selectedCountries)], 'country', 'date', 'coverage_full_dose')
+    figVacComp = px.line(   vaccCov,
                             x="date",
                             y="coverage_full_dose",
                             color="country",
@@ -97,19 +118,26 @@ def update_graph(selected_countries):
 
     return figVacComp
 
+# Line graph for vaccination attitude of selected countries
+def createAttitudeFigComp(bundle, selectedCountries, attitude):
+    """ Create line graph that compares selected countries in terms of a vaccination attitude
+        The line of every country is downsampled to the width of the graph (see downsampling.py)
 
-# Return correct user requested line graph of vaccination attitude comparison
-@app.callback(
-    Output('attitudes_Comp', 'figure'),
-    [Input('selected-countries', 'value'),
-     Input('attitude-dropwdown', 'value')]
-)
-def update_graph(selected_countries, attitude_dropdown):
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        selectedCountries (tuple): abbreviations of the selected countries, such as ("NL", "UK")
+        attitude (string): column of the attitude, such as "unwilling_percentage"
 
-    # Create and return line graph that compares selected countries in terms of vaccination attitudes
-    figAttComp = px.line(   preparation.vaccAttitudes.loc[preparation.vaccAttitudes['country'].isin(selected_countries)],
+        Requires:
+        vaccAttitudes (dataframe) to be included in bundle
+
+        Returns:
+        figAttComp (plotly express graph): line graph for vaccination attitude of selected countries
+    """
+    vaccAttitudes = downsampling.downsampleGroups(bundle.vaccAttitudes.loc[bundle.vaccAttitudes['country'].isin(selectedCountries)], 'country', 'date', attitude)
+    figAttComp = px.line(   vaccAttitudes,
                             x="date",
-                            y= attitude_dropdown,
+                            y= attitude,
                             color="country",
                             labels = {"date" : "Date",
                                       "unwilling_percentage" : "Share of Population (%)",
@@ -121,3 +149,63 @@ def update_graph(selected_countries, attitude_dropdown):
     figAttComp.update_traces(connectgaps=True)
 
     return figAttComp
+
+
+# Figures of all countries for the browser to filter
+def createComparisonFigures(bundle):
+    """ Create the comparison figures with all countries: the vaccination coverage and every vaccination attitude.
+        The browser shows the selected countries only, without asking the server for new figures.
+
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
+        Requires:
+        vaccCov (dataframe) to be included in bundle
+        vaccAttitudes (dataframe) to be included in bundle
+
+        Returns:
+        figures (dict): line graph of vaccination coverage ("coverage") and line graph of every attitude ("attitudes")
+    """
+    return {"coverage": createCovFigComp(bundle, tuple(COUNTRIES)),
+            "attitudes": {attitude: createAttitudeFigComp(bundle, tuple(COUNTRIES), attitude) for attitude in ATTITUDES}}
+
+
+## UPDATE COMPARISON VISUALISATIONS --------------------------------------------
+
+# Show the selected countries in the line graph of vaccination coverage comparison, in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace="comparison", function_name="showCoverage"),
+    Output('vaccinations_Comp', 'figure'),
+    [Input('comparison-figures', 'data'),
+     Input('selected-countries', 'value')]
+)
+
+# Show the selected countries and attitude in the line graph of vaccination attitude comparison, in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace="comparison", function_name="showAttitude"),
+    Output('attitudes_Comp', 'figure'),
+    [Input('comparison-figures', 'data'),
+     Input('selected-countries', 'value'),
+     Input('attitude-dropwdown', 'value')]
+)
+
+
+## PRECOMPUTE COMPARISON VISUALISATIONS ----------------------------------------
+
+# Create the figures for a new bundle
+def precomputeFigures(bundle):
+    """ Creates the comparison figures of all countries and adds them to the figure cache,
+        so a view of the comparison page only looks them up.
+        Called with every new bundle before it is published, see preparation.onPublish.
+        Datasets that are prepared on first use are not prepared here (see preparation.LAZY_START),
+        the first view of the comparison page then creates the figures.
+
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+    """
+    if not (bundle.isLoaded("vaccCov") and bundle.isLoaded("vaccAttitudes")):
+        return
+    figurecache.cachedFigure("comparisonFigures", bundle, createComparisonFigures)
+
+# Precompute the figures of the bundle in use and of every refresh
+preparation.onPublish(precomputeFigures)
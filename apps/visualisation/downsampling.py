@@ -0,0 +1,113 @@
+## DOWNSAMPLING CODE -----------------------------------------------------------
+
+# This file contains the downsampling of the daily time series before they are drawn as line graphs.
+# The series grow by one point per day, while a line graph cannot show more points than it is wide.
+# Largest-Triangle-Three-Buckets (LTTB) keeps the first and last point and divides the other points into buckets.
+# From every bucket it keeps the point that forms the largest triangle with the point kept from the previous bucket
+# and the average of the next bucket, so peaks, dips and bends of the line stay visible.
+# The number of points that is kept depends on the width of the graph.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+## DOWNSAMPLING SETTINGS -------------------------------------------------------
+
+# Downsample the line graphs (True) or draw every point (False)
+DOWNSAMPLE = True
+
+# Width in pixels of a line graph on a wide screen
+CHART_WIDTH = 600
+
+# Number of points that is kept per pixel of width
+POINTS_PER_PIXEL = 0.5
+
+## DOWNSAMPLE SERIES -----------------------------------------------------------
+
+# Number of points of a line graph
+def targetPoints(width=None):
+    """ Chooses the number of points of every line of a graph from its width.
+
+        Parameter:
+        width (int): width of the graph in pixels, CHART_WIDTH if not given
+
+        Returns:
+        points (int): number of points to keep of every line
+    """
+    return max(3, int((width or CHART_WIDTH) * POINTS_PER_PIXEL))
+
+# Choose the points of a series with LTTB
+def lttbIndices(x, y, points):
+    """ Chooses the points of a series that Largest-Triangle-Three-Buckets keeps.
+
+        Parameters:
+        x (array): x values of the series in increasing order, as numbers
+        y (array): y values of the series, without missing values
+        points (int): number of points to keep
+
+        Returns:
+        indices (array): positions of the kept points in increasing order
+    """
+    length = len(x)
+    if points >= length or points < 3:
+        return np.arange(length)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Buckets of the points between the first and last point, with the average point of every bucket
+    edges = np.linspace(1, length - 1, points - 1).astype(int)
+    counts = np.diff(edges)
+    averageX = np.add.reduceat(x[:length - 1], edges[:-1]) / counts
+    averageY = np.add.reduceat(y[:length - 1], edges[:-1]) / counts
+    nextX = np.append(averageX[1:], x[-1])
+    nextY = np.append(averageY[1:], y[-1])
+
+    # The kept point depends on the point kept from the previous bucket, the areas within a bucket are computed at once
+    indices = np.empty(points, dtype=int)
+    indices[0], indices[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x[previous] - nextX[bucket]) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (nextY[bucket] - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+# Downsample the rows of a dataset
+def downsample(data, x, y, points=None):
+    """ Keeps the rows of a dataset that are needed to draw the line of a column, rows without value are left out.
+
+        Parameters:
+        data (dataframe): dataset sorted on the x column
+        x (string): column on the x axis, such as "date"
+        y (string): column on the y axis, such as "coverage_full_dose"
+        points (int): number of points to keep, see targetPoints if not given
+
+        Returns:
+        data (dataframe): kept rows of the dataset
+    """
+    data = data.loc[data[y].notna()]
+    if not DOWNSAMPLE:
+        return data
+    values = data[x]
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.values.astype("datetime64[ns]").astype("int64")
+    return data.iloc[lttbIndices(values, data[y].values, points or targetPoints())]
+
+# Downsample the line of every group of a dataset
+def downsampleGroups(data, group, x, y, points=None):
+    """ Keeps the rows of a dataset that are needed to draw the line of a column for every group, such as every country.
+
+        Parameters:
+        data (dataframe): dataset sorted on the x column
+        group (string): column of which every value is a separate line, such as "country"
+        x (string): column on the x axis, such as "date"
+        y (string): column on the y axis, such as "coverage_full_dose"
+        points (int): number of points to keep of every line, see targetPoints if not given
+
+        Returns:
+        data (dataframe): kept rows of the dataset
+    """
+    parts = [downsample(rows, x, y, points) for name, rows in data.groupby(group, sort=False)]
+    return pd.concat(parts) if parts else data
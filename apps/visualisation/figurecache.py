@@ -0,0 +1,108 @@
+## FIGURE CACHE CODE -----------------------------------------------------------
+
+# This file contains the cache of the figures of the dashboard.
+# A figure only changes when a refresh publishes new data, so it is created once per bundle (and per user choice),
+# and every next page view or callback gets the same figure from the cache.
+# The cache is keyed by the name of the figure, the version of the bundle and the choices it was created with.
+# It keeps a limited number of figures: figures of bundles before the bundle in use are removed,
+# and otherwise the least recently used figure is removed. Figures of the bundle in use are kept while a new bundle
+# is prepared (see preparation.onPublish), until the new bundle replaces it.
+# Requests that miss the same figure at the same time wait for one of them to create it.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import threading
+import collections
+from apps.preparation import preparation
+
+## CACHE SETTINGS --------------------------------------------------------------
+
+# Use the figure cache (True) or create every figure again on every request (False)
+CACHE_FIGURES = True
+
+# Largest number of figures that is kept: the figures of every page and level of the bundle in use,
+# and those of a new bundle that are created before it is used (see comparison.precomputeFigures)
+FIGURE_CACHE_SIZE = 128
+
+# Figures that are already created in this process, from least to most recently used
+cachedFigures = collections.OrderedDict()
+figureLock = threading.Lock()
+
+# Figures that are being created, with the event that is set when they are created
+pendingFigures = {}
+
+# Number of requests that were answered from the cache (hits), that created the figure (misses)
+# and that waited for another request to create it (waits)
+statistics = {"hits": 0, "misses": 0, "waits": 0, "evictions": 0}
+
+## CACHED FIGURES --------------------------------------------------------------
+
+# Get a figure through the cache
+def cachedFigure(name, bundle, create, *arguments):
+    """ Returns a figure of a bundle from the cache, or creates it and adds it to the cache.
+        Note: the same figure is returned on every call, so it should not be changed in place.
+
+        Parameters:
+        name (string): name of the figure, unique within the dashboard
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        create (function): function that creates the figure from the bundle and the arguments
+        arguments (any): choices of the user the figure is created with, such as the selected level (hashable)
+
+        Returns:
+        figure (plotly figure): figure (or other part of a page) created by create(bundle, *arguments)
+    """
+    if not CACHE_FIGURES:
+        return create(bundle, *arguments)
+
+    key = (name, bundle.version) + tuple(arguments)
+    while True:
+        with figureLock:
+            if key in cachedFigures:
+                cachedFigures.move_to_end(key)
+                statistics["hits"] += 1
+                return cachedFigures[key]
+            created = pendingFigures.get(key)
+            if created is None:
+                created = pendingFigures[key] = threading.Event()
+                statistics["misses"] += 1
+                break
+            statistics["waits"] += 1
+        # Another request creates the figure, look it up again once it is done (or create it if that failed)
+        created.wait()
+
+    # Create figure outside the lock, so other figures can be served meanwhile
+    try:
+        figure = create(bundle, *arguments)
+        with figureLock:
+            storeFigure(key, figure)
+    finally:
+        with figureLock:
+            del pendingFigures[key]
+        created.set()
+    return figure
+
+# Add a figure to the cache
+def storeFigure(key, figure):
+    """ Adds a figure to the cache and removes the figures that are no longer needed, should hold figureLock.
+        Figures of bundles before the bundle in use are never used again. The figures of the bundle in use are kept
+        when figures of a new bundle are created before it is published, until the new bundle is used.
+
+        Parameters:
+        key (tuple): name of the figure, version of the bundle and the arguments, see cachedFigure
+        figure (plotly figure): created figure
+    """
+    inUse = preparation.getBundle()
+    oldest = min(key[1], inUse.version) if inUse is not None else key[1]
+    for earlier in [cachedKey for cachedKey in cachedFigures if cachedKey[1] < oldest]:
+        del cachedFigures[earlier]
+        statistics["evictions"] += 1
+    cachedFigures[key] = figure
+    cachedFigures.move_to_end(key)
+    while len(cachedFigures) > FIGURE_CACHE_SIZE:
+        cachedFigures.popitem(last=False)
+        statistics["evictions"] += 1
+
+# Empty the cache
+def clearFigures():
+    """ Removes all figures from the cache. """
+    with figureLock:
+        cachedFigures.clear()
@@ -0,0 +1,64 @@
+## SHARED FIGURES CODE ---------------------------------------------------------
+
+# This file contains the figures that are the same for every country, built directly as plotly graph objects.
+# Plotly Express validates and styles every figure it makes, and a graph that combines several Express figures
+# pays for that once per line. Here the whole graph is assembled in one pass from the columns of the datasets.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import plotly.graph_objects as go
+import plotly.io as pio
+from apps.visualisation import downsampling
+
+## FIGURE SETTINGS -------------------------------------------------------------
+
+# Appearance of the forecast and its confidence interval
+FORECAST_COLOR = "seagreen"
+BAND_COLOR = "rgba(184, 215, 198, 0.5)"
+
+# Vaccination level from which the graphs show the theoretical herd immunity
+HERD_IMMUNITY = 90
+
+## CREATE VISUALISATIONS -------------------------------------------------------
+
+# Line graph for vaccination coverage with its forecast
+def createCoverageFigure(vaccCov, vaccCovPred, title, color):
+    """ Create line graph for vaccination coverage of a country, followed by its forecast
+        and the confidence interval of the forecast as filled band. Both series are downsampled to the width of the graph.
+
+        Parameters:
+        vaccCov (dataframe): vaccination coverage per date, with columns date and coverage_full_dose
+        vaccCovPred (dataframe): forecast per date, with columns date, predicted, lower_confint and upper_confint
+        title (string): title of the graph
+        color (string): color of the line of the vaccination coverage
+
+        Returns:
+        figure (plotly graph): line graph for vaccination coverage with forecast
+    """
+    vaccCov = downsampling.downsample(vaccCov, "date", "coverage_full_dose")
+    vaccCovPred = downsampling.downsample(vaccCovPred, "date", "predicted")
+    predictionDates = vaccCovPred["date"].values
+    history = go.Scatter(x=vaccCov["date"].values, y=vaccCov["coverage_full_dose"].values,
+                         mode="lines", line={"color": color}, showlegend=False,
+                         hovertemplate="Date=%{x}<br>Vaccination Level (%)=%{y}<extra></extra>")
+
+    # Lower limit without line, the upper limit fills the area down to it
+    lower = go.Scatter(x=predictionDates, y=vaccCovPred["lower_confint"].values,
+                       mode="lines", line={"width": 0}, showlegend=False,
+                       hovertemplate="Date=%{x}<br>Lower limit of confidence interval=%{y}<extra></extra>")
+    upper = go.Scatter(x=predictionDates, y=vaccCovPred["upper_confint"].values,
+                       mode="lines", line={"width": 0}, fill="tonexty", fillcolor=BAND_COLOR, showlegend=False,
+                       hovertemplate="Date=%{x}<br>Upper limit of confidence interval=%{y}<extra></extra>")
+    forecast = go.Scatter(x=predictionDates, y=vaccCovPred["predicted"].values,
+                          mode="lines", line={"color": FORECAST_COLOR}, showlegend=False,
+                          hovertemplate="Date=%{x}<br>Predicted Vaccination Level (%)=%{y}<extra></extra>")
+
+    layout = go.Layout(template=pio.templates["seaborn"],
+                       title={"text": title},
+                       margin={"t": 60},
+                       xaxis={"title": {"text": "Date"}},
+                       yaxis={"title": {"text": "Vaccination Level (%)"}, "range": [0, 100]},
+                       shapes=[{"type": "line", "xref": "x domain", "x0": 0, "x1": 1, "yref": "y", "y0": HERD_IMMUNITY, "y1": HERD_IMMUNITY,
+                                "line": {"width": 2, "dash": "dash"}, "opacity": 0.2}],
+                       annotations=[{"text": "<i>theoretical herd immunity</i>", "xref": "x domain", "x": 1, "yref": "y", "y": HERD_IMMUNITY,
+                                     "xanchor": "right", "yanchor": "bottom", "showarrow": False}])
+    return go.Figure(data=[history, lower, upper, forecast], layout=layout)
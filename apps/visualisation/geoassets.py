@@ -0,0 +1,233 @@
+## GEOMETRY ASSETS CODE --------------------------------------------------------
+
+# This file contains the export of the country geographies as static assets of the dashboard.
+# The assets are written to a folder of their own (not the assets folder, which Dash serves and watches) and served by their own route.
+# They can be built ahead of time, which also removes the files of earlier versions: python -m apps.visualisation.geoassets
+# The maps refer to the url of the asset (matched on featureidkey), instead of containing the shapes themselves,
+# so a map only sends the location codes and their colour values to the browser.
+# The asset names contain a fingerprint of their content, so browsers can cache them for a long time:
+# a changed geography gets a new name, and is therefore downloaded again.
+# Geographies are exported as quantized topology (TopoJSON, see topology.py), which the browser decodes to GeoJSON:
+# the maps are shown through a store and a clientside callback that does so, see mapGraph.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+import glob
+import hashlib
+import json
+import threading
+import flask
+from dash import dcc, html
+from dash.dependencies import Input, Output, ClientsideFunction
+from app import app, server
+from apps.preparation import geometry, topology, sourcecache
+
+## ASSET SETTINGS --------------------------------------------------------------
+
+# Folder in which the geographies are exported
+ASSET_FOLDER = "data/cache/geoassets"
+
+# Route (below the pathname prefix of the dashboard) at which the exported geographies are served
+ASSET_ROUTE = "geometry/"
+
+# Number of seconds that browsers may cache an exported geography
+CACHE_SECONDS = 365 * 24 * 60 * 60
+
+# Format of the exported geographies: "topojson" (quantized topology, decoded by the browser) or "geojson"
+ENCODING = "topojson"
+
+# Milliseconds between the checks of the browser whether the geography of a map is downloaded and decoded
+LOADING_INTERVAL = 100
+
+# Geographies that are already exported in this process
+exportedAssets = {}
+assetLock = threading.Lock()
+
+## EXPORT GEOGRAPHIES ----------------------------------------------------------
+
+# Encode a geography
+def encodeAsset(name, tolerance, encoding=None):
+    """ Encodes a geography at a level of detail as GeoJSON or as quantized topology (TopoJSON).
+        Every shape is identified by the column the data is joined on ("id" of the feature).
+        A topology is built from the unsimplified shapes and simplified along its shared arcs, see topology.encodeTopology.
+
+        Parameters:
+        name (string): name of the geography as defined in geometry.GEOMETRIES
+        tolerance (float): tolerance of the level of detail
+        encoding (string): "topojson" or "geojson", ENCODING if not given
+
+        Returns:
+        content (bytes): encoded geography
+        extension (string): file extension of the encoding
+    """
+    if (encoding or ENCODING) == "topojson":
+        shapes = geometry.loadGeometry(name).geometry
+        encoded = topology.encodeTopology(shapes, topology.quantizationStep(tolerance), tolerance)
+        return json.dumps(encoded, separators=(",", ":")).encode("utf-8"), ".topojson"
+    return geometry.loadGeometry(name, tolerance).geometry.to_json().encode("utf-8"), ".json"
+
+# Export a geography as static asset
+def exportAsset(name, tolerance):
+    """ Writes a geography at a level of detail to the asset folder, see encodeAsset.
+        A file is only written if it does not exist yet, and is moved into place when it is complete,
+        so processes that export the same geography at the same time never see a partial file.
+        Files of earlier versions are left for pruneAssets.
+
+        Parameters:
+        name (string): name of the geography as defined in geometry.GEOMETRIES
+        tolerance (float): tolerance of the level of detail
+
+        Returns:
+        fileName (string): name of the exported file, relative to the asset folder
+    """
+    content, extension = encodeAsset(name, tolerance)
+    fingerprint = hashlib.sha1(content).hexdigest()[:12]
+    fileName = name + "-" + str(tolerance) + "-" + fingerprint + extension
+    path = os.path.join(ASSET_FOLDER, fileName)
+
+    if not os.path.exists(path):
+        os.makedirs(ASSET_FOLDER, exist_ok=True)
+        temporaryPath = sourcecache.temporaryFile(path)
+        with open(temporaryPath, "wb") as file:
+            file.write(content)
+        os.replace(temporaryPath, path)
+    return fileName
+
+# Url of a geography at the level of detail of a map
+def mapAsset(name, scale=None):
+    """ Returns the url of the geography asset at the level of detail that suits the map, see geometry.chooseTolerance.
+        The geography is exported the first time it is used, and again if its source file changed.
+
+        Parameters:
+        name (string): name of the geography as defined in geometry.GEOMETRIES
+        scale (float): projection scale of an orthographic map that shows the globe,
+                       the map is fitted to the bounds of the geography if not given
+
+        Returns:
+        url (string): url of the geography asset, to use as geojson of a choropleth (with featureidkey "id")
+                      that is shown with mapGraph
+    """
+    tolerance = geometry.chooseTolerance(name, scale)
+    shapes = geometry.loadGeometry(name, tolerance)
+    with assetLock:
+        # Export again if the geography was made again since it was exported
+        exported = exportedAssets.get((name, tolerance))
+        if exported is None or exported[0] is not shapes:
+            exported = (shapes, app.config.requests_pathname_prefix + ASSET_ROUTE + exportAsset(name, tolerance))
+            exportedAssets[(name, tolerance)] = exported
+    return exported[1]
+
+# Path of the exported file of a geography
+def assetPath(name, tolerance):
+    """ Returns the path of the exported file of a geography at a level of detail, exporting it if needed.
+
+        Parameters:
+        name (string): name of the geography as defined in geometry.GEOMETRIES
+        tolerance (float): tolerance of the level of detail
+
+        Returns:
+        path (string): path of the exported file
+    """
+    return os.path.join(ASSET_FOLDER, exportAsset(name, tolerance))
+
+## SHOW MAPS -------------------------------------------------------------------
+
+# Id of the store that holds the figure of a map
+def figureStore(graphId):
+    """ Returns the id of the store that holds the figure of a map, before its shapes are decoded.
+
+        Parameter:
+        graphId (string): id of the graph of the map
+
+        Returns:
+        storeId (string): id of the store, to use as output of callbacks that update the map
+    """
+    return graphId + "_figure"
+
+# Id of the interval that waits for the geography of a map
+def loadingInterval(graphId):
+    """ Returns the id of the interval that runs while the browser downloads the geography of a map, see registerMap.
+
+        Parameter:
+        graphId (string): id of the graph of the map
+
+        Returns:
+        intervalId (string): id of the interval
+    """
+    return graphId + "_loading"
+
+# Graph of a map with exported geography
+def mapGraph(graphId, figure):
+    """ Creates the graph of a map, together with the store that holds its figure
+        and the interval that waits for its geography.
+        The browser decodes the geography of the figure (if it is a topology) and shows the map, see registerMap.
+
+        Parameters:
+        graphId (string): id of the graph of the map
+        figure (plotly figure): map, see mapAsset, or the map serialised as JSON (see responses.serialisedFigure)
+
+        Returns:
+        graph (dash component): graph with the store of its figure and its interval
+    """
+    return html.Div([dcc.Store(id=figureStore(graphId), data=figure),
+                     dcc.Interval(id=loadingInterval(graphId), interval=LOADING_INTERVAL, disabled=True),
+                     dcc.Graph(id=graphId)])
+
+# Decode the geography of a map in the browser
+def registerMap(graphId):
+    """ Registers the clientside callback that shows the figure of a map after decoding its geography,
+        see decodeFigure in assets/topology_script.js. The geography is downloaded in the background:
+        until it is decoded, the callback leaves the graph as it is and turns on the interval of the map,
+        which runs the callback again.
+
+        Parameter:
+        graphId (string): id of the graph of the map, see mapGraph
+    """
+    app.clientside_callback(ClientsideFunction(namespace="topology", function_name="decodeFigure"),
+                            [Output(graphId, "figure"), Output(loadingInterval(graphId), "disabled")],
+                            [Input(figureStore(graphId), "data"), Input(loadingInterval(graphId), "n_intervals")])
+
+## SERVE GEOGRAPHIES -----------------------------------------------------------
+
+# Serve an exported geography
+@server.route(app.config.routes_pathname_prefix + ASSET_ROUTE + "<fileName>")
+def serveGeometryAsset(fileName):
+    """ Serves an exported geography, which browsers may cache for a long time without checking for changes.
+        Safe because a changed geography is exported under a new name.
+
+        Parameter:
+        fileName (string): name of the exported file, see exportAsset
+
+        Returns:
+        response (flask response): exported file with caching headers
+    """
+    response = flask.send_from_directory(os.path.abspath(ASSET_FOLDER), fileName, mimetype="application/json")
+    response.headers["Cache-Control"] = "public, max-age=" + str(CACHE_SECONDS) + ", immutable"
+    return response
+
+## BUILD GEOGRAPHIES -----------------------------------------------------------
+
+# Remove exported files of earlier versions
+def pruneAssets(current):
+    """ Removes the exported files that are not in use, such as the files of earlier versions of a geography.
+        Only used when the assets are built ahead of time (see buildAssets), so a running dashboard never loses a file.
+
+        Parameter:
+        current (list): names of the exported files that are in use, see exportAsset
+    """
+    for path in glob.glob(os.path.join(ASSET_FOLDER, "*.*json")):
+        if os.path.basename(path) not in current:
+            os.remove(path)
+
+# Export every level of detail of every geography ahead of time
+def buildAssets():
+    """ Exports every geography at every level of detail and removes the files of earlier versions.
+        Run before the dashboard starts (for example when its image is built), so it does not export them on first use.
+    """
+    current = [exportAsset(name, tolerance) for name, settings in geometry.GEOMETRIES.items() for tolerance in settings["tolerances"]]
+    pruneAssets(current)
+    print("Exported " + str(len(current)) + " geography assets to " + ASSET_FOLDER + ".")
+
+
+if __name__ == '__main__':
+    buildAssets()
@@ -0,0 +1,61 @@
+## SERIALISED RESPONSES CODE ---------------------------------------------------
+
+# This file contains the serialised outputs of the callbacks that return large figures, such as the choropleths.
+# Dash serialises the result of a callback on every request. A figure that is serialised once per bundle and input values
+# (with orjson if it is installed) is returned by its callback as a JSON string instead, which Dash sends as it is
+# and the browser parses before the figure is shown (see decodeFigure in assets/topology_script.js).
+# The callback is still answered by Dash, with its validation, callback context and hooks.
+# Responses are compressed by Flask (flask-compress, turned on in app.py).
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import plotly.io as pio
+from app import server
+from apps.visualisation import figurecache
+
+## RESPONSE SETTINGS -----------------------------------------------------------
+
+# Return serialised figures from the callbacks (True) or the figures themselves, serialised by Dash (False)
+SERIALISE_OUTPUTS = True
+
+# Smallest response in bytes that is sent compressed
+MINIMUM_SIZE = 1024
+
+# Gzip compression level of the responses, low enough to compress every response again
+GZIP_LEVEL = 6
+
+server.config["COMPRESS_MIN_SIZE"] = MINIMUM_SIZE
+server.config["COMPRESS_LEVEL"] = GZIP_LEVEL
+
+## SERIALISE OUTPUTS -----------------------------------------------------------
+
+# Serialise a figure
+def serialiseFigure(bundle, create, *arguments):
+    """ Creates a figure of a bundle and serialises it as Dash would.
+
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        create (function): function that creates the figure from the bundle and the arguments
+        arguments (any): choices of the user the figure is created with
+
+        Returns:
+        serialised (string): figure as JSON
+    """
+    return pio.json.to_json_plotly(create(bundle, *arguments))
+
+# Get a serialised figure through the figure cache
+def serialisedFigure(name, bundle, create, *arguments):
+    """ Returns the output of a callback that creates a large figure, serialised once per bundle and arguments.
+        The figure should be shown through geoassets.mapGraph, which parses the serialised figure in the browser.
+
+        Parameters:
+        name (string): name of the figure, unique within the dashboard
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        create (function): function that creates the figure from the bundle and the arguments
+        arguments (any): choices of the user the figure is created with, such as the selected level (hashable)
+
+        Returns:
+        output (string or plotly figure): figure as JSON, or the figure itself if SERIALISE_OUTPUTS is False
+    """
+    if not SERIALISE_OUTPUTS:
+        return figurecache.cachedFigure(name, bundle, create, *arguments)
+    return figurecache.cachedFigure("serialised:" + name, bundle, serialiseFigure, create, *arguments)
@@ -0,0 +1,379 @@
+## VECTOR TILES CODE -----------------------------------------------------------
+
+# This file contains an optional tile-based mode for the US county map.
+# Instead of sending all county shapes in one figure, the server cuts the counties into vector tiles
+# (Mapbox Vector Tile format) and the browser only loads the tiles of the part of the map it shows.
+# Every zoom level uses the coarsest level of detail that is invisible at that zoom (see geometry.py),
+# so the size of a tile, and the time to make it, stay about the same however detailed the source geography is.
+# A tile contains one layer per class of vaccination coverage, which the map colours with the colour scale of the dashboard.
+# The tile urls contain the version of the bundle, so browsers can cache tiles until the next refresh.
+# Only tiles of the bundle in use that overlap the counties are made, other tile requests are rejected.
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import math
+import threading
+import collections
+import numpy as np
+import plotly.graph_objects as go
+from flask import abort, Response
+from shapely.geometry import box, Polygon, MultiPolygon, GeometryCollection
+from app import app, server
+from apps.preparation import preparation, geometry
+
+## TILE SETTINGS ---------------------------------------------------------------
+
+# Draw the US county map from vector tiles (True) or as one choropleth (False)
+VECTOR_TILES = False
+
+# Number of coordinate units along the side of a tile, and around a tile to avoid seams between tiles
+EXTENT = 4096
+BUFFER = 64
+
+# Size (in pixels) at which the browser draws a tile, and the largest zoom level that is served
+TILE_SIZE = 512
+MAX_ZOOM = 12
+
+# Number of classes of vaccination coverage, and the colour scale they are coloured with
+NUMBER_OF_CLASSES = 8
+COLOR_SCALE = [(0, (255, 0, 0)), (0.6, (255, 165, 0)), (1, (70, 130, 180))]
+
+# Number of tiles that are kept in memory
+TILE_CACHE_SIZE = 1024
+
+# Number of seconds that browsers may cache a tile of the bundle in use
+CACHE_SECONDS = 24 * 60 * 60
+
+# Half of the circumference of the earth in web mercator coordinates
+MERCATOR_HALF = 20037508.342789244
+
+# Geographies in web mercator that are already projected, and tiles that are already made in this process
+projectedGeometries = {}
+madeTiles = collections.OrderedDict()
+tileLock = threading.Lock()
+
+## ENCODE TILES ----------------------------------------------------------------
+
+# Encode an unsigned integer as protocol buffers varint
+def varint(value):
+    """ Encodes an unsigned integer in the variable length format of protocol buffers. """
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+# Encode a field of a protocol buffers message
+def field(number, value):
+    """ Encodes a field of a protocol buffers message: an unsigned integer, or bytes (strings, messages and packed lists).
+
+        Parameters:
+        number (int): number of the field
+        value (int or bytes): value of the field
+
+        Returns:
+        encoded (bytes): encoded field
+    """
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value)
+    return varint((number << 3) | 2) + varint(len(value)) + value
+
+# Encode a drawing command
+def command(commandId, count):
+    """ Encodes a drawing command of the vector tile format: 1 moves the pen, 2 draws lines and 7 closes the ring. """
+    return (commandId & 0x7) | (count << 3)
+
+# Encode the rings of a polygon as drawing commands
+def encodePolygon(polygon, cursor):
+    """ Encodes a polygon in tile coordinates as the drawing commands of the vector tile format.
+        The exterior ring gets a positive area and the holes a negative area, rings that became too small are left out.
+
+        Parameters:
+        polygon (polygon): polygon in tile coordinates
+        cursor (array): position of the pen after the previous polygon of the feature, changed in place
+
+        Returns:
+        commands (list): drawing commands and their (zigzag encoded) parameters
+    """
+    commands = []
+    for number, ring in enumerate([polygon.exterior] + list(polygon.interiors)):
+        points = np.rint(np.asarray(ring.coords)).astype(np.int64)
+        points = points[np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]]
+        if len(points) > 1 and (points[0] == points[-1]).all():
+            points = points[:-1]
+        if len(points) < 3:
+            if number == 0:
+                return []
+            continue
+
+        # Surveyor's formula, exterior rings should have a positive area and holes a negative area
+        area = np.sum(points[:, 0] * np.roll(points[:, 1], -1) - np.roll(points[:, 0], -1) * points[:, 1])
+        if area == 0:
+            if number == 0:
+                return []
+            continue
+        if (area > 0) != (number == 0):
+            points = points[::-1]
+
+        deltas = np.diff(np.vstack([cursor, points]), axis=0)
+        zigzag = (deltas << 1) ^ (deltas >> 63)
+        cursor[:] = points[-1]
+        commands += [command(1, 1)] + list(zigzag[0])
+        commands += [command(2, len(points) - 1)] + list(zigzag[1:].ravel())
+        commands += [command(7, 1)]
+    return commands
+
+# Encode a feature of a layer
+def encodeFeature(featureId, shape):
+    """ Encodes a (multi)polygon in tile coordinates as feature of a vector tile layer.
+
+        Parameters:
+        featureId (int): id of the feature, the position of the shape in the key index of the geography
+        shape (polygon or multipolygon): shape in tile coordinates
+
+        Returns:
+        encoded (bytes): encoded feature, empty if nothing of the shape is left at this zoom level
+    """
+    # Cutting a shape at the tile can also leave lines and points, only its polygons are drawn
+    parts = shape.geoms if isinstance(shape, (MultiPolygon, GeometryCollection)) else [shape]
+    polygons = [polygon for part in parts for polygon in (part.geoms if isinstance(part, MultiPolygon) else [part])
+                if isinstance(polygon, Polygon)]
+    cursor = np.zeros(2, dtype=np.int64)
+    commands = []
+    for polygon in polygons:
+        commands += encodePolygon(polygon, cursor)
+    if not commands:
+        return b""
+    return field(1, int(featureId)) + field(3, 3) + field(4, b"".join(varint(int(value)) for value in commands))
+
+# Encode a layer of a tile
+def encodeLayer(name, features):
+    """ Encodes a layer of a vector tile.
+
+        Parameters:
+        name (string): name of the layer
+        features (list): encoded features of the layer
+
+        Returns:
+        encoded (bytes): encoded layer, to include as field 3 of a tile
+    """
+    return field(15, 2) + field(1, name.encode("utf-8")) + b"".join(field(2, feature) for feature in features) + field(5, EXTENT)
+
+## MAKE TILES ------------------------------------------------------------------
+
+# Classes of vaccination coverage of the counties
+def coverageClasses(bundle):
+    """ Divides the counties in classes of equal width between the lowest and highest vaccination coverage.
+
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
+        Requires:
+        vaccLocMapCountyUS (geodataframe) to be included in bundle
+
+        Returns:
+        edges (array): lowest and highest coverage of every class
+        classes (array): class of every county, in the order of the key index of the geography, -1 if it has no coverage
+    """
+    coverage = bundle.vaccLocMapCountyUS["coverage_full_dose"].to_numpy(dtype=float)
+    positions = geometry.matchKeys("countiesUS", bundle.vaccLocMapCountyUS.index.to_series())
+    edges = np.linspace(np.nanmin(coverage), np.nanmax(coverage), NUMBER_OF_CLASSES + 1)
+    classes = np.full(len(geometry.keyIndex("countiesUS")), -1)
+    known = ~np.isnan(coverage) & (positions >= 0)
+    classes[positions[known]] = np.clip(np.digitize(coverage[known], edges[1:-1]), 0, NUMBER_OF_CLASSES - 1)
+    return edges, classes
+
+# Colour of a class of vaccination coverage
+def classColor(number):
+    """ Returns the colour of the middle of a class on the colour scale of the dashboard.
+
+        Parameter:
+        number (int): number of the class
+
+        Returns:
+        color (string): colour as rgb string
+    """
+    position = (number + 0.5) / NUMBER_OF_CLASSES
+    for (start, startColor), (end, endColor) in zip(COLOR_SCALE, COLOR_SCALE[1:]):
+        if position <= end:
+            share = (position - start) / (end - start)
+            return "rgb" + str(tuple(round(a + share * (b - a)) for a, b in zip(startColor, endColor)))
+    return "rgb" + str(COLOR_SCALE[-1][1])
+
+# Counties in web mercator at the level of detail of a zoom level
+def zoomShapes(zoom):
+    """ Returns the county shapes in web mercator, at the coarsest level of detail that is invisible at a zoom level.
+
+        Parameter:
+        zoom (int): zoom level of the tile
+
+        Returns:
+        shapes (geoseries): county shapes in web mercator, indexed on the join key of the geography
+    """
+    allowed = geometry.PIXEL_TOLERANCE * 360 / (TILE_SIZE * 2 ** zoom)
+    tolerances = geometry.GEOMETRIES["countiesUS"]["tolerances"]
+    suitable = [tolerance for tolerance in tolerances if tolerance <= allowed]
+    tolerance = max(suitable) if suitable and geometry.LEVEL_OF_DETAIL else tolerances[0]
+
+    shapes = geometry.loadGeometry("countiesUS", tolerance).geometry
+    with tileLock:
+        projected = projectedGeometries.get(tolerance)
+        if projected is None or projected[0] is not shapes:
+            projected = (shapes, shapes.to_crs(epsg=3857))
+            projectedGeometries[tolerance] = projected
+    return projected[1]
+
+# Make a tile
+def makeTile(bundle, zoom, x, y):
+    """ Cuts the counties that lie in a tile and encodes them as vector tile, with one layer per class of vaccination coverage.
+
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        zoom (int): zoom level of the tile
+        x (int): column of the tile
+        y (int): row of the tile
+
+        Returns:
+        tile (bytes): encoded vector tile
+    """
+    size = 2 * MERCATOR_HALF / 2 ** zoom
+    minX, maxY = -MERCATOR_HALF + x * size, MERCATOR_HALF - y * size
+    margin = size * BUFFER / EXTENT
+
+    # Counties of which the bounds lie in the tile, cut at the tile (with some margin)
+    shapes = zoomShapes(zoom)
+    shapes = shapes.cx[minX - margin:minX + size + margin, maxY - size - margin:maxY + margin]
+    shapes = shapes.intersection(box(minX - margin, maxY - size - margin, minX + size + margin, maxY + margin))
+    shapes = shapes.affine_transform([EXTENT / size, 0, 0, -EXTENT / size, -minX * EXTENT / size, maxY * EXTENT / size])
+
+    edges, classes = coverageClasses(bundle)
+    positions = geometry.matchKeys("countiesUS", shapes.index.to_series())
+    features = collections.defaultdict(list)
+    for position, shape in zip(positions, shapes):
+        if position >= 0 and classes[position] >= 0 and not shape.is_empty:
+            feature = encodeFeature(position, shape)
+            if feature:
+                features[classes[position]].append(feature)
+    return b"".join(field(3, encodeLayer("class" + str(number), features[number])) for number in sorted(features))
+
+# Determine whether a tile overlaps the counties
+def tileInBounds(zoom, x, y):
+    """ Determines whether a tile (with its margin) overlaps the bounds of the counties.
+
+        Parameters:
+        zoom (int): zoom level of the tile
+        x (int): column of the tile
+        y (int): row of the tile
+
+        Returns:
+        inBounds (boolean): true if the tile overlaps the bounds of the counties
+    """
+    # Bounds of the counties in web mercator
+    minLon, minLat, maxLon, maxLat = geometry.loadGeometry("countiesUS").total_bounds
+    radius = MERCATOR_HALF / math.pi
+    boundsMinX, boundsMaxX = math.radians(minLon) * radius, math.radians(maxLon) * radius
+    boundsMinY, boundsMaxY = [math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * radius for lat in (minLat, maxLat)]
+
+    size = 2 * MERCATOR_HALF / 2 ** zoom
+    minX, maxY = -MERCATOR_HALF + x * size, MERCATOR_HALF - y * size
+    margin = size * BUFFER / EXTENT
+    return (minX - margin <= boundsMaxX and minX + size + margin >= boundsMinX
+            and maxY - size - margin <= boundsMaxY and maxY + margin >= boundsMinY)
+
+# Get a tile through the cache
+def getTile(bundle, zoom, x, y):
+    """ Returns a tile of a bundle, made once and kept in memory until it is the least recently used tile.
+
+        Parameters:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+        zoom (int): zoom level of the tile
+        x (int): column of the tile
+        y (int): row of the tile
+
+        Returns:
+        tile (bytes): encoded vector tile
+    """
+    key = (bundle.version, zoom, x, y)
+    with tileLock:
+        if key in madeTiles:
+            madeTiles.move_to_end(key)
+            return madeTiles[key]
+    tile = makeTile(bundle, zoom, x, y)
+    with tileLock:
+        madeTiles[key] = tile
+        while len(madeTiles) > TILE_CACHE_SIZE:
+            madeTiles.popitem(last=False)
+    return tile
+
+## SERVE TILES -----------------------------------------------------------------
+
+# Serve a tile of the US county map
+@server.route(app.config.routes_pathname_prefix + "tiles/countiesUS/<int:version>/<int:zoom>/<int:x>/<int:y>.pbf")
+def serveCountyTile(version, zoom, x, y):
+    """ Serves a vector tile of the US county map, made from the bundle in use, which the browser can cache.
+        Tiles of another bundle than the one in use, above the largest zoom level or outside the counties are rejected (404),
+        so requests cannot make tiles that are never shown. A map of an earlier bundle gets its new tiles when it is made again.
+
+        Parameters:
+        version (int): version of the bundle the map was made with
+        zoom (int): zoom level of the tile
+        x (int): column of the tile
+        y (int): row of the tile
+
+        Returns:
+        response (flask response): encoded vector tile
+    """
+    if zoom > MAX_ZOOM or not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        abort(404)
+    bundle = preparation.getBundle()
+    if version != bundle.version or not tileInBounds(zoom, x, y):
+        abort(404)
+    response = Response(getTile(bundle, zoom, x, y), mimetype="application/x-protobuf")
+    response.headers["Cache-Control"] = "public, max-age=" + str(CACHE_SECONDS)
+    return response
+
+# Url of the tiles of a bundle
+def tileUrl(bundle):
+    """ Returns the url template of the county tiles of a bundle, relative to the host of the dashboard,
+        so the same map can be sent to every visitor. The browser makes it absolute before the map is drawn
+        (see decodeFigure in assets/topology_script.js), because the map loads its tiles outside the page.
+
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
+        Returns:
+        url (string): url of the tiles, with {z}, {x} and {y} in place of the zoom level, column and row
+    """
+    return app.config.requests_pathname_prefix + "tiles/countiesUS/" + str(bundle.version) + "/{z}/{x}/{y}.pbf"
+
+## CREATE TILED MAP ------------------------------------------------------------
+
+# Tiled map for vaccination coverage per US county
+def createCountyTileMap(bundle):
+    """ Creates a map of vaccination coverage per US county that loads its shapes as vector tiles.
+
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
+        Requires:
+        vaccLocMapCountyUS (geodataframe) to be included in bundle
+
+        Returns:
+        figLocationUSA (plotly graph objects figure): map with one layer per class of vaccination coverage
+    """
+    edges, classes = coverageClasses(bundle)
+    url = tileUrl(bundle)
+    layers = [{"sourcetype": "vector", "source": [url], "sourcelayer": "class" + str(number),
+               "type": "fill", "color": classColor(number), "fill": {"outlinecolor": "white"}, "below": "traces"}
+              for number in range(NUMBER_OF_CLASSES)]
+
+    # The colour bar is shown by an invisible marker, the counties themselves are drawn by the layers
+    figLocationUSA = go.Figure(go.Scattermapbox(lat=[None], lon=[None], mode="markers", hoverinfo="skip",
+                                                marker={"color": [edges[0]], "cmin": edges[0], "cmax": edges[-1],
+                                                        "colorscale": [[start, "rgb" + str(color)] for start, color in COLOR_SCALE],
+                                                        "showscale": True,
+                                                        "colorbar": {"title": "Vaccination Level (%)", "tickvals": edges.round(1)}}))
+    figLocationUSA.update_layout(mapbox_style="white-bg", mapbox_layers=layers,
+                                 mapbox_center={"lat": 39, "lon": -98}, mapbox_zoom=2.6,
+                                 margin={"l": 0, "r": 0, "t": 0, "b": 0}, template="seaborn")
+    return figLocationUSA
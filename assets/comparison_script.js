@@ -0,0 +1,28 @@
+// Filters the figures of the comparison page in the browser, see apps/visualisation/comparison.py.
+// The page receives the figures of all countries once, selecting countries or an attitude
+// only changes which traces are visible, without asking the server for new figures.
+
+// Show the traces of the selected countries of a figure
+function showCountries(figure, selectedCountries) {
+  if (!figure || !figure.data) {
+    return {};
+  }
+  var selected = selectedCountries || [];
+  var data = figure.data.map(function(trace) {
+    return Object.assign({}, trace, {visible: selected.indexOf(trace.name) >= 0});
+  });
+  return Object.assign({}, figure, {data: data});
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  comparison: {
+    // Line graph of vaccination coverage of the selected countries
+    showCoverage: function(figures, selectedCountries) {
+      return showCountries(figures && figures.coverage, selectedCountries);
+    },
+    // Line graph of the selected vaccination attitude of the selected countries
+    showAttitude: function(figures, selectedCountries, attitude) {
+      return showCountries(figures && figures.attitudes[attitude], selectedCountries);
+    }
+  }
+});
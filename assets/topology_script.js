@@ -0,0 +1,147 @@
+// Decodes the maps of which the shapes are stored as quantized topology (TopoJSON), see apps/preparation/topology.py.
+// The dashboard sends a map with the url of its topology, this script replaces the url
+// by the shapes as GeoJSON before the map is drawn. Topologies are downloaded in the background:
+// while a download is running, the interval of the map runs the callback again until the topology is decoded.
+// Decoded topologies are kept for the next maps.
+
+var decodedTopologies = {};
+var loadingTopologies = {};
+var failedTopologies = {};
+
+// Milliseconds to wait before a failed download is tried again
+var RETRY_DELAY = 5000;
+
+// Load and decode a topology in the background, the file is cached by the browser so it is usually not downloaded again
+function loadTopology(url) {
+  if (url in failedTopologies && Date.now() - failedTopologies[url] < RETRY_DELAY) {
+    return;
+  }
+  if (!(url in loadingTopologies)) {
+    loadingTopologies[url] = fetch(url)
+      .then(function(response) {
+        if (!response.ok) {
+          throw new Error("Could not load " + url + " (HTTP " + response.status + ")");
+        }
+        return response.json();
+      })
+      .then(function(topology) {
+        decodedTopologies[url] = decodeTopology(topology);
+        return decodedTopologies[url];
+      })
+      .catch(function(error) {
+        // Try again after a while
+        delete loadingTopologies[url];
+        failedTopologies[url] = Date.now();
+        console.error(error);
+      });
+  }
+}
+
+// Replace the topology url of a trace by the decoded shapes
+function withShapes(trace, shapes) {
+  return Object.assign({}, trace, {geojson: shapes});
+}
+
+// Determine if a trace refers to a topology
+function hasTopology(trace) {
+  return typeof trace.geojson == "string" && trace.geojson.endsWith(".topojson");
+}
+
+// Figure that was parsed last, so the interval of a map does not parse it again while its topologies download
+var parsedFigure = {text: null, figure: null};
+
+// Parse a serialised figure
+function parseFigure(text) {
+  if (parsedFigure.text !== text) {
+    parsedFigure = {text: text, figure: JSON.parse(text)};
+  }
+  return parsedFigure.figure;
+}
+
+// Make the relative tile urls of the map layers of a figure absolute, because the map loads its tiles outside the page
+function withAbsoluteSources(figure) {
+  var mapbox = figure.layout && figure.layout.mapbox;
+  if (!mapbox || !mapbox.layers) {
+    return figure;
+  }
+  var layers = mapbox.layers.map(function(layer) {
+    if (!Array.isArray(layer.source)) {
+      return layer;
+    }
+    var source = layer.source.map(function(url) {
+      // Keep the placeholders of the url template as they are
+      return typeof url == "string" && url.startsWith("/") ? window.location.origin + url : url;
+    });
+    return Object.assign({}, layer, {source: source});
+  });
+  var layout = Object.assign({}, figure.layout, {mapbox: Object.assign({}, mapbox, {layers: layers})});
+  return Object.assign({}, figure, {layout: layout});
+}
+
+// Decode a topology to a GeoJSON feature collection
+function decodeTopology(topology) {
+  var scale = topology.transform.scale;
+  var translate = topology.transform.translate;
+
+  // Add up the steps of every arc and convert its grid points to longitude and latitude
+  var arcs = topology.arcs.map(function(arc) {
+    var x = 0, y = 0;
+    return arc.map(function(delta) {
+      x += delta[0];
+      y += delta[1];
+      return [x * scale[0] + translate[0], y * scale[1] + translate[1]];
+    });
+  });
+
+  // Join the arcs of a ring, arcs with a negative number (~index) run the other way
+  function ring(numbers) {
+    var points = [];
+    numbers.forEach(function(number) {
+      var arc = number >= 0 ? arcs[number] : arcs[~number].slice().reverse();
+      for (var i = points.length ? 1 : 0; i < arc.length; i++) {
+        points.push(arc[i]);
+      }
+    });
+    return points;
+  }
+
+  var features = topology.objects.shapes.geometries.map(function(geometry) {
+    var shape = null;
+    if (geometry.type == "Polygon") {
+      shape = {type: "Polygon", coordinates: geometry.arcs.map(ring)};
+    } else if (geometry.type == "MultiPolygon") {
+      shape = {type: "MultiPolygon", coordinates: geometry.arcs.map(function(rings) { return rings.map(ring); })};
+    }
+    return {type: "Feature", id: geometry.id, properties: {}, geometry: shape};
+  });
+  return {type: "FeatureCollection", features: features};
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  topology: {
+    // Replace the topology url of every trace of a figure by the decoded shapes, and make its tile urls absolute.
+    // A figure that is serialised once on the server (see responses.py) arrives as JSON and is parsed first.
+    // Returns the figure and stops the interval of the map if its topologies are decoded already,
+    // otherwise starts their downloads and keeps the interval running, so the download never blocks the page.
+    decodeFigure: function(figure, intervals) {
+      if (typeof figure == "string") {
+        figure = parseFigure(figure);
+      }
+      if (!figure || !figure.data) {
+        return [figure, true];
+      }
+      figure = withAbsoluteSources(figure);
+      var waiting = figure.data.filter(function(trace) {
+        return hasTopology(trace) && !(trace.geojson in decodedTopologies);
+      });
+      if (waiting.length) {
+        waiting.forEach(function(trace) { loadTopology(trace.geojson); });
+        return [window.dash_clientside.no_update, false];
+      }
+      var data = figure.data.map(function(trace) {
+        return hasTopology(trace) ? withShapes(trace, decodedTopologies[trace.geojson]) : trace;
+      });
+      return [Object.assign({}, figure, {data: data}), true];
+    }
+  }
+});
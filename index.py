@@ -10,7 +10,9 @@ from app import server
 
 # Connect to preparation, modelling and visualisation code
 from apps.visualisation import NL, UK, USA, comparison
+from apps.visualisation import figurecache
 from apps.preparation import preparation
+from apps.preparation import scheduler
 from apps.modelling import modelling
 
 # DEFINE APP NAVIGATION --------------------------------------------------------
@@ -38,12 +40,16 @@ app.layout = dbc.Container([dcc.Location(id="url"), navbar, content], fluid=True
 # DEFINE HOMESCREEN LAYOUT -----------------------------------------------------
 
 # Create homescreen layout consisting of welcome-message and target group reports
-def createLayoutHome():
+def createLayoutHome(bundle):
     """ Create updated layout for Homescreen
 
+        Parameter:
+        bundle (DatasetBundle): prepared datasets and forecasts of one refresh, see preparation.getBundle
+
         Returns:
         home_layout (dash layout): layout for Homescreen
     """
+
     home_layout = dbc.Container([
 
     dbc.Row([
@@ -59,9 +65,9 @@ def createLayoutHome():
             html.Div([
                 html.Div([html.P("Dutch target group estimation:")],
                         className = "target-report-title target-report-title-NL"),
-                html.Div([html.P("Municipalities: " + modelling.locTargetRecNL() + " (top-ten targets).")],
+                html.Div([html.P("Municipalities: " + modelling.locTargetRecNL(bundle) + " (top-ten targets).")],
                         className = "target-report-text"),
-                html.Div([html.P("Age group: " + modelling.ageTargetRecNL() + " (top target).")],
+                html.Div([html.P("Age group: " + modelling.ageTargetRecNL(bundle) + " (top target).")],
                         className = "target-report-text"),
             ],className='target-report-card target-report-card-NL'),
         ],width = {"size":4, "offset":0}, className="target-report-col"),
@@ -70,11 +76,11 @@ def createLayoutHome():
                 html.Div([
                     html.Div([html.P("British target group estimation:")],
                             className = "target-report-title target-report-title-UK"),
-                    html.Div([html.P("Local authorities: " + modelling.locTargetRecUK() + " (top-ten targets).")],
+                    html.Div([html.P("Local authorities: " + modelling.locTargetRecUK(bundle) + " (top-ten targets).")],
                             className = "target-report-text"),
-                    html.Div([html.P("Age group: " + modelling.ageTargetRecUK() + " (top target).")],
+                    html.Div([html.P("Age group: " + modelling.ageTargetRecUK(bundle) + " (top target).")],
                             className = "target-report-text"),
-                    html.Div([html.P("Deprivation group: " + modelling.incomeTargetRecUK() + " (top target).")],
+                    html.Div([html.P("Deprivation group: " + modelling.incomeTargetRecUK(bundle) + " (top target).")],
                             className = "target-report-text"),
                 ],className='target-report-card target-report-card-UK'),
             ],width = {"size":4, "offset":0}, className="target-report-col"),
@@ -87,11 +93,11 @@ def createLayoutHome():
                 html.Div([
                     html.Div([html.P("American target group estimation:")],
                             className = "target-report-title target-report-title-USA"),
-                    html.Div([html.P("States: " + modelling.locTargetRecUS() + " (top-ten targets).")],
+                    html.Div([html.P("States: " + modelling.locTargetRecUS(bundle) + " (top-ten targets).")],
                             className = "target-report-text"),
-                    html.Div([html.P("Age group: " + modelling.ageTargetRecUS() + " (top target).")],
+                    html.Div([html.P("Age group: " + modelling.ageTargetRecUS(bundle) + " (top target).")],
                             className = "target-report-text"),
-                    html.Div([html.P("Income group: " + modelling.incomeTargetRecUS() + " (top target).")],
+                    html.Div([html.P("Income group: " + modelling.incomeTargetRecUS(bundle) + " (top target).")],
                             className = "target-report-text"),
                 ],className='target-report-card target-report-card-USA'),
             ],width = {"size":4, "offset":0}, className="target-report-col"),
@@ -100,9 +106,9 @@ def createLayoutHome():
                 html.Div([
                     html.Div([html.P("Country vaccination success:")],
                             className = "target-report-title target-report-title-comp"),
-                    html.Div([html.P("Country with the highest vaccination degree: " + modelling.highestCovComp() + " (of the three included in dashboard).")],
+                    html.Div([html.P("Country with the highest vaccination degree: " + modelling.highestCovComp(bundle) + " (of the three included in dashboard).")],
                             className = "target-report-text"),
-                    html.Div([html.P("Country with most citizens unwilling to take vaccine: " + modelling.highestUnwilComp() + " (of the three included in dashboard).")],
+                    html.Div([html.P("Country with most citizens unwilling to take vaccine: " + modelling.highestUnwilComp(bundle) + " (of the three included in dashboard).")],
                             className = "target-report-text"),
                 ],className='target-report-card target-report-card-comp'),
             ],width = {"size":4, "offset":0}, className="target-report-col"),
@@ -125,42 +131,35 @@ def createLayoutHome():
 # UPDATE APP LAYOUT ------------------------------------------------------------
 
 # Show correct page when user navigates to a certain location in dashboard
+# Note: the data is refreshed by the background scheduler, never while rendering a page
 @app.callback(Output('page-content', 'children'),
               [Input('url', 'pathname')])
 def render_page_content(pathname):
     if pathname == '/':
-        if(preparation.checkForRefresh()):
-            preparation.refreshData()
-            modelling.refreshFutureCoveragePrediction()
-        return createLayoutHome()
+        # Use the same bundle of datasets for all target group reports, created once per bundle (see figurecache.py)
+        return figurecache.cachedFigure("layoutHome", preparation.getBundle(), createLayoutHome)
     if pathname == '/NL':
-        if(preparation.checkForRefresh()):
-            preparation.refreshData()
-            modelling.refreshFutureCoveragePrediction()
         return NL.createLayoutNL()
     if pathname == '/UK':
-        if(preparation.checkForRefresh()):
-            preparation.refreshData()
-            modelling.refreshFutureCoveragePrediction()
         return UK.createLayoutUK()
     if pathname == '/USA':
-        if(preparation.checkForRefresh()):
-            preparation.refreshData()
-            modelling.refreshFutureCoveragePrediction()
         return USA.createLayoutUS()
     if pathname == '/Comparison':
-        if(preparation.checkForRefresh()):
-            preparation.refreshData()
-            modelling.refreshFutureCoveragePrediction()
         return comparison.createLayoutComparison()
     if pathname == '/Refresh':
-        preparation.refreshData()
-        modelling.refreshFutureCoveragePrediction()
-        return "The data was successfully refreshed."
+        scheduler.requestRefresh()
+        return "A data refresh was started, the refreshed data is shown as soon as it is ready."
     else:
         return "This page does not exist."
 
 
+# START DATA REFRESH -----------------------------------------------------------
+
+# Refresh data and forecasts in the background on a fixed cadence
+# Data loaded from a snapshot or backup files at launch is refreshed right away
+scheduler.startScheduler(refreshNow = preparation.bootMode != "online")
+
+
 # RUN APP ON SERVER ------------------------------------------------------------
 
 # Run the dashboard as a website on localhost:5000
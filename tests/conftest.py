@@ -0,0 +1,15 @@
+## TEST CONFIGURATION ----------------------------------------------------------
+
+# This file configures the tests of the dashboard.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import os
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+# Tests that import the preparation code launch it with placeholders only, so nothing is retrieved or prepared
+os.environ.setdefault("VAXOSCOPE_START", "lazy")
+os.environ.setdefault("VAXOSCOPE_BOOT", "backup")
@@ -0,0 +1,58 @@
+## DOWNSAMPLING TESTS ----------------------------------------------------------
+
+# This file tests the downsampling of the line graphs with LTTB (see downsampling.py).
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import pytest
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+from apps.visualisation import downsampling
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+# Daily coverage with a single peak, and days without value
+SERIES = pd.DataFrame({"date": pd.date_range("2021-01-01", periods=100),
+                       "coverage_full_dose": [float(day) for day in range(100)]})
+SERIES.loc[40, "coverage_full_dose"] = 500.0
+SERIES.loc[[10, 60], "coverage_full_dose"] = np.nan
+
+## TESTS -----------------------------------------------------------------------
+
+# LTTB keeps the requested number of points, in order, with the first and last point
+def test_lttb_keeps_first_and_last_point():
+    indices = downsampling.lttbIndices(np.arange(100), np.arange(100) % 7, 10)
+    assert len(indices) == 10
+    assert indices[0] == 0 and indices[-1] == 99
+    assert (np.diff(indices) > 0).all()
+
+# A peak forms the largest triangle of its bucket, so it is kept
+def test_lttb_keeps_peak():
+    y = np.zeros(100)
+    y[37] = 10
+    assert 37 in downsampling.lttbIndices(np.arange(100), y, 10)
+
+# Series that are already short enough are kept as they are
+def test_lttb_keeps_short_series():
+    assert list(downsampling.lttbIndices(np.arange(5), np.arange(5), 10)) == [0, 1, 2, 3, 4]
+
+# Rows without value are left out, and the dates are used as x values
+def test_downsample_rows():
+    kept = downsampling.downsample(SERIES, "date", "coverage_full_dose", 10)
+    assert len(kept) == 10
+    assert kept["coverage_full_dose"].notna().all()
+    assert kept["coverage_full_dose"].max() == 500.0
+    assert kept["date"].iloc[0] == SERIES["date"].iloc[0] and kept["date"].iloc[-1] == SERIES["date"].iloc[-1]
+
+# Every group is downsampled on its own
+def test_downsample_groups():
+    data = pd.concat([SERIES.assign(country="NL"), SERIES.assign(country="UK")], ignore_index=True)
+    kept = downsampling.downsampleGroups(data, "country", "date", "coverage_full_dose", 10)
+    assert kept["country"].value_counts().to_dict() == {"NL": 10, "UK": 10}
+
+# Without downsampling every row with a value is kept
+def test_downsample_turned_off(monkeypatch):
+    monkeypatch.setattr(downsampling, "DOWNSAMPLE", False)
+    assert len(downsampling.downsample(SERIES, "date", "coverage_full_dose", 10)) == 98
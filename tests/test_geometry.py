@@ -0,0 +1,56 @@
+## GEOMETRY JOIN TESTS ---------------------------------------------------------
+
+# This file tests the join of data on the shapes of a geography through its key index (see geometry.py),
+# on a small geography instead of the geographies of the dashboard.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import pytest
+pd = pytest.importorskip("pandas")
+gpd = pytest.importorskip("geopandas")
+from shapely.geometry import box
+from apps.preparation import geometry
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+# Geography of three shapes, indexed on their join key
+GEOGRAPHY = gpd.GeoDataFrame({"geometry": [box(0, 0, 1, 1), box(1, 0, 2, 1), box(2, 0, 3, 1)]},
+                             index=pd.Index(["A", "B", "C"], name="code"), crs="EPSG:4326")
+
+# Data with a duplicate key (A), a key without shape (D) and no row for shape B
+DATA = pd.DataFrame({"code": ["C", "A", "D", "A"], "coverage": [30.0, 10.0, 40.0, 99.0], "name": ["c", "a", "d", "a2"]})
+
+## HELPERS ---------------------------------------------------------------------
+
+# Use the small geography
+@pytest.fixture(autouse=True)
+def useGeography(monkeypatch):
+    """ Replaces the geographies of the dashboard by GEOGRAPHY, with an empty key index cache. """
+    monkeypatch.setattr(geometry, "loadGeometry", lambda name, tolerance=None: GEOGRAPHY)
+    monkeypatch.setattr(geometry, "keyIndexes", {})
+
+## TESTS -----------------------------------------------------------------------
+
+# Every shape is kept once in its own order, with the first row of its key or missing values
+def test_join_data():
+    joined = geometry.joinData("test", DATA, "code")
+    assert list(joined.index) == ["A", "B", "C"]
+    assert joined["coverage"].tolist()[0::2] == [10.0, 30.0]
+    assert pd.isna(joined.loc["B", "coverage"]) and pd.isna(joined.loc["B", "name"])
+    assert joined.geometry.equals(GEOGRAPHY.geometry)
+    assert "code" not in joined.columns
+
+# The rows that could not be joined one to one are reported
+def test_join_report():
+    report = geometry.joinReport("test", DATA, "code")
+    problems = {(row.key, row.problem) for row in report.itertuples()}
+    assert problems == {("B", "no data"), ("D", "no shape"), ("A", "duplicate")}
+    assert (report["geography"] == "test").all()
+
+# Data that matches every shape once gives an empty report
+def test_join_report_empty():
+    data = pd.DataFrame({"code": ["B", "C", "A"], "coverage": [1.0, 2.0, 3.0]})
+    assert geometry.joinReport("test", data, "code").empty
+    assert geometry.joinData("test", data, "code")["coverage"].tolist() == [3.0, 1.0, 2.0]
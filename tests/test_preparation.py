@@ -0,0 +1,82 @@
+## DATASET BUNDLE TESTS --------------------------------------------------------
+
+# This file tests the read-only bundles of datasets and the order in which they are published (see preparation.py).
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import threading
+import pytest
+pytest.importorskip("pandas")
+pytest.importorskip("geopandas")
+from apps.preparation import preparation, lazy
+
+## HELPERS ---------------------------------------------------------------------
+
+# Publish bundles without the bundle and listeners of the dashboard
+@pytest.fixture
+def listeners(monkeypatch):
+    """ Starts without a bundle in use and without listeners, and returns the list of listeners. """
+    monkeypatch.setattr(preparation, "currentBundle", None)
+    monkeypatch.setattr(preparation, "publishListeners", [])
+    return preparation.publishListeners
+
+## TESTS -----------------------------------------------------------------------
+
+# A bundle returns its datasets, and cannot be changed
+def test_bundle_is_read_only():
+    datasets = {"vaccCov": [1, 2]}
+    bundle = preparation.DatasetBundle(datasets, 1)
+    datasets["vaccCov"] = [3]
+    assert bundle.vaccCov == [1, 2] and bundle["vaccCov"] == [1, 2]
+    with pytest.raises(AttributeError):
+        bundle.vaccCov = [3]
+    with pytest.raises(AttributeError):
+        bundle.vaccAge
+    assert bundle.datasets() == {"vaccCov": [1, 2]}
+
+# A placeholder is loaded on first read only
+def test_bundle_resolves_placeholders():
+    loads = []
+    group = lazy.LazyDatasets(lambda kept: loads.append(1) or {"vaccLocUSCounty": "counties"})
+    bundle = preparation.DatasetBundle({"vaccLocUSCounty": lazy.LazyDataset(group, "vaccLocUSCounty")}, 1)
+    assert not bundle.isLoaded("vaccLocUSCounty")
+    assert bundle.vaccLocUSCounty == "counties" and bundle.vaccLocUSCounty == "counties"
+    assert bundle.isLoaded("vaccLocUSCounty") and loads == [1]
+
+# Every published bundle gets a higher version, and listeners see it before it is used
+def test_publish_bundle(listeners):
+    seen = []
+    listeners.append(lambda bundle: seen.append((bundle.version, preparation.getBundle())))
+    first = preparation.publishBundle({"name": "first"})
+    second = preparation.publishBundle({"name": "second"})
+    assert second.version > first.version
+    assert preparation.getBundle() is second
+    assert seen == [(first.version, None), (second.version, first)]
+
+# A listener that fails does not stop the publication
+def test_failing_listener(listeners):
+    def fail(bundle):
+        raise ValueError("failed")
+    listeners.append(fail)
+    bundle = preparation.publishBundle({"name": "first"})
+    assert preparation.getBundle() is bundle
+
+# A bundle whose listeners finish after a newer bundle was published never replaces the newer bundle
+def test_slow_publication_keeps_newer_bundle(listeners):
+    started, release = threading.Event(), threading.Event()
+    def wait(bundle):
+        if bundle.name == "slow":
+            started.set()
+            release.wait(5)
+    listeners.append(wait)
+    published = {}
+    thread = threading.Thread(target=lambda: published.update(slow=preparation.publishBundle({"name": "slow"})))
+    thread.start()
+    assert started.wait(5)
+    newer = preparation.publishBundle({"name": "newer"})
+    release.set()
+    thread.join(5)
+    assert published["slow"].version < newer.version
+    assert preparation.getBundle() is newer
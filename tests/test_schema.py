@@ -0,0 +1,116 @@
+## SCHEMA MAPPING TESTS --------------------------------------------------------
+
+# This file tests that the schema mapping (see schema.py) gives the same prepared tables as the original preparation code
+# (kept in apps/evaluation/mapping.py), on small tables with the cases in which the two could differ.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import pytest
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+from apps.preparation import schema
+from apps.evaluation import mapping
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+UK_AGE_METRICS = ['cumPeopleVaccinatedFirstDoseByVaccinationDate', 'cumPeopleVaccinatedCompleteByVaccinationDate',
+                  'cumVaccinationFirstDoseUptakeByVaccinationDatePercentage', 'cumVaccinationCompleteCoverageByVaccinationDatePercentage']
+
+# Small (raw) source of every schema
+FIXTURES = {
+    "vaccCov": pd.DataFrame({"date": ["2021-11-01", "2021-11-01", "2021-11-02", "2021-11-02", "2021-11-02"],
+                             "iso_code": ["NLD", "NLD", "GBR", "USA", "BEL"],
+                             "people_vaccinated": [10.0, 10.0, 20.0, 30.0, 40.0],
+                             "people_vaccinated_per_hundred": [50.0, 50.0, 60.0, 70.0, 80.0],
+                             "people_fully_vaccinated": [5.0, 5.0, np.nan, 25.0, 35.0],
+                             "people_fully_vaccinated_per_hundred": [45.0, 45.0, np.nan, 65.0, 75.0]}),
+    "vaccAttitudes": pd.DataFrame({"Day": ["2021-06-01", "2021-06-01", "2021-06-08"],
+                                   "Code": ["NLD", "NLD", "DEU"],
+                                   "people_vaccinated_per_hundred": [40.0, 40.0, 30.0],
+                                   "willingness_covid_vaccinate_this_week_pct_pop": [30.0, 30.0, 20.0],
+                                   "uncertain_covid_vaccinate_this_week_pct_pop": [20.0, 20.0, 30.0],
+                                   "unwillingness_covid_vaccinate_this_week_pct_pop": [10.0, 10.0, 20.0]}),
+    "vaccAgeNL": pd.DataFrame({"Date_of_statistics": ["2021-11-01", "2021-11-01", "2021-11-01"],
+                               "Region_level": ["Veiligheidsregio", "Veiligheidsregio", "Gemeente"],
+                               "Age_group": ["12-17", "18-30", "12-17"],
+                               "Vaccination_coverage_partly": ["80", ">=95", "70"],
+                               "Vaccination_coverage_completed": ["9999", "75", "60"]}),
+    "vaccAgeUK": pd.DataFrame(dict({"date": ["2021-11-01", "2021-11-08", "2021-11-08", "2021-11-08"],
+                                    "age": ["12_15", "12_15", "90+", "90+"]},
+                                   **{metric: [1.0, 2.0, 3.0, 3.0] for metric in UK_AGE_METRICS})),
+    # The latest date only has rows that are not shown (age known), as the original code chose the latest date before dropping them
+    "vaccAgeUS": pd.DataFrame({"date": ["2021-11-01", "2021-11-01", "2021-11-02", "2021-11-02"],
+                               "demographic_category": ["Ages_12-15_yrs", "Ages_75+_yrs", "Age_known", "Sex_Female"],
+                               "administered_dose1": [1.0, 2.0, 3.0, 4.0],
+                               "administered_dose1_pct": [10.0, 20.0, 30.0, 40.0],
+                               "series_complete_yes": [1.0, 2.0, 3.0, 4.0],
+                               "series_complete_pop_pct": [10.0, 20.0, 30.0, 40.0]}),
+    # The latest date only has rows of another birth year, as the original code chose the latest date before dropping them
+    "vaccLocNL": pd.DataFrame({"Region_level": ["Gemeente", "Gemeente", "Gemeente", "Veiligheidsregio"],
+                               "Region_code": ["GM0014", "GM0014", "GM0014", "VR01"],
+                               "Region_name": ["Groningen", "Groningen", "Groningen", "Groningen"],
+                               "Birth_year": ["<2004", "<2004", "<2010", "<2004"],
+                               "Date_of_statistics": ["2021-10-25", "2021-11-01", "2021-11-08", "2021-11-08"],
+                               "Vaccination_coverage_completed": ["70", ">=95", "50", "80"],
+                               "Vaccination_coverage_partly": ["75", "9999", "55", "85"]}),
+    "vaccLocUK": pd.DataFrame({"areaType": "ltla",
+                               "areaCode": ["E1", "E1", "E2", "E2"],
+                               "areaName": ["First", "First", "Second", "Second"],
+                               "cumVaccinationCompleteCoverageByVaccinationDatePercentage": [60.0, 61.0, 70.0, 70.0],
+                               "date": ["2021-11-01", "2021-11-08", "2021-11-01", "2021-11-01"]}),
+    "vaccLocUSCounty": pd.DataFrame({"date": ["2021-11-01", "2021-11-02", "2021-11-02", "2021-11-02"],
+                                     "fips": ["1001", "1001", "12086", "12086"],
+                                     "recip_county": ["Autauga County", "Autauga County", "Miami-Dade County", "Miami-Dade County"],
+                                     "series_complete_pop_pct": [50.0, 51.0, 70.0, 70.0],
+                                     "series_complete_yes": [100.0, 101.0, 200.0, 200.0],
+                                     "administered_dose1_recip": [110.0, 111.0, 210.0, 210.0],
+                                     "administered_dose1_pop_pct": [55.0, 56.0, 75.0, 75.0]}),
+    "vaccLocUSState": pd.DataFrame({"date": ["2021-11-01", "2021-11-02", "2021-11-02", "2021-11-02"],
+                                    "location": ["AL", "AL", "PR", "TX"],
+                                    "series_complete_pop_pct": [50.0, 51.0, 60.0, 70.0],
+                                    "series_complete_yes": [100.0, 101.0, 150.0, 200.0],
+                                    "administered_dose1_recip": [110.0, 111.0, 160.0, 210.0],
+                                    "administered_dose1_pop_pct": [55.0, 56.0, 65.0, 75.0]}),
+}
+
+## HELPERS ---------------------------------------------------------------------
+
+# Compare two prepared tables
+def sameTable(original, prepared):
+    """ Tells whether two prepared tables have the same rows and columns, in any order (as in mapping.compare).
+
+        Parameters:
+        original (dataframe): table of the original preparation code
+        prepared (dataframe): table of the schema mapping
+
+        Returns:
+        same (boolean): true if both tables have the same rows and columns
+    """
+    columns = list(original.columns)
+    return (sorted(columns) == sorted(prepared.columns)
+            and original[columns].sort_values(columns).reset_index(drop=True)
+                .equals(prepared[columns].sort_values(columns).reset_index(drop=True)))
+
+## TESTS -----------------------------------------------------------------------
+
+# Every schema gives the table of the original code, apart from the padded county codes
+@pytest.mark.parametrize("name", [name for name in FIXTURES if name != "vaccLocUSCounty"])
+def test_schema_matches_original(name):
+    original = mapping.ORIGINAL[name](FIXTURES[name].copy())
+    prepared = schema.applySchema(FIXTURES[name], schema.SCHEMAS[name])
+    assert sameTable(original, prepared)
+
+# County codes are padded to five digits, so they match the fips codes of the county shapes
+def test_county_codes_are_padded():
+    original = mapping.ORIGINAL["vaccLocUSCounty"](FIXTURES["vaccLocUSCounty"].copy())
+    original["location_code"] = original["location_code"].str.zfill(5)
+    prepared = schema.applySchema(FIXTURES["vaccLocUSCounty"], schema.SCHEMAS["vaccLocUSCounty"])
+    assert sameTable(original, prepared)
+    assert sorted(prepared["location_code"]) == ["01001", "12086"]
+
+# Latest date is chosen before the rows that are not shown are dropped
+def test_latest_date_is_chosen_before_dropping_rows():
+    assert schema.applySchema(FIXTURES["vaccAgeUS"], schema.SCHEMAS["vaccAgeUS"]).empty
+    assert schema.applySchema(FIXTURES["vaccLocNL"], schema.SCHEMAS["vaccLocNL"]).empty
@@ -0,0 +1,74 @@
+## SODA RETRIEVAL TESTS --------------------------------------------------------
+
+# This file tests the retrieval of SODA resources page by page (see soda.py) without reaching the server.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import urllib.parse
+import pytest
+pd = pytest.importorskip("pandas")
+from apps.preparation import soda
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+RESOURCE = "https://data.example.org/resource/test.csv"
+
+# Rows of the resource on the server
+ROWS = pd.DataFrame({"fips": [str(number).zfill(5) for number in range(10)], "date": "2021-11-04T00:00:00.000",
+                     "series_complete_pop_pct": [str(number) for number in range(10)]})
+
+## HELPERS ---------------------------------------------------------------------
+
+# Answer page queries without the server
+def useServer(monkeypatch, rows, dropped=None):
+    """ Replaces the server by a table that is returned page by page, as the server returns it.
+
+        Parameters:
+        monkeypatch (pytest fixture): replaces attributes for the duration of a test
+        rows (dataframe): rows of the resource on the server
+        dropped (int): offset of a page of which the server leaves out the last row, if any
+
+        Returns:
+        urls (list): urls of the queries that were run
+    """
+    urls = []
+    def runQuery(url):
+        urls.append(url)
+        parameters = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        offset, limit = int(parameters["$offset"]), int(parameters["$limit"])
+        page = rows.iloc[offset:offset + limit]
+        if offset == dropped:
+            page = page.iloc[:-1]
+        return page.reset_index(drop=True)
+    monkeypatch.setattr(soda, "runQuery", runQuery)
+    return urls
+
+## TESTS -----------------------------------------------------------------------
+
+# All pages are retrieved and put together in order, with only the requested columns
+def test_retrieve_pages(monkeypatch):
+    urls = useServer(monkeypatch, ROWS)
+    data = soda.retrievePages(RESOURCE, ["fips", "series_complete_pop_pct"], "date='2021-11-04T00:00:00.000'", "fips",
+                              len(ROWS), pageSize=4, parallel=2)
+    assert len(urls) == 3
+    assert data.equals(ROWS[["fips", "series_complete_pop_pct"]])
+
+# A page with fewer rows than requested is reported, as the result is truncated
+def test_short_page_is_reported(monkeypatch):
+    useServer(monkeypatch, ROWS, dropped=4)
+    with pytest.raises(ValueError, match="Truncated result"):
+        soda.retrievePages(RESOURCE, ["fips"], "", "fips", len(ROWS), pageSize=4)
+
+# Rows that were counted but not retrieved (the rows changed between count and retrieval) are reported
+def test_count_mismatch_is_reported(monkeypatch):
+    useServer(monkeypatch, ROWS.iloc[:8])
+    with pytest.raises(ValueError):
+        soda.retrievePages(RESOURCE, ["fips"], "", "fips", len(ROWS), pageSize=4)
+
+# Duplicate rows (the order moved between pages) are reported
+def test_duplicate_rows_are_reported(monkeypatch):
+    useServer(monkeypatch, pd.concat([ROWS.iloc[:4], ROWS.iloc[:4]], ignore_index=True))
+    with pytest.raises(ValueError, match="Incomplete result"):
+        soda.retrievePages(RESOURCE, ["fips"], "", "fips", 8, pageSize=4)
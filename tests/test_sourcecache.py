@@ -0,0 +1,105 @@
+## SOURCE CACHE TESTS ----------------------------------------------------------
+
+# This file tests the conditional requests of the on-disk source cache (see sourcecache.py) without reaching the sources.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import io
+import os
+import urllib.error
+import pytest
+from apps.preparation import sourcecache
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+URL = "https://data.example.org/source.csv"
+
+## HELPERS ---------------------------------------------------------------------
+
+# Response of an online source
+class Response(io.BytesIO):
+    """ Response of urlopen with a body and headers. """
+
+    def __init__(self, body, headers):
+        super().__init__(body)
+        self.headers = headers
+
+# Answer requests without the online source
+def useSource(monkeypatch, tmp_path, answers):
+    """ Replaces the online source by a list of answers and uses an empty source cache.
+
+        Parameters:
+        monkeypatch (pytest fixture): replaces attributes for the duration of a test
+        tmp_path (path): folder of the source cache
+        answers (list): answer to every next request, a (body, headers) pair, an HTTP status code or an exception
+
+        Returns:
+        requests (list): requests that were sent
+    """
+    monkeypatch.setattr(sourcecache, "CACHE_FOLDER", str(tmp_path))
+    requests = []
+    def urlopen(request, timeout=None):
+        requests.append(request)
+        answer = answers.pop(0)
+        if isinstance(answer, int):
+            raise urllib.error.HTTPError(request.full_url, answer, "status " + str(answer), {}, None)
+        if isinstance(answer, Exception):
+            raise answer
+        return Response(*answer)
+    monkeypatch.setattr(sourcecache.urllib.request, "urlopen", urlopen)
+    return requests
+
+# Content of a file
+def readFile(path):
+    """ Reads a file of the cache as bytes. """
+    with open(path, "rb") as file:
+        return file.read()
+
+## TESTS -----------------------------------------------------------------------
+
+# A new source is downloaded and stored with its validators
+def test_first_download(monkeypatch, tmp_path):
+    requests = useSource(monkeypatch, tmp_path, [(b"a,b\n1,2\n", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Nov 2021"})])
+    path, modified = sourcecache.fetchSource(URL)
+    assert modified and readFile(path) == b"a,b\n1,2\n"
+    assert requests[0].get_header("If-none-match") is None
+    meta = sourcecache.readMeta(URL)
+    assert meta["etag"] == '"v1"' and sourcecache.cachedFile(meta) == path
+
+# An unchanged source is not downloaded again: the request sends the validators and the cached copy is used
+def test_not_modified(monkeypatch, tmp_path):
+    requests = useSource(monkeypatch, tmp_path, [(b"a,b\n1,2\n", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Nov 2021"}), 304])
+    firstPath, modified = sourcecache.fetchSource(URL)
+    path, modified = sourcecache.fetchSource(URL)
+    assert path == firstPath and not modified
+    assert requests[1].get_header("If-none-match") == '"v1"'
+    assert requests[1].get_header("If-modified-since") == "Mon, 01 Nov 2021"
+
+# A changed source replaces the cached copy, the previous version is kept for readers and older versions are removed
+def test_modified(monkeypatch, tmp_path):
+    useSource(monkeypatch, tmp_path, [(b"1\n", {"ETag": '"v1"'}), (b"2\n", {"ETag": '"v2"'}), (b"3\n", {"ETag": '"v3"'})])
+    firstPath, modified = sourcecache.fetchSource(URL)
+    secondPath, modified = sourcecache.fetchSource(URL)
+    thirdPath, modified = sourcecache.fetchSource(URL)
+    assert modified and readFile(thirdPath) == b"3\n"
+    assert sourcecache.readMeta(URL)["etag"] == '"v3"'
+    assert os.path.exists(secondPath) and not os.path.exists(firstPath)
+
+# The same content without validators is not reported as modified
+def test_same_content_without_validators(monkeypatch, tmp_path):
+    useSource(monkeypatch, tmp_path, [(b"1\n", {}), (b"1\n", {})])
+    sourcecache.fetchSource(URL)
+    path, modified = sourcecache.fetchSource(URL)
+    assert not modified and readFile(path) == b"1\n"
+
+# The cached copy is used when the source cannot be reached, without a cached copy the error is raised
+def test_unreachable_source(monkeypatch, tmp_path):
+    useSource(monkeypatch, tmp_path, [OSError("unreachable"), (b"1\n", {"ETag": '"v1"'}), 500, OSError("unreachable")])
+    with pytest.raises(OSError):
+        sourcecache.fetchSource(URL)
+    firstPath, modified = sourcecache.fetchSource(URL)
+    assert sourcecache.fetchSource(URL) == (firstPath, False)
+    assert sourcecache.fetchSource(URL) == (firstPath, False)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".part")] == []
@@ -0,0 +1,103 @@
+## VECTOR TILES TESTS ----------------------------------------------------------
+
+# This file tests the encoding of the vector tiles of the US county map (see tiles.py)
+# and which tiles are served, without the county geography of the dashboard.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import types
+import pytest
+pytest.importorskip("pandas")
+pytest.importorskip("geopandas")
+pytest.importorskip("dash")
+from shapely.geometry import Polygon
+from apps.preparation import preparation, geometry
+from apps.visualisation import tiles
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+# Bounds (longitude and latitude) of the counties of the contiguous US
+BOUNDS = [-125.0, 24.5, -66.9, 49.4]
+
+## HELPERS ---------------------------------------------------------------------
+
+# Serve tiles of a small bundle
+@pytest.fixture
+def client(monkeypatch):
+    """ Replaces the bundle in use by a bundle with version 7, the geography by its bounds and the tiles by their key,
+        and returns a test client of the dashboard server.
+    """
+    monkeypatch.setattr(preparation, "getBundle", lambda: types.SimpleNamespace(version=7))
+    monkeypatch.setattr(geometry, "loadGeometry", lambda name, tolerance=None: types.SimpleNamespace(total_bounds=BOUNDS))
+    monkeypatch.setattr(tiles, "getTile", lambda bundle, zoom, x, y: str((bundle.version, zoom, x, y)).encode("utf-8"))
+    # Dash checks its layout (set by index.py) before the first request
+    monkeypatch.setattr(tiles.server, "_got_first_request", True)
+    return tiles.server.test_client()
+
+# Url of a tile
+def tilePath(version, zoom, x, y):
+    """ Returns the path of a tile, see tiles.tileUrl. """
+    return tiles.app.config.routes_pathname_prefix + "tiles/countiesUS/" + "/".join(map(str, [version, zoom, x, y])) + ".pbf"
+
+## TESTS -----------------------------------------------------------------------
+
+# Unsigned integers are encoded as protocol buffers varints
+def test_varint():
+    assert tiles.varint(0) == b"\x00"
+    assert tiles.varint(1) == b"\x01"
+    assert tiles.varint(127) == b"\x7f"
+    assert tiles.varint(300) == b"\xac\x02"
+
+# Fields are prefixed with their number and wire type, bytes with their length
+def test_field():
+    assert tiles.field(1, 150) == b"\x08\x96\x01"
+    assert tiles.field(2, b"abc") == b"\x12\x03abc"
+
+# A polygon gives the drawing commands of the example in the vector tile specification
+def test_encode_polygon():
+    cursor = tiles.np.zeros(2, dtype=tiles.np.int64)
+    commands = tiles.encodePolygon(Polygon([(3, 6), (8, 12), (20, 34)]), cursor)
+    assert [int(value) for value in commands] == [9, 6, 12, 18, 10, 12, 24, 44, 15]
+    assert list(cursor) == [20, 34]
+
+# Negative steps are zigzag encoded, and the hole continues from the end of the exterior ring
+def test_encode_polygon_with_hole():
+    cursor = tiles.np.zeros(2, dtype=tiles.np.int64)
+    square = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)], [[(2, 2), (2, 4), (4, 4), (4, 2)]])
+    commands = [int(value) for value in tiles.encodePolygon(square, cursor)]
+    assert commands == [9, 0, 0, 26, 20, 0, 0, 20, 19, 0, 15,
+                        9, 4, 15, 26, 0, 4, 4, 0, 0, 3, 15]
+
+# Rings are turned so the exterior ring has a positive area and holes a negative area
+def test_encode_polygon_orientation():
+    cursor = tiles.np.zeros(2, dtype=tiles.np.int64)
+    commands = [int(value) for value in tiles.encodePolygon(Polygon([(20, 34), (8, 12), (3, 6)]), cursor)]
+    assert commands == [9, 6, 12, 18, 10, 12, 24, 44, 15]
+
+# Rings that collapse in tile coordinates are left out
+def test_encode_collapsed_polygon():
+    cursor = tiles.np.zeros(2, dtype=tiles.np.int64)
+    assert tiles.encodePolygon(Polygon([(0, 0), (0.2, 0), (0.2, 0.2)]), cursor) == []
+
+# Tiles of the bundle in use within the counties are served and can be cached
+def test_serve_tile(client):
+    response = client.get(tilePath(7, 3, 2, 3))
+    assert response.status_code == 200
+    assert response.data == b"(7, 3, 2, 3)"
+    assert "max-age" in response.headers["Cache-Control"]
+
+# Tiles of another bundle, outside the counties or above the largest zoom level are rejected
+def test_reject_tiles(client):
+    assert client.get(tilePath(6, 3, 2, 3)).status_code == 404
+    assert client.get(tilePath(7, 3, 6, 3)).status_code == 404
+    assert client.get(tilePath(7, 3, 2, 6)).status_code == 404
+    assert client.get(tilePath(7, 3, 2, 8)).status_code == 404
+    assert client.get(tilePath(7, tiles.MAX_ZOOM + 1, 0, 0)).status_code == 404
+
+# The tile url is relative, so the same map can be sent to every host
+def test_tile_url_is_relative():
+    url = tiles.tileUrl(types.SimpleNamespace(version=7))
+    assert url.startswith(tiles.app.config.requests_pathname_prefix) and "://" not in url
+    assert url.endswith("/7/{z}/{x}/{y}.pbf")
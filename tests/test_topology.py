@@ -0,0 +1,91 @@
+## TOPOLOGY ENCODING TESTS -----------------------------------------------------
+
+# This file tests the encoding of geographies as topology (see topology.py) on a few small shapes.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import pytest
+gpd = pytest.importorskip("geopandas")
+from shapely.geometry import Polygon, MultiPolygon, shape
+from apps.preparation import topology
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+# Two squares that share a border, and a square with a hole (coordinates on the grid of the finest topology)
+SHAPES = gpd.GeoSeries([Polygon([(0, 0), (1, 0), (1, 1), (0, 1)]),
+                        Polygon([(1, 0), (2, 0), (2, 1), (1, 1)]),
+                        Polygon([(3, 0), (5, 0), (5, 2), (3, 2)], [[(3.5, 0.5), (4.5, 0.5), (4.5, 1.5), (3.5, 1.5)]])],
+                       index=["left", "right", "holed"])
+
+# Two shapes with a winding shared border, which the simplification straightens
+WINDING = [(1, 0), (1.1, 0.25), (0.9, 0.5), (1.1, 0.75), (1, 1)]
+WINDING_SHAPES = gpd.GeoSeries([Polygon([(0, 0)] + WINDING + [(0, 1)]),
+                                Polygon([(2, 0), (2, 1)] + WINDING[::-1])],
+                               index=["left", "right"])
+
+## HELPERS ---------------------------------------------------------------------
+
+# Arcs a geometry of a topology refers to
+def arcNumbers(geometry):
+    """ Collects the arcs that a geometry of a topology refers to, reversed arcs (~number) as their own number.
+
+        Parameter:
+        geometry (dict): geometry of the topology
+
+        Returns:
+        numbers (set): numbers of the arcs
+    """
+    polygons = [geometry["arcs"]] if geometry["type"] == "Polygon" else geometry["arcs"]
+    return {number if number >= 0 else ~number for rings in polygons for ring in rings for number in ring}
+
+## TESTS -----------------------------------------------------------------------
+
+# Decoding an encoded topology gives the same shapes
+def test_topology_round_trip():
+    encoded = topology.encodeTopology(SHAPES, topology.FINEST_STEP)
+    features = topology.decodeTopology(encoded)["features"]
+    assert [feature["id"] for feature in features] == list(SHAPES.index)
+    for feature, original in zip(features, SHAPES):
+        assert shape(feature["geometry"]).equals(original)
+
+# The shared border of two shapes is stored once
+def test_shared_border_is_stored_once():
+    geometries = topology.encodeTopology(SHAPES, topology.FINEST_STEP)["objects"]["shapes"]["geometries"]
+    assert arcNumbers(geometries[0]) & arcNumbers(geometries[1])
+    assert not arcNumbers(geometries[0]) & arcNumbers(geometries[2])
+
+# Empty shapes are kept as geometries without type
+def test_missing_shape_is_kept():
+    shapes = gpd.GeoSeries([SHAPES["left"], None, MultiPolygon([SHAPES["right"]])], index=["left", "none", "multi"])
+    features = topology.decodeTopology(topology.encodeTopology(shapes, topology.FINEST_STEP))["features"]
+    assert features[1]["geometry"] is None
+    assert shape(features[2]["geometry"]).equals(SHAPES["right"])
+
+# Simplified neighbours still share the same border, without gaps or overlaps
+def test_simplified_neighbours_share_border():
+    tolerance = 0.2
+    encoded = topology.encodeTopology(WINDING_SHAPES, topology.quantizationStep(tolerance), tolerance)
+    left, right = [shape(feature["geometry"]) for feature in topology.decodeTopology(encoded)["features"]]
+    assert len(left.exterior.coords) < len(WINDING_SHAPES["left"].exterior.coords)
+    assert left.intersection(right).area == 0
+    assert left.union(right).area == pytest.approx(2)
+
+# Simplified shapes are simplified along the same shared arcs
+def test_simplify_shapes_keeps_neighbours_together():
+    left, right = topology.simplifyShapes(WINDING_SHAPES, 0.2)
+    assert left.is_valid and right.is_valid
+    assert left.intersection(right).area == 0
+    assert left.union(right).area == pytest.approx(2)
+
+# Douglas-Peucker keeps the end points and the points further away than the tolerance
+def test_simplify_arc():
+    arc = [(0, 0), (1, 1), (2, 0), (3, 10), (4, 0)]
+    assert topology.simplifyArc(arc, 1.5) == [(0, 0), (2, 0), (3, 10), (4, 0)]
+    assert topology.simplifyArc(arc, 20) == [(0, 0), (4, 0)]
+
+# The unsimplified shapes get the finest grid, the levels of detail a power of two below their tolerance
+def test_quantization_step():
+    assert topology.quantizationStep(0) == topology.FINEST_STEP
+    assert topology.quantizationStep(0.002) == 2.0 ** -11
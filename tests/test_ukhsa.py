@@ -0,0 +1,99 @@
+## UKHSA RETRIEVAL TESTS -------------------------------------------------------
+
+# This file tests the retrieval of the latest rows from the UKHSA API (see ukhsa.py) without reaching the API.
+#
+# Usage (from the main folder of the dashboard):
+# python -m pytest tests
+
+## IMPORT LIBRARIES ------------------------------------------------------------
+import pytest
+pd = pytest.importorskip("pandas")
+from apps.preparation import retrieval, sourcecache, ukhsa
+
+## TEST SETTINGS ---------------------------------------------------------------
+
+# Latest-only query of the vaccination location data for UK
+QUERY = retrieval.SOURCES["vaccLocUK"]["query"]
+METRIC = "cumVaccinationCompleteCoverageByVaccinationDatePercentage"
+
+# Full csv download: area E2 stopped reporting a week before the latest date of the source
+FULL = pd.DataFrame({"areaType": "ltla",
+                     "areaName": ["First", "First", "Second", "Second"],
+                     "areaCode": ["E1", "E1", "E2", "E2"],
+                     METRIC: [60.0, 61.0, 70.0, 71.0],
+                     "date": ["2021-11-01", "2021-11-08", "2021-10-25", "2021-11-01"]})
+
+## HELPERS ---------------------------------------------------------------------
+
+# Answer the latest-only query and the full download without the API
+def useSources(monkeypatch, tmp_path, records):
+    """ Replaces the API by the given records and the full download by FULL, and uses an empty source cache.
+
+        Parameters:
+        monkeypatch (pytest fixture): replaces attributes for the duration of a test
+        tmp_path (path): folder of the source cache
+        records (list): records the latest-only query returns
+
+        Returns:
+        fullPath (string): path of the full csv download
+    """
+    monkeypatch.setattr(sourcecache, "CACHE_FOLDER", str(tmp_path))
+    fullPath = str(tmp_path / "full.csv")
+    FULL.to_csv(fullPath, index=False)
+    monkeypatch.setattr(ukhsa, "runLatestQuery", lambda url: records)
+    monkeypatch.setattr(sourcecache, "fetchSource", lambda url: (fullPath, True))
+    return fullPath
+
+# Latest rows of the full download as API records
+def latestRecords(codes):
+    """ Returns the records of the latest date of the full download, as the API returns them.
+
+        Parameter:
+        codes (list): codes of the areas to return
+
+        Returns:
+        records (list): one record per area
+    """
+    latest = FULL[FULL["date"] == FULL["date"].max()]
+    return latest[latest["areaCode"].isin(codes)].to_dict("records")
+
+## TESTS -----------------------------------------------------------------------
+
+# First retrieval downloads the full source, so the latest row of every area is known
+def test_first_retrieval_uses_full_source(monkeypatch, tmp_path):
+    fullPath = useSources(monkeypatch, tmp_path, latestRecords(["E1"]))
+    path, modified = ukhsa.fetchLatest("full", QUERY)
+    assert path == fullPath
+    assert set(ukhsa.previousRows(ukhsa.latestUrl(QUERY), QUERY)["areaCode"]) == {"E1", "E2"}
+
+# Area with stale data keeps its row of the previous retrieval, without downloading the full source again
+def test_stale_area_keeps_previous_row(monkeypatch, tmp_path):
+    fullPath = useSources(monkeypatch, tmp_path, latestRecords(["E1"]))
+    ukhsa.fetchLatest("full", QUERY)
+    monkeypatch.setattr(sourcecache, "fetchSource", lambda url: pytest.fail("full source downloaded again"))
+
+    for refresh in range(2):
+        path, modified = ukhsa.fetchLatest("full", QUERY)
+        cached = pd.read_csv(path)
+        assert cached.set_index("areaCode")["date"].to_dict() == {"E1": "2021-11-08", "E2": "2021-11-01"}
+
+# Area that lags too far behind (such as a retired area) is left out, without downloading the full source again
+def test_retired_area_is_left_out(monkeypatch, tmp_path):
+    useSources(monkeypatch, tmp_path, latestRecords(["E1"]))
+    ukhsa.fetchLatest("full", QUERY)
+    records = [dict(record, date="2021-11-22") for record in latestRecords(["E1"])]
+    monkeypatch.setattr(ukhsa, "runLatestQuery", lambda url: records)
+    monkeypatch.setattr(sourcecache, "fetchSource", lambda url: pytest.fail("full source downloaded again"))
+
+    path, modified = ukhsa.fetchLatest("full", QUERY)
+    assert list(pd.read_csv(path)["areaCode"]) == ["E1"]
+
+# Area that lags behind for a while is looked up again in the full source
+def test_lagging_area_uses_full_source(monkeypatch, tmp_path):
+    fullPath = useSources(monkeypatch, tmp_path, latestRecords(["E1"]))
+    ukhsa.fetchLatest("full", QUERY)
+    records = [dict(record, date="2021-11-10") for record in latestRecords(["E1"])]
+    monkeypatch.setattr(ukhsa, "runLatestQuery", lambda url: records)
+
+    path, modified = ukhsa.fetchLatest("full", QUERY)
+    assert path == fullPath